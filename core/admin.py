@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Todo, Notification
+from .search import get_search_backend
 
 @admin.register(Todo)
 class TodoAdmin(admin.ModelAdmin):
@@ -8,6 +9,12 @@ class TodoAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description', 'category')
     ordering = ('-created_at',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index rather than icontains scans over search_fields
+        if not search_term:
+            return queryset, False
+        return get_search_backend().filter(queryset, search_term), False
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'notification_type', 'title', 'is_read', 'created_at')
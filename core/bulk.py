@@ -0,0 +1,170 @@
+"""Set-based task operations for the task list's bulk actions.
+
+Each operation is one ``UPDATE`` (or one ``DELETE`` per table) over a user's
+selected todos. ``QuerySet.update`` and plain ``DELETE`` statements skip the
+per-row signal handlers, so the side effects those handlers have are applied here, once per
+operation: counter deltas, the DailyActivity rollup, the scheduler outbox,
+the cached reminders and notifications and the user's cached pages.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .caching import bump_generation_on_commit
+from .context_processors import invalidate_notifications, invalidate_reminders
+from .models import Notification, NotificationLedger, TimeEntry, Todo, TodoChange
+from .signals import SCHEDULE_FIELDS
+from .stats import apply_counter_delta, record_activity, todo_counter_delta
+
+BULK_OPERATIONS = ('status', 'priority', 'category', 'reschedule', 'delete')
+BULK_MAX_IDS = 1000
+
+
+@dataclass(frozen=True)
+class BulkResult:
+    operation: str
+    ids: list
+    changed: int = 0
+
+
+def _parse_due_date(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid due date "{value}"')
+        # A bare date means the end of that day
+        parsed = datetime.combine(day, time(23, 59))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def bulk_changes(operation, value):
+    """Return the field values ``operation`` writes, or raise ValueError."""
+    if operation == 'status':
+        if value not in dict(Todo.STATUS_CHOICES):
+            raise ValueError(f'Invalid status "{value}"')
+        return {'status': value, 'completed': value == 'completed'}
+    if operation == 'priority':
+        if value not in dict(Todo.PRIORITY_CHOICES):
+            raise ValueError(f'Invalid priority "{value}"')
+        return {'priority': value}
+    if operation == 'category':
+        value = (value or '').strip()
+        if len(value) > Todo._meta.get_field('category').max_length:
+            raise ValueError('Category is too long')
+        return {'category': value}
+    if operation == 'reschedule':
+        return {'due_date': _parse_due_date(value)}
+    raise ValueError(f'Unknown operation "{operation}"')
+
+
+def _delete_where_in(model, field_name, values):
+    """``DELETE FROM`` ``model``'s table where ``field_name`` is in ``values``.
+
+    With signal receivers connected, ``QuerySet.delete`` fetches and deletes
+    row by row, so the statement is issued directly. Cascades are not
+    followed; callers delete the related rows first.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    column = quote_name(model._meta.get_field(field_name).column)
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', list(values))
+        return cursor.rowcount
+
+
+def bulk_update_todos(user, ids, operation, value=None):
+    """Apply ``operation`` to those of ``ids`` that belong to ``user``."""
+    if operation == 'delete':
+        return bulk_delete_todos(user, ids)
+    changes = bulk_changes(operation, value)
+
+    with transaction.atomic():
+        todos = Todo.objects.filter(user=user, id__in=ids)
+        rows = list(todos.select_for_update().order_by('id').values('id', *Todo.TRACKED_FIELDS))
+        if not rows:
+            return BulkResult(operation, [])
+        now = timezone.now()
+        # Rows already holding the values keep their updated_at, and with it
+        # their cached cards
+        changed = todos.exclude(**changes).update(updated_at=now, **changes)
+        if not changed:
+            return BulkResult(operation, [row['id'] for row in rows])
+
+        delta = Counter()
+        completed = 0
+        outbox = []
+        for old in rows:
+            new = {**old, **{field: changes[field] for field in changes if field in old}}
+            delta.update(todo_counter_delta(old, new).get(user.pk, Counter()))
+            just_completed = new['completed'] and not old['completed']
+            completed += just_completed
+            if any(old[field] != new[field] for field in SCHEDULE_FIELDS):
+                outbox.append(TodoChange(
+                    todo_id=old['id'],
+                    user_id=user.pk,
+                    event='completed' if just_completed else 'saved',
+                ))
+
+        apply_counter_delta(user.pk, delta)
+        if completed:
+            record_activity(user.pk, timezone.localdate(now), tasks_completed=completed)
+        if settings.NOTIFICATION_OUTBOX_ENABLED and outbox:
+            TodoChange.objects.bulk_create(outbox)
+        if any(row['reminder_date'] is not None for row in rows):
+            invalidate_reminders(user.pk)
+        bump_generation_on_commit(user.pk)
+
+    return BulkResult(operation, [row['id'] for row in rows], changed)
+
+
+def bulk_delete_todos(user, ids):
+    """Delete a user's todos with their notifications and time entries."""
+    with transaction.atomic():
+        todos = Todo.objects.filter(user=user, id__in=ids)
+        rows = list(todos.select_for_update().order_by('id').values('id', *Todo.TRACKED_FIELDS))
+        if not rows:
+            return BulkResult('delete', [])
+        todo_ids = [row['id'] for row in rows]
+
+        # Time booked against the deleted todos leaves the rollup with them
+        tracked = Counter()
+        entries = TimeEntry.objects.filter(todo_id__in=todo_ids)
+        for start_time, duration in entries.filter(duration__isnull=False).values_list('start_time', 'duration'):
+            tracked[timezone.localdate(start_time)] += int(duration.total_seconds())
+
+        # Children first. The signal handlers on Todo and TimeEntry would make
+        # Django delete row by row; their effects are applied below instead.
+        NotificationLedger.objects.filter(todo_id__in=todo_ids).delete()
+        Notification.objects.filter(todo_id__in=todo_ids).delete()
+        _delete_where_in(TimeEntry, 'todo', todo_ids)
+        deleted = _delete_where_in(Todo, 'id', todo_ids)
+
+        delta = Counter()
+        for old in rows:
+            delta.update(todo_counter_delta(old, None).get(user.pk, Counter()))
+        apply_counter_delta(user.pk, delta, create_missing=False)
+        for day, seconds in tracked.items():
+            if seconds:
+                record_activity(user.pk, day, tracked_seconds=-seconds, create_missing=False)
+        if settings.NOTIFICATION_OUTBOX_ENABLED:
+            TodoChange.objects.bulk_create(
+                [TodoChange(todo_id=todo_id, user_id=user.pk, event='deleted') for todo_id in todo_ids]
+            )
+
+        if any(row['reminder_date'] is not None for row in rows):
+            invalidate_reminders(user.pk)
+        invalidate_notifications(user.pk)
+        bump_generation_on_commit(user.pk)
+
+    return BulkResult('delete', todo_ids, deleted)
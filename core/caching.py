@@ -0,0 +1,74 @@
+"""Per-user versioned cache for the expensive context of pages.
+
+Every user has a generation number in the cache, and the keys of their
+cached values embed it. Writes to a user's todos, time entries,
+notifications or profile bump the generation once the transaction commits,
+which makes all of the user's older entries unreachable at once. Nothing is
+ever deleted; stale entries are left to expire or be culled.
+
+Generations start from the clock, so a generation that was evicted comes
+back larger than any value it held before and cannot revive old entries.
+
+``VIEW_CACHE_TIMEOUT`` (seconds, 0 disables) also bounds how long values
+that depend on the time of day, such as overdue counts, can lag. Hits and
+misses are counted per page in ``trackpro_view_cache_requests_total``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .instrumentation import VIEW_CACHE_REQUESTS
+
+GENERATION_KEY = 'core:generation:{user_id}'
+VIEW_KEY = 'core:view:{name}:{user_id}:{generation}:{parts}'
+# Generations outlive the entries keyed on them
+GENERATION_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def user_generation(user_id):
+    key = GENERATION_KEY.format(user_id=user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Another request may start the generation first; theirs wins
+        cache.add(key, time.time_ns(), GENERATION_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*user_ids):
+    for user_id in set(user_ids):
+        try:
+            cache.incr(GENERATION_KEY.format(user_id=user_id))
+        except ValueError:
+            # No generation yet; the next read starts a new one
+            pass
+
+
+def bump_generation_on_commit(*user_ids):
+    # Bumped before the commit, a concurrent read could cache the old rows
+    # under the new generation
+    transaction.on_commit(lambda: bump_generation(*user_ids))
+
+
+def cached_for_user(user_id, name, compute, *parts):
+    """Return ``compute()``, cached for ``user_id`` under the page ``name``
+    and ``parts`` until the user's next write."""
+    timeout = settings.VIEW_CACHE_TIMEOUT
+    if not timeout:
+        return compute()
+    key = VIEW_KEY.format(
+        name=name,
+        user_id=user_id,
+        generation=user_generation(user_id),
+        parts=':'.join(str(part) for part in parts),
+    )
+    value = cache.get(key)
+    if value is not None:
+        VIEW_CACHE_REQUESTS.inc(name, 'hit')
+        return value
+    VIEW_CACHE_REQUESTS.inc(name, 'miss')
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
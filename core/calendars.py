@@ -0,0 +1,252 @@
+"""Month and week calendars of due tasks, and the iCalendar feed.
+
+Every query is bounded by the visible ``due_date`` range, so a page costs
+the same however many tasks a user has dated. Each day carries its task
+count and only its first few tasks; the rest of a busy day is fetched on
+demand with ``get_day_items``.
+
+The feed is written as a stream from a server-side iterator and is reached
+through a signed, per-user token so calendar apps can subscribe without a
+session. The signature covers the user's ``calendar_feed_key``, so a user can
+revoke the address by resetting the key.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber, TruncDate
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Todo, UserProfile, new_calendar_feed_key
+
+CALENDAR_VIEWS = ('month', 'week')
+ITEMS_PER_DAY = 3
+
+FEED_SALT = 'core.calendars.feed'
+# Due dates further back than this are left out of the feed
+FEED_PAST_DAYS = 90
+FEED_EVENT_MINUTES = 30
+ICAL_PRIORITIES = {'high': 1, 'medium': 5, 'low': 9}
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+@dataclass(frozen=True)
+class CalendarRange:
+    """The days a month or week view shows; ``end`` is exclusive.
+
+    Month views cover whole weeks, Monday to Sunday, around the month.
+    """
+
+    view: str
+    anchor: date
+    start: date
+    end: date
+
+    @classmethod
+    def for_view(cls, view, anchor):
+        if view == 'week':
+            start = anchor - timedelta(days=anchor.weekday())
+            return cls(view, anchor, start, start + timedelta(days=7))
+        first = anchor.replace(day=1)
+        next_first = (first + timedelta(days=32)).replace(day=1)
+        start = first - timedelta(days=first.weekday())
+        end = next_first + timedelta(days=(7 - next_first.weekday()) % 7)
+        return cls('month', first, start, end)
+
+    @classmethod
+    def from_query(cls, params, today=None):
+        view = params.get('view') if params.get('view') in CALENDAR_VIEWS else 'month'
+        try:
+            anchor = parse_date(params.get('date') or '')
+        except ValueError:
+            anchor = None
+        return cls.for_view(view, anchor or today or timezone.localdate())
+
+    @property
+    def previous(self):
+        if self.view == 'week':
+            return self.start - timedelta(days=7)
+        return (self.anchor - timedelta(days=1)).replace(day=1)
+
+    @property
+    def next(self):
+        if self.view == 'week':
+            return self.start + timedelta(days=7)
+        return (self.anchor + timedelta(days=32)).replace(day=1)
+
+    def days(self):
+        return [self.start + timedelta(days=offset) for offset in range((self.end - self.start).days)]
+
+
+def serialize_calendar_item(todo):
+    return {
+        'id': todo['id'],
+        'title': todo['title'],
+        'priority': todo['priority'],
+        'status': todo['status'],
+        'completed': todo['completed'],
+        'due_date': todo['due_date'].isoformat(),
+        'url': reverse('todo_update', args=[todo['id']]),
+    }
+
+
+ITEM_FIELDS = ('id', 'title', 'priority', 'status', 'completed', 'due_date')
+
+
+def get_calendar_days(user, calendar_range, per_day=ITEMS_PER_DAY):
+    """Return one bucket per visible day: its date, task count, first
+    ``per_day`` tasks by due time and how many more there are.
+
+    One query: window functions number and count each day's tasks.
+    """
+    day = TruncDate('due_date')
+    rows = (
+        Todo.objects.filter(
+            user=user,
+            due_date__gte=local_midnight(calendar_range.start),
+            due_date__lt=local_midnight(calendar_range.end),
+        )
+        .annotate(
+            day=day,
+            position=Window(RowNumber(), partition_by=[day], order_by=[F('due_date').asc(), F('id').asc()]),
+            day_count=Window(Count('id'), partition_by=[day]),
+        )
+        .filter(position__lte=per_day)
+        .order_by('due_date', 'id')
+        .values(*ITEM_FIELDS, 'day', 'day_count')
+    )
+
+    buckets = {
+        day: {'date': day.isoformat(), 'count': 0, 'items': [], 'more': 0}
+        for day in calendar_range.days()
+    }
+    for row in rows:
+        bucket = buckets[row['day']]
+        bucket['count'] = row['day_count']
+        bucket['items'].append(serialize_calendar_item(row))
+        bucket['more'] = row['day_count'] - len(bucket['items'])
+    return list(buckets.values())
+
+
+def get_day_items(user, day, offset=0, limit=50):
+    """A slice of one day's tasks, in the calendar's order."""
+    todos = Todo.objects.filter(
+        user=user,
+        due_date__gte=local_midnight(day),
+        due_date__lt=local_midnight(day + timedelta(days=1)),
+    ).order_by('due_date', 'id').values(*ITEM_FIELDS)
+    return [serialize_calendar_item(todo) for todo in todos[offset:offset + limit]]
+
+
+def _feed_signer(feed_key):
+    return signing.Signer(salt=f'{FEED_SALT}:{feed_key}')
+
+
+def feed_token(user):
+    profile, _ = UserProfile.objects.get_or_create(user=user)
+    return _feed_signer(profile.calendar_feed_key).sign(str(user.pk))
+
+
+def reset_feed_token(user):
+    """Give the user a new feed key, revoking the old address; returns the new token."""
+    profile, _ = UserProfile.objects.get_or_create(user=user)
+    profile.calendar_feed_key = new_calendar_feed_key()
+    profile.save(update_fields=['calendar_feed_key', 'updated_at'])
+    return _feed_signer(profile.calendar_feed_key).sign(str(user.pk))
+
+
+def feed_user_id(token):
+    """The id of the active user a feed token was issued for, or None if it is not valid."""
+    user_id = token.partition(':')[0]
+    if not user_id.isdigit():
+        return None
+    feed_key = (UserProfile.objects.filter(user_id=user_id, user__is_active=True)
+                .values_list('calendar_feed_key', flat=True).first())
+    if feed_key is None:
+        return None
+    try:
+        return int(_feed_signer(feed_key).unsign(token))
+    except signing.BadSignature:
+        return None
+
+
+def _ical_text(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _ical_time(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _fold(line):
+    # Content lines are at most 75 octets; continuation lines start with a space
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ical_event(todo, domain, stamp):
+    due = todo['due_date']
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:todo-{todo['id']}@{domain}",
+        f'DTSTAMP:{_ical_time(stamp)}',
+        f"LAST-MODIFIED:{_ical_time(todo['updated_at'])}",
+        f'DTSTART:{_ical_time(due)}',
+        f'DTEND:{_ical_time(due + timedelta(minutes=FEED_EVENT_MINUTES))}',
+        f"SUMMARY:{_ical_text(('✓ ' if todo['completed'] else '') + todo['title'])}",
+        f"PRIORITY:{ICAL_PRIORITIES.get(todo['priority'], 0)}",
+    ]
+    if todo['description']:
+        lines.append(f"DESCRIPTION:{_ical_text(todo['description'])}")
+    if todo['category']:
+        lines.append(f"CATEGORIES:{_ical_text(todo['category'])}")
+    if todo['completed']:
+        lines.append('TRANSP:TRANSPARENT')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def ical_feed(user_id, domain, now=None, chunk_size=500):
+    """Yield the user's feed as iCalendar text, a few events at a time."""
+    now = now or timezone.now()
+    yield (
+        'BEGIN:VCALENDAR\r\n'
+        'VERSION:2.0\r\n'
+        'PRODID:-//TrackPro//Tasks//EN\r\n'
+        'CALSCALE:GREGORIAN\r\n'
+        'X-WR-CALNAME:TrackPro tasks\r\n'
+    )
+    todos = Todo.objects.filter(
+        user_id=user_id,
+        due_date__gte=now - timedelta(days=FEED_PAST_DAYS),
+    ).order_by('due_date', 'id').values(
+        'id', 'title', 'description', 'category', 'priority', 'completed', 'due_date', 'updated_at',
+    )
+    chunk = []
+    for todo in todos.iterator(chunk_size=chunk_size):
+        chunk.append(ical_event(todo, domain, now))
+        if len(chunk) >= 50:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('END:VCALENDAR\r\n')
+    yield ''.join(chunk)
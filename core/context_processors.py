@@ -1,23 +1,97 @@
-from .models import Todo, Notification
+import math
+
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from .models import Todo, Notification
+
+NOTIFICATIONS_CACHE_KEY = 'core:context:notifications:{user_id}'
+REMINDERS_CACHE_KEY = 'core:context:reminders:{user_id}'
+
+
+def _cache_timeout(changes_at, now):
+    # CONTEXT_CACHE_TIMEOUT, cut short so the entry is gone by ``changes_at``
+    timeout = settings.CONTEXT_CACHE_TIMEOUT
+    if changes_at is not None:
+        timeout = min(timeout, max(math.ceil((changes_at - now).total_seconds()), 1))
+    return timeout
+
+
+def _cached(key, compute, next_change=None):
+    # Optional short-lived per-user cache, shared by a user's requests.
+    # ``next_change`` returns when the value goes stale without any write,
+    # if it ever does; the entry expires no later than that.
+    if not settings.CONTEXT_CACHE_TIMEOUT:
+        return compute()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        changes_at = next_change() if next_change is not None else None
+        cache.set(key, value, _cache_timeout(changes_at, timezone.now()))
+    return value
+
+
+def next_reminder_date(user_id, now):
+    """When the user's list of due reminders next changes without a write, or None."""
+    return Todo.objects.filter(
+        user_id=user_id,
+        reminder_date__gt=now,
+        completed=False
+    ).order_by('reminder_date').values_list('reminder_date', flat=True).first()
+
+
+def _lazy_per_request(request, name, compute):
+    # Queried only when a template reads the value, and at most once per request
+    value = getattr(request, name, None)
+    if value is None:
+        value = SimpleLazyObject(compute)
+        setattr(request, name, value)
+    return value
+
+
+def invalidate_notifications(*user_ids):
+    cache.delete_many([NOTIFICATIONS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def invalidate_reminders(*user_ids):
+    cache.delete_many([REMINDERS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+
 
 def notifications(request):
     if request.user.is_authenticated:
-        # Get unread notifications
-        notifications = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).order_by('-created_at')[:10]  # Show top 10 notifications
+        user_id = request.user.pk
+
+        def unread_notifications():
+            # Get unread notifications
+            return _cached(NOTIFICATIONS_CACHE_KEY.format(user_id=user_id), lambda: list(
+                Notification.objects.filter(
+                    user_id=user_id,
+                    is_read=False
+                ).select_related('todo').order_by('-created_at')[:10]  # Show top 10 notifications
+            ))
 
-        return {'notifications': notifications}
-    return {'notifications': []}
+        unread = _lazy_per_request(request, '_context_notifications', unread_notifications)
+        return {
+            'notifications': unread,
+            # Where the page's stream or polling picks up; anything newer than
+            # the rendered notifications is delivered, however soon it arrives
+            'notification_cursor': SimpleLazyObject(lambda: max((n.id for n in unread), default=0)),
+        }
+    return {'notifications': [], 'notification_cursor': 0}
 
 def reminders(request):
     if request.user.is_authenticated:
-        reminders = Todo.objects.filter(
-            user=request.user,
-            reminder_date__lte=timezone.now(),
-            completed=False
-        ).order_by('reminder_date')[:5]  # Show top 5 reminders
-        return {'reminders': reminders}
-    return {'reminders': []}
\ No newline at end of file
+        user_id = request.user.pk
+
+        def due_reminders():
+            return _cached(REMINDERS_CACHE_KEY.format(user_id=user_id), lambda: list(
+                Todo.objects.filter(
+                    user_id=user_id,
+                    reminder_date__lte=timezone.now(),
+                    completed=False
+                ).order_by('reminder_date')[:5]  # Show top 5 reminders
+            ), lambda: next_reminder_date(user_id, timezone.now()))
+
+        return {'reminders': _lazy_per_request(request, '_context_reminders', due_reminders)}
+    return {'reminders': []}
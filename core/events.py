@@ -0,0 +1,73 @@
+"""Fan-out of new notifications to open server-sent event streams.
+
+The broker only wakes streams up; each stream then reads the rows after its
+own cursor from the database, so a missed or dropped wake-up never loses a
+notification. ``LocalBroker`` reaches streams served by the same process;
+a shared backend (e.g. Redis pub/sub) can be plugged in through the
+``NOTIFICATION_BROKER`` setting by subclassing ``BaseBroker``.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    def subscribe(self, user_id):
+        """Return an ``asyncio.Queue`` that receives a user's wake-ups.
+
+        Must be called from the event loop that will read the queue.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, user_id, queue):
+        raise NotImplementedError
+
+    def publish(self, user_id, notification_id):
+        """Wake a user's streams. Safe to call from any thread."""
+        raise NotImplementedError
+
+
+class LocalBroker(BaseBroker):
+    # Wake-ups carry no data, so a stream only ever needs one pending
+    QUEUE_SIZE = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(dict)
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id][queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, {})
+            subscribers.pop(queue, None)
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def publish(self, user_id, notification_id):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, {}).items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._wake, queue, notification_id)
+            except RuntimeError:
+                # The stream's event loop has already shut down
+                self.unsubscribe(user_id, queue)
+
+    @staticmethod
+    def _wake(queue, notification_id):
+        if not queue.full():
+            queue.put_nowait(notification_id)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.NOTIFICATION_BROKER)()
@@ -0,0 +1,163 @@
+"""Streaming CSV and NDJSON exports of tasks, time entries and notifications.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and written
+out a batch at a time, optionally through an incremental gzip compressor,
+so memory use does not depend on the number of rows exported. Staff can
+export every user's rows; everyone else exports their own.
+"""
+import csv
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.utils.dateparse import parse_date
+
+from .calendars import local_midnight
+from .models import Notification, TimeEntry, Todo
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+CHUNK_SIZE = 2000
+# Rows serialized per chunk handed to the response
+ROWS_PER_WRITE = 500
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    model: type
+    # Output column -> ORM lookup passed to values_list()
+    columns: dict
+    date_field: str
+
+
+EXPORTS = {
+    'tasks': ExportSpec(Todo, {
+        'id': 'id',
+        'user_id': 'user_id',
+        'title': 'title',
+        'description': 'description',
+        'category': 'category',
+        'priority': 'priority',
+        'status': 'status',
+        'completed': 'completed',
+        'due_date': 'due_date',
+        'reminder_date': 'reminder_date',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }, 'created_at'),
+    'time-entries': ExportSpec(TimeEntry, {
+        'id': 'id',
+        'user_id': 'user_id',
+        'todo_id': 'todo_id',
+        'todo_title': 'todo__title',
+        'start_time': 'start_time',
+        'end_time': 'end_time',
+        'duration_seconds': 'duration',
+        'description': 'description',
+        'is_active': 'is_active',
+    }, 'start_time'),
+    'notifications': ExportSpec(Notification, {
+        'id': 'id',
+        'user_id': 'user_id',
+        'todo_id': 'todo_id',
+        'type': 'notification_type',
+        'title': 'title',
+        'message': 'message',
+        'is_read': 'is_read',
+        'created_at': 'created_at',
+    }, 'created_at'),
+}
+
+
+def parse_day(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def export_queryset(spec, user=None, date_from=None, date_to=None):
+    """Rows of ``spec`` in id order; ``user`` None means every user's.
+    ``date_from`` and ``date_to`` are inclusive local dates."""
+    queryset = spec.model.objects.all()
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    if date_from:
+        queryset = queryset.filter(**{f'{spec.date_field}__gte': local_midnight(date_from)})
+    if date_to:
+        queryset = queryset.filter(**{f'{spec.date_field}__lt': local_midnight(date_to + timedelta(days=1))})
+    return queryset.order_by('id').values_list(*spec.columns.values())
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    return value
+
+
+# Leading characters a spreadsheet reads as the start of a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    # Text cells are user-entered; quote would-be formulas so a spreadsheet
+    # shows them as text instead of running them (CSV injection)
+    value = _plain(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+class _Line:
+    """File-like sink for csv.writer that hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, columns):
+    writer = csv.writer(_Line())
+    yield writer.writerow(columns)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_csv_cell(value) for value in row]))
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def ndjson_chunks(rows, columns):
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(dict(zip(columns, map(_plain, row))), ensure_ascii=False) + '\n')
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def gzip_chunks(chunks):
+    """Compress text chunks into one gzip stream as they are produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(spec, output_format, queryset, compress=False):
+    rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+    columns = list(spec.columns)
+    chunks = csv_chunks(rows, columns) if output_format == 'csv' else ndjson_chunks(rows, columns)
+    if compress:
+        return gzip_chunks(chunks)
+    return (chunk.encode() for chunk in chunks)
@@ -0,0 +1,268 @@
+"""Opt-in per-request timing, SQL and N+1 instrumentation.
+
+Every request's wall time goes into an in-process histogram. A sampled
+fraction (``REQUEST_METRICS_SAMPLE_RATE``) is also instrumented at the
+database layer through ``connection.execute_wrapper``: its DB time, query
+count and repeated statements are recorded, sent back in a
+``Server-Timing`` header and written as one JSON log line to the
+``core.metrics`` logger. A statement run ``REQUEST_METRICS_DUPLICATE_THRESHOLD``
+or more times in one request is reported as a likely N+1.
+
+Histograms live in the worker process; ``render_prometheus`` exports them
+in the Prometheus text format for the admin metrics endpoint. With several
+workers each scrape sees the worker that served it.
+
+A sampled streaming response (exports, the calendar feed) runs most of its
+queries while its body is iterated. The recorder stays installed until the
+stream is closed, and the request is only recorded then. Its headers have
+already gone out by that time, so it gets no ``Server-Timing`` header.
+
+Async requests (the notification stream) run their queries on other
+threads, so only their wall time is recorded.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('core.metrics')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labels = labels
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {values[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class CounterMetric:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = Counter()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'trackpro_request_duration_seconds', 'Wall time per request.', DURATION_BUCKETS, ('view', 'method'),
+)
+REQUEST_DB_DURATION = Histogram(
+    'trackpro_request_db_duration_seconds', 'Database time per sampled request.', DURATION_BUCKETS, ('view',),
+)
+REQUEST_QUERIES = Histogram(
+    'trackpro_request_queries', 'SQL queries per sampled request.', QUERY_BUCKETS, ('view',),
+)
+DUPLICATE_QUERIES = CounterMetric(
+    'trackpro_request_duplicate_queries_total',
+    'Sampled requests that repeated a statement at least the duplicate threshold.',
+    ('view',),
+)
+VIEW_CACHE_REQUESTS = CounterMetric(
+    'trackpro_view_cache_requests_total',
+    'Lookups in the per-user view cache (core.caching), by page and result.',
+    ('view', 'result'),
+)
+METRICS = (REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_QUERIES, DUPLICATE_QUERIES, VIEW_CACHE_REQUESTS)
+
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for metric in METRICS:
+        metric.reset()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that times statements and counts repeats."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+
+class RecordingStream:
+    """A streaming body iterated with ``recorder`` installed; ``on_close`` runs once it is closed."""
+
+    def __init__(self, content, recorder, on_close):
+        self.content = iter(content)
+        self.recorder = recorder
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with _recording(self.recorder):
+            return next(self.content)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+
+
+def _recording(recorder):
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        self.duplicate_threshold = settings.REQUEST_METRICS_DUPLICATE_THRESHOLD
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if random.random() >= self.sample_rate:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            REQUEST_DURATION.observe(time.perf_counter() - started, _view_name(request), request.method)
+            return response
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with _recording(recorder):
+            response = self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = RecordingStream(
+                response.streaming_content, recorder,
+                lambda: self.record(request, response, time.perf_counter() - started, recorder, streamed=True),
+            )
+            return response
+        elapsed = time.perf_counter() - started
+
+        self.record(request, response, elapsed, recorder)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        REQUEST_DURATION.observe(time.perf_counter() - started, _view_name(request), request.method)
+        return response
+
+    def record(self, request, response, elapsed, recorder, streamed=False):
+        view = _view_name(request)
+        REQUEST_DURATION.observe(elapsed, view, request.method)
+        REQUEST_DB_DURATION.observe(recorder.duration, view)
+        REQUEST_QUERIES.observe(recorder.count, view)
+
+        repeated = [
+            {'sql': sql, 'count': count}
+            for sql, count in recorder.statements.most_common(3)
+            if count >= self.duplicate_threshold
+        ]
+        if repeated:
+            DUPLICATE_QUERIES.inc(view)
+
+        if not streamed:
+            response['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+            )
+        logger.info(json.dumps({
+            'event': 'request',
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'streamed': streamed,
+            'duration_ms': round(elapsed * 1000, 2),
+            'db_ms': round(recorder.duration * 1000, 2),
+            'queries': recorder.count,
+            'repeated_queries': repeated,
+        }))
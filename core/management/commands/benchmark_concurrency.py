@@ -0,0 +1,106 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from core.models import Todo
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent write throughput: parallel workers start timers and change task '
+        'statuses through the views. Run once with SQLITE_TUNING=false and once without to compare.'
+    )
+
+    PREFIX = 'bench_concurrency_'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent workers, each with its own connection')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per worker')
+        parser.add_argument('--output', help='Also write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        workers, per_worker = options['workers'], options['requests']
+        if workers < 1 or per_worker < 1:
+            raise CommandError('--workers and --requests must be at least 1')
+        if User.objects.filter(username__startswith=self.PREFIX).exists():
+            raise CommandError(f'Users prefixed "{self.PREFIX}" exist; a previous run did not clean up')
+
+        users = [User.objects.create_user(username=f'{self.PREFIX}{i}') for i in range(workers)]
+        todos = [Todo.objects.create(user=user, title='Benchmark task') for user in users]
+        ready = threading.Barrier(workers) if workers > 1 else None
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                started = time.perf_counter()
+                if workers == 1:
+                    results = [self.work(users[0], todos[0], per_worker, ready)]
+                else:
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        results = list(pool.map(self.work, users, todos, [per_worker] * workers, [ready] * workers))
+                elapsed = time.perf_counter() - started
+        finally:
+            User.objects.filter(username__startswith=self.PREFIX).delete()
+
+        timings = sorted(timing for worker_timings, _ in results for timing in worker_timings)
+        errors = [error for _, worker_errors in results for error in worker_errors]
+        report = {
+            'database': connection.vendor,
+            'options': settings.DATABASES['default'].get('OPTIONS', {}),
+            'conn_max_age': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+            'workers': workers,
+            'requests': len(timings) + len(errors),
+            'errors': len(errors),
+            'error_samples': sorted(set(errors))[:5],
+            'throughput_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 2) if timings else None,
+            'p95_ms': round(timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))], 2) if timings else None,
+        }
+
+        self.stdout.write(
+            f'{workers} workers, {report["requests"]} requests in {elapsed:.2f} s: '
+            f'{report["throughput_per_second"]} req/s, p50 {report["p50_ms"]} ms, p95 {report["p95_ms"]} ms'
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f'{len(errors)} failed requests, e.g. {report["error_samples"][0]}'))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+
+    def work(self, user, todo, count, ready):
+        client = Client()
+        client.force_login(user)
+        start_url = reverse('start_time_tracking_todo', args=[todo.pk])
+        update_url = reverse('todo_update', args=[todo.pk])
+        timings, errors = [], []
+        if ready is not None:
+            ready.wait()
+        try:
+            for i in range(count):
+                started = time.perf_counter()
+                try:
+                    if i % 2:
+                        response = client.post(update_url, {'status': 'in_progress' if i % 4 == 1 else 'pending'},
+                                               HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                    else:
+                        response = client.get(start_url)
+                except Exception as error:
+                    errors.append(f'{type(error).__name__}: {error}')
+                    continue
+                if response.status_code >= 400:
+                    errors.append(f'HTTP {response.status_code}')
+                else:
+                    timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            if ready is not None:
+                # Connections are per thread; close the pool thread's ones
+                connections.close_all()
+        return timings, errors
@@ -0,0 +1,163 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q, UniqueConstraint
+from django.utils import timezone
+from core.models import Notification, TimeEntry, Todo
+from core.perfdata import generate
+
+
+class Command(BaseCommand):
+    help = 'Show EXPLAIN plans and timings for the hot queries with and without the core indexes'
+
+    INDEXED_MODELS = (Todo, Notification, TimeEntry)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=50,
+            help='Number of users seeded for the run',
+        )
+        parser.add_argument(
+            '--todos-per-user',
+            type=int,
+            default=400,
+            help='Mean todos seeded per user (with notifications and time entries alongside)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Times each query is run; the fastest run is reported',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the generated data',
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        now = timezone.now()
+
+        # Seed data and dropped indexes are rolled back when the run ends
+        with transaction.atomic():
+            user = self.seed(options['users'], options['todos_per_user'], options['seed'], now)
+            queries = self.queries(user, now)
+
+            after = self.measure('With indexes', queries)
+            self.drop_indexes()
+            before = self.measure('Without indexes', queries)
+            transaction.set_rollback(True)
+
+        self.stdout.write('')
+        self.stdout.write(f'{"query":<24} {"before ms":>10} {"after ms":>10} {"speedup":>8}')
+        for name in queries:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            self.stdout.write(f'{name:<24} {before[name]:>10.3f} {after[name]:>10.3f} {speedup:>7.1f}x')
+        self.stdout.write(self.style.SUCCESS('Benchmark data rolled back'))
+
+    def seed(self, users, todos_per_user, seed, now):
+        started = time.perf_counter()
+        dataset = generate(
+            users=users,
+            todos_per_user=todos_per_user,
+            time_entries_per_user=todos_per_user // 2,
+            notifications_per_user=todos_per_user,
+            seed=seed,
+            prefix='bench_index_',
+            now=now,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Seeded {len(dataset.user_ids)} users and {dataset.todos} todos in {elapsed:.1f} s')
+        return User.objects.get(pk=dataset.user_ids[len(dataset.user_ids) // 2])
+
+    def queries(self, user, now):
+        """The hot access paths, as the views, context processors and notification commands issue them."""
+        week_start = now - timezone.timedelta(days=now.weekday())
+        horizon = now + timezone.timedelta(hours=6)
+        return {
+            'task_list': Todo.objects.filter(user=user).order_by('-created_at', '-pk')[:11],
+            'task_list_status': Todo.objects.filter(user=user, status='pending').order_by('-created_at', '-pk')[:11],
+            'stats_window': Todo.objects.filter(user=user).filter(
+                Q(completed=False, due_date__isnull=False) | Q(created_at__gte=week_start)
+            ).values('id', 'completed', 'due_date'),
+            'calendar_month': Todo.objects.filter(
+                user=user, due_date__gte=now - timezone.timedelta(days=7), due_date__lt=now + timezone.timedelta(days=35)
+            ).values('id', 'due_date'),
+            'due_reminders': Todo.objects.filter(
+                user=user, reminder_date__lte=now, completed=False
+            ).order_by('reminder_date')[:5],
+            'unread_notifications': Notification.objects.filter(
+                user=user, is_read=False
+            ).order_by('-created_at')[:10],
+            'notifications_since': Notification.objects.filter(
+                user=user, is_read=False, id__gt=0
+            ).order_by('id'),
+            'overdue_scan': Todo.objects.filter(due_date__lt=now, completed=False).order_by().values('id'),
+            'reminder_scan': Todo.objects.filter(
+                reminder_date__lte=horizon, completed=False
+            ).order_by().values('id'),
+            'active_timer': TimeEntry.objects.filter(user=user, is_active=True)[:1],
+            'time_history': TimeEntry.objects.filter(user=user).order_by('-start_time')[:20],
+        }
+
+    def measure(self, label, queries):
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        timings = {}
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_LABEL(f'  {name}'))
+            for line in self.explain(queryset, label):
+                self.stdout.write(f'    {line}')
+
+            best = None
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best * 1000
+        return timings
+
+    def explain(self, queryset, label):
+        # QuerySet.explain() would reuse SQLite's cached EXPLAIN statement,
+        # which is not re-planned after the schema changes; the comment
+        # makes each phase's statement distinct.
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {label} */', params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+    def drop_indexes(self):
+        # Plain DDL: the SQLite schema editor refuses to run inside a transaction
+        sql_delete_index = connection.schema_editor().sql_delete_index
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in self.INDEXED_MODELS:
+                for name in self.index_names(model):
+                    cursor.execute(sql_delete_index % {
+                        'name': quote_name(name),
+                        'table': quote_name(model._meta.db_table),
+                    })
+
+    def index_names(self, model):
+        """Meta.indexes plus the partial unique constraints, which are indexes too.
+
+        unique_active_time_entry is a partial unique index on (user) that the
+        planner uses for the active timer lookup, so keeping it would leave
+        that query indexed in the "without" run.
+        """
+        names = [index.name for index in model._meta.indexes]
+        names += [
+            constraint.name for constraint in model._meta.constraints
+            if isinstance(constraint, UniqueConstraint) and constraint.condition is not None
+        ]
+        return names
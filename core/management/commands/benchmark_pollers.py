@@ -0,0 +1,268 @@
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from core.models import Notification
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, headers, body)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('Connection closed by server')
+    version, status, *_ = status_line.decode('latin-1').split(' ', 2)
+    status = int(status)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive':
+        headers['connection'] = 'close'
+
+    if status < 200 or status in (204, 304):
+        body = b''
+    elif 'chunked' in headers.get('transfer-encoding', '').lower():
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if not size:
+                # Trailers end with a blank line like the headers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        headers['connection'] = 'close'
+    return status, headers, body
+
+
+async def poll(host, port, path, headers, deadline, timeout, interval=0):
+    """GET ``path`` over one keep-alive connection until ``deadline``.
+
+    Behaves like a page polling for notifications: the last ETag is sent
+    back, so an unchanged poll is answered with 304, and the connection is
+    reopened whenever the server closes it. Returns (timings_ms, errors).
+    """
+    loop = asyncio.get_running_loop()
+    timings, errors = [], []
+    reader = writer = etag = None
+    try:
+        # Every poller makes at least one request, however short the run
+        while True:
+            request = [f'GET {path} HTTP/1.1', f'Host: {host}:{port}', *(f'{k}: {v}' for k, v in headers.items())]
+            if etag:
+                request.append(f'If-None-Match: {etag}')
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+                writer.write(('\r\n'.join(request) + '\r\n\r\n').encode('latin-1'))
+                status, response_headers, _ = await asyncio.wait_for(read_response(reader), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as error:
+                errors.append(f'{type(error).__name__}: {error}'.rstrip(': '))
+                writer = _close(writer)
+            else:
+                if status == 304 or 200 <= status < 300:
+                    timings.append((time.perf_counter() - started) * 1000)
+                    etag = response_headers.get('etag', etag)
+                else:
+                    errors.append(f'HTTP {status}')
+                if response_headers.get('connection', '').lower() == 'close':
+                    writer = _close(writer)
+            if loop.time() >= deadline:
+                break
+            if interval:
+                await asyncio.sleep(interval)
+    finally:
+        _close(writer)
+    return timings, errors
+
+
+def _close(writer):
+    if writer is not None:
+        writer.close()
+    return None
+
+
+async def run_pollers(url, headers, pollers, duration, timeout, interval=0):
+    """Run ``pollers`` concurrent pollers against ``url`` for ``duration`` seconds."""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    deadline = asyncio.get_running_loop().time() + duration
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        poll(parts.hostname, parts.port or 80, path, headers, deadline, timeout, interval)
+        for _ in range(pollers)
+    ))
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(timing for poller_timings, _ in results for timing in poller_timings)
+    errors = [error for _, poller_errors in results for error in poller_errors]
+    return {
+        'pollers': pollers,
+        'seconds': round(elapsed, 2),
+        'requests': len(timings) + len(errors),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'throughput_per_second': round(len(timings) / elapsed, 1),
+        'p50_ms': round(statistics.median(timings), 2) if timings else None,
+        'p95_ms': round(timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))], 2) if timings else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Poll the notifications API from many simultaneous clients against the WSGI and ASGI '
+        'gunicorn profiles (or a running server) and compare throughput and latency'
+    )
+
+    USERNAME = 'bench_pollers'
+    SERVERS = ('wsgi', 'asgi')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=self.SERVERS, default=list(self.SERVERS),
+                            help='Deployment profiles to start with gunicorn.conf.py and measure')
+        parser.add_argument('--url', help='Measure this running server instead, e.g. http://127.0.0.1:8000; '
+                                          'it must use the same database')
+        parser.add_argument('--pollers', type=int, default=200, help='Simultaneous polling clients')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to poll for, per server')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Seconds each poller waits between polls; 0 polls back to back')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+        parser.add_argument('--server-workers', type=int, default=2, help='Gunicorn workers per started server')
+        parser.add_argument('--output', help='Also write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        if options['pollers'] < 1 or options['server_workers'] < 1 or options['duration'] <= 0:
+            raise CommandError('--pollers and --server-workers must be at least 1 and --duration positive')
+        if options['url'] and urlsplit(options['url']).scheme != 'http':
+            raise CommandError('--url must be an http:// URL')
+        if User.objects.filter(username=self.USERNAME).exists():
+            raise CommandError(f'User "{self.USERNAME}" exists; a previous run did not clean up')
+
+        user = User.objects.create_user(username=self.USERNAME)
+        client = Client()
+        try:
+            Notification.objects.bulk_create(
+                Notification(user=user, title=f'Benchmark notification {i}', message='Polled by benchmark_pollers')
+                for i in range(5)
+            )
+            client.force_login(user)
+            headers = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'}
+            path = reverse('api_notifications')
+
+            if options['url']:
+                targets = [('server', options['url'].rstrip('/') + path, None)]
+            else:
+                targets = [(interface, None, interface) for interface in options['servers']]
+
+            results = []
+            self.stdout.write(f'{"server":<8} {"pollers":>7} {"requests":>9} {"errors":>7} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9}')
+            for name, url, interface in targets:
+                if interface is None:
+                    result = self.measure(url, headers, options)
+                else:
+                    with GunicornServer(interface, options['server_workers']) as base_url:
+                        result = self.measure(base_url + path, headers, options)
+                    result['server_workers'] = options['server_workers']
+                result = {'server': name, **result}
+                results.append(result)
+                self.stdout.write(
+                    f'{name:<8} {result["pollers"]:>7} {result["requests"]:>9} {result["errors"]:>7} '
+                    f'{result["throughput_per_second"]:>9} {result["p50_ms"]!s:>9} {result["p95_ms"]!s:>9}'
+                )
+                if result['errors']:
+                    self.stdout.write(self.style.WARNING(f'  e.g. {result["error_samples"][0]}'))
+        finally:
+            client.logout()
+            user.delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'duration': options['duration'], 'interval': options['interval'], 'results': results},
+                          output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+
+    def measure(self, url, headers, options):
+        # Fail fast on a server that does not answer the poll at all
+        warmup = asyncio.run(run_pollers(url, headers, 1, 0, options['timeout']))
+        if warmup['errors'] or not warmup['requests']:
+            raise CommandError(f'{url} did not answer a poll: {warmup["error_samples"] or "no response"}')
+        return asyncio.run(run_pollers(
+            url, headers, options['pollers'], options['duration'], options['timeout'], options['interval'],
+        ))
+
+
+class GunicornServer:
+    """Run gunicorn with gunicorn.conf.py on a free local port."""
+
+    STARTUP_SECONDS = 30
+
+    def __init__(self, interface, workers):
+        self.interface = interface
+        self.workers = workers
+
+    def __enter__(self):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        env = {
+            **os.environ,
+            'SERVER_INTERFACE': self.interface,
+            'WEB_CONCURRENCY': str(self.workers),
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_ACCESS_LOG': '',
+        }
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py')],
+            cwd=settings.BASE_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+
+        deadline = time.monotonic() + self.STARTUP_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.log.seek(0)
+                output = self.log.read().decode(errors='replace')[-2000:]
+                self.__exit__()
+                raise CommandError(f'gunicorn ({self.interface}) exited on startup:\n{output}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return f'http://127.0.0.1:{port}'
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise CommandError(f'gunicorn ({self.interface}) did not start within {self.STARTUP_SECONDS} seconds')
+
+    def __exit__(self, *exc_info):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
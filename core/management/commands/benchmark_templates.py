@@ -0,0 +1,109 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.test.utils import override_settings
+from django.utils import timezone
+from core.models import Todo
+
+
+class Command(BaseCommand):
+    help = (
+        'Time rendering the task list cards and rows for many tasks: without fragment caching, '
+        'with an empty fragment cache and with a warm one'
+    )
+
+    # What the task list renders for each task, grid and list views alike
+    PAGE = (
+        '{% for todo in todos %}{% include "core/partials/task_card.html" %}{% endfor %}'
+        '{% for todo in todos %}{% include "core/partials/task_row.html" %}{% endfor %}'
+    )
+    MODES = ('uncached', 'cold', 'warm')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, nargs='+', default=[1000, 10000], help='Task counts to render')
+        parser.add_argument('--repeat', type=int, default=3, help='Renders per mode; the fastest is reported')
+        parser.add_argument('--output', help='Also write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or min(options['tasks']) < 1:
+            raise CommandError('--tasks and --repeat must be at least 1')
+        self.repeat = options['repeat']
+        template = engines['django'].from_string(self.PAGE)
+        now = timezone.now()
+
+        results = []
+        self.stdout.write(f'{"tasks":>7} {"mode":<10} {"ms":>10} {"us/task":>10}')
+        for count in options['tasks']:
+            todos = self.todos(count, now)
+            timings = {}
+            with override_settings(CACHES={
+                **settings.CACHES,
+                'template_fragments': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            }):
+                timings['uncached'] = self.best(template, todos)
+            # An in-process cache with room for every fragment, whatever is configured
+            with override_settings(CACHES={
+                **settings.CACHES,
+                'template_fragments': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'benchmark-templates',
+                    'OPTIONS': {'MAX_ENTRIES': 2 * count + 1},
+                },
+            }):
+                fragments = caches['template_fragments']
+                timings['cold'] = self.best(template, todos, before=fragments.clear)
+                timings['warm'] = self.best(template, todos)
+                fragments.clear()
+
+            for mode in self.MODES:
+                self.stdout.write(
+                    f'{count:>7} {mode:<10} {timings[mode] * 1000:>10.1f} {timings[mode] / count * 1e6:>10.1f}'
+                )
+            results.append({
+                'tasks': count,
+                **{f'{mode}_ms': round(timings[mode] * 1000, 2) for mode in self.MODES},
+                'warm_speedup': round(timings['uncached'] / timings['warm'], 1) if timings['warm'] else None,
+            })
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'repeat': self.repeat, 'results': results}, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+
+    def best(self, template, todos, before=None):
+        best = None
+        for _ in range(self.repeat):
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            template.render({'todos': todos})
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def todos(self, count, now):
+        """Unsaved todos with a spread of statuses, priorities and due dates"""
+        statuses = [status for status, _ in Todo.STATUS_CHOICES]
+        priorities = [priority for priority, _ in Todo.PRIORITY_CHOICES]
+        todos = []
+        for i in range(1, count + 1):
+            status = statuses[i % len(statuses)]
+            todos.append(Todo(
+                pk=i,
+                user_id=1,
+                title=f'Benchmark task {i}',
+                description='Some details about the task. ' * (i % 6),
+                category=('Work', 'Home', '')[i % 3],
+                priority=priorities[i % len(priorities)],
+                status=status,
+                completed=status == 'completed',
+                due_date=now + timedelta(days=i % 30 - 10) if i % 4 else None,
+                created_at=now - timedelta(minutes=i),
+                updated_at=now - timedelta(seconds=i),
+            ))
+        return todos
@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from core.models import DailyActivity, TimeEntry, Todo
+
+
+class Command(BaseCommand):
+    help = 'Backfill the daily activity rollup from existing tasks and time entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows written per INSERT',
+        )
+        parser.add_argument(
+            '--user-ids',
+            type=int,
+            nargs='+',
+            help='Only rebuild these users\' rows; all users by default',
+        )
+
+    def handle(self, *args, **options):
+        rollup = defaultdict(lambda: dict.fromkeys(DailyActivity.COUNTER_FIELDS, 0))
+        todos, entries, existing = Todo.objects.all(), TimeEntry.objects.all(), DailyActivity.objects.all()
+        if options['user_ids'] is not None:
+            todos = todos.filter(user_id__in=options['user_ids'])
+            entries = entries.filter(user_id__in=options['user_ids'])
+            existing = existing.filter(user_id__in=options['user_ids'])
+
+        created = todos.order_by().annotate(day=TruncDate('created_at')).values(
+            'user_id', 'day'
+        ).annotate(count=Count('id'))
+        for row in created:
+            rollup[row['user_id'], row['day']]['tasks_created'] = row['count']
+
+        # Completion events are not stored on Todo; the last update of a
+        # completed task is the closest record of when it was completed.
+        completed = todos.filter(completed=True).order_by().annotate(
+            day=TruncDate('updated_at')
+        ).values('user_id', 'day').annotate(count=Count('id'))
+        for row in completed:
+            rollup[row['user_id'], row['day']]['tasks_completed'] = row['count']
+
+        tracked = entries.filter(duration__isnull=False).order_by().annotate(
+            day=TruncDate('start_time')
+        ).values('user_id', 'day').annotate(total=Sum('duration'))
+        for row in tracked:
+            rollup[row['user_id'], row['day']]['tracked_seconds'] = int(row['total'].total_seconds())
+
+        rows = [
+            DailyActivity(user_id=user_id, day=day, **counts)
+            for (user_id, day), counts in rollup.items()
+        ]
+        with transaction.atomic():
+            existing.delete()
+            DailyActivity.objects.bulk_create(rows, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Daily activity rebuilt ({len(rows)} rows written)'))
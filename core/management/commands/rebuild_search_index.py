@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.search import get_search_backend, install_index
+
+
+class Command(BaseCommand):
+    help = 'Re-create the todo full-text search index and the triggers that maintain it'
+
+    def handle(self, *args, **options):
+        install_index(connection)
+        backend = get_search_backend()
+        self.stdout.write(self.style.SUCCESS(f'Search index ready ({type(backend).__name__})'))
@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import UserTaskStats
+from core.stats import compute_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user task counters and report any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report users whose stored counters have drifted; do not write',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users recomputed per query',
+        )
+        parser.add_argument(
+            '--user-ids',
+            type=int,
+            nargs='+',
+            help='Only recompute these users; all users by default',
+        )
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        batch_size = options['batch_size']
+
+        users = User.objects.order_by('pk')
+        if options['user_ids'] is not None:
+            users = users.filter(pk__in=options['user_ids'])
+        user_ids = list(users.values_list('pk', flat=True))
+        drifted = 0
+        written = 0
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            computed = compute_counters(batch)
+            stored = {stats.user_id: stats for stats in UserTaskStats.objects.filter(user_id__in=batch)}
+
+            to_create = []
+            to_update = []
+            for user_id in batch:
+                counts = computed.get(user_id, {})
+                counts = {field: counts.get(field, 0) for field in UserTaskStats.COUNTER_FIELDS}
+                stats = stored.get(user_id)
+
+                if stats is None:
+                    to_create.append(UserTaskStats(user_id=user_id, **counts))
+                    continue
+
+                changed = {
+                    field: (getattr(stats, field), value)
+                    for field, value in counts.items()
+                    if getattr(stats, field) != value
+                }
+                if changed:
+                    drifted += 1
+                    details = ', '.join(f'{field}: {old} -> {new}' for field, (old, new) in changed.items())
+                    self.stdout.write(self.style.WARNING(f'Drift for user {user_id}: {details}'))
+                    for field, value in counts.items():
+                        setattr(stats, field, value)
+                    to_update.append(stats)
+
+            if check_only:
+                continue
+
+            with transaction.atomic():
+                UserTaskStats.objects.bulk_create(to_create)
+                UserTaskStats.objects.bulk_update(to_update, UserTaskStats.COUNTER_FIELDS)
+            written += len(to_create) + len(to_update)
+
+        self.stdout.write(f'Checked {len(user_ids)} users, {drifted} with drifted counters')
+        if check_only:
+            self.stdout.write(self.style.WARNING('CHECK ONLY - No counters were written'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Task stats rebuilt ({written} rows written)'))
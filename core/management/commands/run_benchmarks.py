@@ -0,0 +1,172 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.models import Notification, TimeEntry, Todo
+
+
+class Command(BaseCommand):
+    help = 'Time the main pages, the notifications API and send_notifications, and write a JSON report'
+
+    SCENARIOS = (
+        'dashboard',
+        'todo_list',
+        'reports',
+        'time_tracking',
+        'notifications_api',
+        'send_notifications',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='User the pages are requested as (default: the user with the most todos)',
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Timed runs per scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed runs per scenario before timing')
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=self.SCENARIOS,
+            help='Run only this scenario (repeatable)',
+        )
+        parser.add_argument('--output', default='perf-report.json', help='Path of the JSON report')
+        parser.add_argument('--compare', help='Earlier JSON report to print the changes against')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        scenarios = options['scenario'] or self.SCENARIOS
+        iterations = options['iterations']
+
+        client = Client()
+        client.force_login(user)
+        runners = {
+            'dashboard': lambda: self.get(client, reverse('dashboard')),
+            'todo_list': lambda: self.get(client, reverse('todo_list')),
+            'reports': lambda: self.get(client, reverse('reports')),
+            'time_tracking': lambda: self.get(client, reverse('time_tracking')),
+            'notifications_api': lambda: self.get(client, reverse('api_notifications')),
+            'send_notifications': self.send_notifications,
+        }
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name in scenarios:
+                results[name] = self.measure(runners[name], iterations, options['warmup'])
+                self.stdout.write(
+                    f'{name:<20} p50 {results[name]["p50_ms"]:>8.2f} ms  '
+                    f'p95 {results[name]["p95_ms"]:>8.2f} ms  '
+                    f'{results[name]["queries"]:>4} queries  '
+                    f'{results[name]["peak_memory_kb"]:>8.1f} KiB peak'
+                )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+            },
+            'dataset': {
+                'user': user.username,
+                'user_todos': Todo.objects.filter(user=user).count(),
+                'todos': Todo.objects.count(),
+                'time_entries': TimeEntry.objects.count(),
+                'notifications': Notification.objects.count(),
+            },
+            'iterations': iterations,
+            'scenarios': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.order_by('-task_stats__total', 'pk').first()
+        if user is None:
+            raise CommandError('No users to benchmark; run seed_perf_data first')
+        return user
+
+    def get(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'GET {path} returned {response.status_code}')
+
+    def send_notifications(self):
+        # Rolled back so every iteration finds the same work to do
+        with transaction.atomic():
+            call_command('send_notifications', stdout=StringIO())
+            transaction.set_rollback(True)
+
+    def measure(self, run, iterations, warmup):
+        for _ in range(warmup):
+            run()
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Queries and memory are counted on a separate run so neither
+        # the query log nor tracemalloc slows the timed ones down.
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))], 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'min_ms': round(timings[0], 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, path, report):
+        with open(path) as previous_file:
+            previous = json.load(previous_file)['scenarios']
+
+        self.stdout.write('')
+        self.stdout.write(f'Compared with {path}:')
+        for name, current in report['scenarios'].items():
+            before = previous.get(name)
+            if before is None:
+                self.stdout.write(f'{name:<20} (not in the earlier report)')
+                continue
+            change = (current['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            line = (
+                f'{name:<20} p50 {before["p50_ms"]:>8.2f} -> {current["p50_ms"]:>8.2f} ms ({change:+.1f}%)  '
+                f'queries {before["queries"]} -> {current["queries"]}'
+            )
+            if change > 10 or current['queries'] > before['queries']:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+from django.utils import timezone
+from core.notifications import expire_ledger
+from core.scheduler import NotificationScheduler
+import time
+
+
+class Command(BaseCommand):
+    # Longest wait between retries while the database keeps failing
+    MAX_BACKOFF_SECONDS = 60
+
+    help = 'Run the notification scheduler daemon (replaces cron runs of send_notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds between checks of the todo change outbox',
+        )
+        parser.add_argument(
+            '--horizon-hours',
+            type=float,
+            default=6.0,
+            help='How far ahead reminders and due dates are loaded into memory',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows fetched or inserted per query',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Schedule and log notifications without actually sending them',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.NOTIFICATION_OUTBOX_ENABLED:
+            raise CommandError(
+                'NOTIFICATION_OUTBOX_ENABLED must be set so todo changes reach the scheduler'
+            )
+
+        poll_interval = options['poll_interval']
+        scheduler = NotificationScheduler(
+            horizon=timezone.timedelta(hours=options['horizon_hours']),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+
+        now = timezone.now()
+        scheduler.start(now)
+        self.stdout.write(f'Notification scheduler started at {now} ({len(scheduler.heap)} events queued)')
+
+        backoff = 0
+        try:
+            while True:
+                # Nothing else recycles the connection in a process that never ends
+                close_old_connections()
+                try:
+                    if backoff:
+                        # A failed pass may have dropped events it had taken off the heap
+                        scheduler.start(timezone.now(), skip_pending=False)
+                    now = timezone.now()
+                    changes = scheduler.poll_changes(now)
+                    if now >= scheduler.refresh_at:
+                        scheduler.load_window(scheduler.loaded_until, now + scheduler.horizon, now)
+                        expire_ledger(now)
+                    sent = scheduler.fire_due(now)
+                except DatabaseError as error:
+                    backoff = min(max(backoff * 2, poll_interval, 1), self.MAX_BACKOFF_SECONDS)
+                    self.stderr.write(f'{timezone.now()}: database error, retrying in {backoff:g}s: {error}')
+                    connection.close_if_unusable_or_obsolete()
+                    time.sleep(backoff)
+                    continue
+                backoff = 0
+
+                if changes or sent:
+                    self.stdout.write(f'{now}: {changes} todo changes, {sent} notifications sent')
+                time.sleep(scheduler.seconds_until_next(timezone.now(), poll_interval))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Notification scheduler stopped'))
@@ -0,0 +1,77 @@
+import time
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.perfdata import generate
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic users, todos, time entries and notifications for performance work'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Number of users to create')
+        parser.add_argument(
+            '--todos-per-user',
+            type=int,
+            default=200,
+            help='Mean todos per user; a few heavy users get many more',
+        )
+        parser.add_argument('--time-entries-per-user', type=int, default=100, help='Mean time entries per user')
+        parser.add_argument('--notifications-per-user', type=int, default=50, help='Mean notifications per user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets')
+        parser.add_argument(
+            '--prefix',
+            default='perf_',
+            help='Username prefix of the generated users',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously generated users with the same prefix (and their rows) first',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows inserted per query',
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            existing = User.objects.filter(username__startswith=f'{prefix}user_')
+            if options['clear']:
+                deleted, _ = existing.delete()
+                self.stdout.write(f'Deleted {deleted} previously generated rows')
+            elif existing.exists():
+                self.stderr.write(self.style.ERROR(
+                    f'Users prefixed "{prefix}user_" already exist; use --clear or another --prefix'
+                ))
+                return
+
+            dataset = generate(
+                users=options['users'],
+                todos_per_user=options['todos_per_user'],
+                time_entries_per_user=options['time_entries_per_user'],
+                notifications_per_user=options['notifications_per_user'],
+                seed=options['seed'],
+                prefix=prefix,
+                batch_size=options['batch_size'],
+            )
+
+        # bulk_create skipped the signal handlers that keep these in step.
+        # Only the generated users are rebuilt; real users keep their rows.
+        output = self.stdout if options['verbosity'] >= 2 else StringIO()
+        call_command('rebuild_task_stats', user_ids=dataset.user_ids, stdout=output)
+        call_command('rebuild_daily_activity', user_ids=dataset.user_ids, stdout=output)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(dataset.user_ids)} users, {dataset.todos} todos, '
+            f'{dataset.time_entries} time entries and {dataset.notifications} notifications in {elapsed:.1f} s'
+        ))
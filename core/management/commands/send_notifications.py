@@ -1,178 +1,175 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q
-from core.models import Todo, Notification, UserProfile
-import datetime
+from core.context_processors import invalidate_notifications
+from core.models import Todo, Notification
+from core.notifications import (
+    DUE_SOON_LEAD, REPEAT_INTERVALS, build_message, claim_notified, expire_ledger, not_notified,
+)
+from core.routers import replica_alias
+import time
 
 
 class Command(BaseCommand):
     help = 'Send notifications for due tasks, reminders, and overdue items'
 
+    # Columns read for every candidate todo; the owner's profile preferences
+    # are joined in so no per-row profile or user lookup is needed.
+    CANDIDATE_FIELDS = (
+        'id',
+        'title',
+        'due_date',
+        'user_id',
+        'user__username',
+        'user__userprofile__sound_notifications',
+    )
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--dry-run',
             action='store_true',
             help='Show what notifications would be sent without actually sending them',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of candidate todos fetched and notifications inserted per batch',
+        )
 
     def handle(self, *args, **options):
-        dry_run = options['dry_run']
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
         now = timezone.now()
 
         self.stdout.write(f'Starting notification check at {now}')
 
         # Check for reminders
-        self.check_reminders(now, dry_run)
+        self.check_reminders(now)
 
         # Check for due soon tasks (due within next hour)
-        self.check_due_soon_tasks(now, dry_run)
+        self.check_due_soon_tasks(now)
 
         # Check for overdue tasks
-        self.check_overdue_tasks(now, dry_run)
+        self.check_overdue_tasks(now)
 
         # Check for completed tasks (if user wants notifications)
-        self.check_completed_tasks(now, dry_run)
+        self.check_completed_tasks(now)
 
-        if dry_run:
+        if not self.dry_run:
+            expired = expire_ledger(now)
+            self.stdout.write(f'Expired {expired} notification ledger entr{"ies" if expired != 1 else "y"}')
+
+        if self.dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN - No notifications were actually sent'))
         else:
             self.stdout.write(self.style.SUCCESS('Notification check completed'))
 
-    def check_reminders(self, now, dry_run):
+    def run_phase(self, notification_type, candidates, now):
+        """Turn every candidate row into a notification, one bulk insert per batch.
+
+        Candidates are scanned on the read replica when one is configured.
+        Returns the number of notifications created.
+        """
+        started = time.perf_counter()
+        batch = []
+        total = 0
+
+        rows = candidates.using(replica_alias()).order_by().values(*self.CANDIDATE_FIELDS).iterator(chunk_size=self.batch_size)
+        for row in rows:
+            title, message = build_message(notification_type, row['title'], row['due_date'], now)
+            batch.append(Notification(
+                user_id=row['user_id'],
+                todo_id=row['id'],
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                sound_enabled=row['user__userprofile__sound_notifications'],
+            ))
+            if self.verbosity >= 2:
+                self.stdout.write(f"{notification_type} notification for: {row['title']} (User: {row['user__username']})")
+
+            if len(batch) >= self.batch_size:
+                total += self.flush(batch, now)
+                batch = []
+        total += self.flush(batch, now)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(f'{notification_type}: {total} notification{"s" if total != 1 else ""} in {elapsed:.1f} ms')
+        return total
+
+    def flush(self, batch, now):
+        if batch and not self.dry_run:
+            with transaction.atomic():
+                # The ledger on the primary decides what is sent. It drops
+                # pairs a lagging replica did not know were sent, and pairs
+                # the scheduler daemon sent while this run was scanning.
+                claimed = claim_notified(
+                    [(notification.todo_id, notification.notification_type) for notification in batch], now
+                )
+                batch = [
+                    notification for notification in batch
+                    if (notification.todo_id, notification.notification_type) in claimed
+                ]
+                Notification.objects.bulk_create(batch)
+            # bulk_create sends no post_save, so drop cached page chrome here
+            invalidate_notifications(*{notification.user_id for notification in batch})
+        return len(batch)
+
+    def check_reminders(self, now):
         """Check for tasks with reminders that should trigger now"""
         # Find todos with reminder_date that has passed and task is not completed
         reminders = Todo.objects.filter(
             reminder_date__lte=now,
-            completed=False
-        ).exclude(
-            # Don't send if we already sent a reminder recently (within last hour)
-            id__in=Notification.objects.filter(
-                notification_type='reminder',
-                created_at__gte=now - datetime.timedelta(hours=1)
-            ).values_list('todo_id', flat=True)
+            completed=False,
+            user__userprofile__reminder_notifications=True,
+        ).filter(
+            # Don't send if we already sent a reminder in the last hour
+            not_notified('reminder', now)
         )
 
-        for todo in reminders:
-            user_profile = UserProfile.objects.filter(user=todo.user).first()
-            if user_profile and user_profile.reminder_notifications:
-                title = f"Reminder: {todo.title}"
-                message = f"Don't forget to work on: {todo.title}"
-
-                if not dry_run:
-                    Notification.objects.create(
-                        user=todo.user,
-                        todo=todo,
-                        notification_type='reminder',
-                        title=title,
-                        message=message,
-                        sound_enabled=user_profile.sound_notifications
-                    )
-
-                self.stdout.write(f"Reminder notification for: {todo.title} (User: {todo.user.username})")
-
-    def check_due_soon_tasks(self, now, dry_run):
+        return self.run_phase('reminder', reminders, now)
+
+    def check_due_soon_tasks(self, now):
         """Check for tasks due within the next hour"""
-        due_soon_threshold = now + datetime.timedelta(hours=1)
+        due_soon_threshold = now + DUE_SOON_LEAD
 
         due_soon_tasks = Todo.objects.filter(
             due_date__lte=due_soon_threshold,
             due_date__gt=now,
-            completed=False
-        ).exclude(
+            completed=False,
+            user__userprofile__due_date_notifications=True,
+        ).filter(
             # Don't send if we already sent a due soon notification recently
-            id__in=Notification.objects.filter(
-                notification_type='due_soon',
-                created_at__gte=now - datetime.timedelta(hours=2)
-            ).values_list('todo_id', flat=True)
+            not_notified('due_soon', now)
         )
 
-        for todo in due_soon_tasks:
-            user_profile = UserProfile.objects.filter(user=todo.user).first()
-            if user_profile and user_profile.due_date_notifications:
-                time_until_due = todo.due_date - now
-                hours_until_due = int(time_until_due.total_seconds() / 3600)
+        return self.run_phase('due_soon', due_soon_tasks, now)
 
-                title = f"Due Soon: {todo.title}"
-                message = f"Task due in {hours_until_due} hour{'s' if hours_until_due != 1 else ''}"
-
-                if not dry_run:
-                    Notification.objects.create(
-                        user=todo.user,
-                        todo=todo,
-                        notification_type='due_soon',
-                        title=title,
-                        message=message,
-                        sound_enabled=user_profile.sound_notifications
-                    )
-
-                self.stdout.write(f"Due soon notification for: {todo.title} (User: {todo.user.username})")
-
-    def check_overdue_tasks(self, now, dry_run):
+    def check_overdue_tasks(self, now):
         """Check for overdue tasks"""
         overdue_tasks = Todo.objects.filter(
             due_date__lt=now,
-            completed=False
-        ).exclude(
+            completed=False,
+            user__userprofile__due_date_notifications=True,
+        ).filter(
             # Don't send overdue notifications more than once per day
-            id__in=Notification.objects.filter(
-                notification_type='overdue',
-                created_at__gte=now - datetime.timedelta(days=1)
-            ).values_list('todo_id', flat=True)
+            not_notified('overdue', now)
         )
 
-        for todo in overdue_tasks:
-            user_profile = UserProfile.objects.filter(user=todo.user).first()
-            if user_profile and user_profile.due_date_notifications:
-                overdue_time = now - todo.due_date
-                days_overdue = overdue_time.days
-                hours_overdue = int(overdue_time.total_seconds() / 3600) % 24
-
-                title = f"Overdue: {todo.title}"
-                if days_overdue > 0:
-                    message = f"Task is {days_overdue} day{'s' if days_overdue != 1 else ''} overdue"
-                else:
-                    message = f"Task is {hours_overdue} hour{'s' if hours_overdue != 1 else ''} overdue"
-
-                if not dry_run:
-                    Notification.objects.create(
-                        user=todo.user,
-                        todo=todo,
-                        notification_type='overdue',
-                        title=title,
-                        message=message,
-                        sound_enabled=user_profile.sound_notifications
-                    )
-
-                self.stdout.write(f"Overdue notification for: {todo.title} (User: {todo.user.username})")
-
-    def check_completed_tasks(self, now, dry_run):
+        return self.run_phase('overdue', overdue_tasks, now)
+
+    def check_completed_tasks(self, now):
         """Check for recently completed tasks"""
         # Only check tasks completed in the last hour
         recent_completions = Todo.objects.filter(
             completed=True,
-            updated_at__gte=now - datetime.timedelta(hours=1)
-        ).exclude(
+            updated_at__gte=now - REPEAT_INTERVALS['completed'],
+            user__userprofile__completed_task_notifications=True,
+        ).filter(
             # Don't send if we already sent a completion notification
-            id__in=Notification.objects.filter(
-                notification_type='completed',
-                created_at__gte=now - datetime.timedelta(hours=1)
-            ).values_list('todo_id', flat=True)
+            not_notified('completed', now)
         )
 
-        for todo in recent_completions:
-            user_profile = UserProfile.objects.filter(user=todo.user).first()
-            if user_profile and user_profile.completed_task_notifications:
-                title = f"Task Completed: {todo.title}"
-                message = f"Great job! You completed: {todo.title}"
-
-                if not dry_run:
-                    Notification.objects.create(
-                        user=todo.user,
-                        todo=todo,
-                        notification_type='completed',
-                        title=title,
-                        message=message,
-                        sound_enabled=user_profile.sound_notifications
-                    )
-
-                self.stdout.write(f"Completion notification for: {todo.title} (User: {todo.user.username})")
\ No newline at end of file
+        return self.run_phase('completed', recent_completions, now)
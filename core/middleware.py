@@ -0,0 +1,35 @@
+"""Middleware that keeps the request path async under ASGI.
+
+Django runs every sync-only middleware in a thread when serving ASGI, and
+one sync middleware anywhere in the stack puts every async view behind a
+thread hop. WhiteNoise only ships a sync middleware, so ``StaticFilesMiddleware``
+adds the async half. Looking up a static file is a dictionary read (or a
+filesystem check when autorefreshing in development), cheap enough to do on
+the event loop.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_todo_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('in_progress', models.PositiveIntegerField(default=0)),
+                ('status_completed', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('incomplete', models.PositiveIntegerField(default=0)),
+                ('high_priority', models.PositiveIntegerField(default=0)),
+                ('medium_priority', models.PositiveIntegerField(default=0)),
+                ('low_priority', models.PositiveIntegerField(default=0)),
+                ('high_priority_total', models.PositiveIntegerField(default=0)),
+                ('medium_priority_total', models.PositiveIntegerField(default=0)),
+                ('low_priority_total', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:23
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_activity(apps, schema_editor):
+    # Reports read only the rollup, so derive it from the existing rows the
+    # same way rebuild_daily_activity does
+    DailyActivity = apps.get_model('core', 'DailyActivity')
+    Todo = apps.get_model('core', 'Todo')
+    TimeEntry = apps.get_model('core', 'TimeEntry')
+    rollup = defaultdict(dict)
+
+    created = Todo.objects.order_by().annotate(day=TruncDate('created_at')).values(
+        'user_id', 'day'
+    ).annotate(count=Count('id'))
+    for row in created:
+        rollup[row['user_id'], row['day']]['tasks_created'] = row['count']
+
+    completed = Todo.objects.filter(completed=True).order_by().annotate(
+        day=TruncDate('updated_at')
+    ).values('user_id', 'day').annotate(count=Count('id'))
+    for row in completed:
+        rollup[row['user_id'], row['day']]['tasks_completed'] = row['count']
+
+    tracked = TimeEntry.objects.filter(duration__isnull=False).order_by().annotate(
+        day=TruncDate('start_time')
+    ).values('user_id', 'day').annotate(total=Sum('duration'))
+    for row in tracked:
+        rollup[row['user_id'], row['day']]['tracked_seconds'] = int(row['total'].total_seconds())
+
+    DailyActivity.objects.bulk_create(
+        (DailyActivity(user_id=user_id, day=day, **counts) for (user_id, day), counts in rollup.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_usertaskstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('tasks_created', models.PositiveIntegerField(default=0)),
+                ('tasks_completed', models.PositiveIntegerField(default=0)),
+                ('tracked_seconds', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_daily_activity_per_user')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_activity, migrations.RunPython.noop),
+    ]
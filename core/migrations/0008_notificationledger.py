@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_todochange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('reminder', 'Reminder'), ('due_soon', 'Due Soon'), ('overdue', 'Overdue'), ('completed', 'Completed'), ('system', 'System')], max_length=20)),
+                ('window_start', models.DateTimeField(db_index=True)),
+                ('todo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.todo')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('todo', 'notification_type', 'window_start'), name='unique_notification_per_window')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_index(apps, schema_editor):
+    from core.search import install_index
+    install_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from core.search import drop_index
+    drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_todo_notification_timeentry_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_index, drop_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:51
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def close_extra_active_entries(apps, schema_editor):
+    # Keep each user's newest running entry. Older ones are closed with a zero
+    # duration, so the DailyActivity rollup, which ignores open entries, is
+    # still correct.
+    TimeEntry = apps.get_model('core', 'TimeEntry')
+    newest = {}
+    for entry_id, user_id in (TimeEntry.objects.filter(is_active=True)
+                              .order_by('-start_time', '-id').values_list('id', 'user_id')):
+        newest.setdefault(user_id, entry_id)
+    (TimeEntry.objects.filter(is_active=True).exclude(id__in=newest.values())
+     .update(is_active=False, end_time=F('start_time'), duration=timedelta(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_todo_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timeentry',
+            name='timeentry_user_active_idx',
+        ),
+        migrations.RunPython(close_extra_active_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timeentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('user',), name='unique_active_time_entry'),
+        ),
+    ]
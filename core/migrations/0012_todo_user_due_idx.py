@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_timeentry_unique_active'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('due_date__isnull', False)), fields=['user', 'due_date'], name='todo_user_due_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:10
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+# REPEAT_INTERVALS in core.notifications when this migration was written
+REPEAT_INTERVALS = {
+    'reminder': timedelta(hours=1),
+    'due_soon': timedelta(hours=2),
+    'overdue': timedelta(days=1),
+    'completed': timedelta(hours=1),
+}
+
+
+def keep_latest_window(apps, schema_editor):
+    # A window row only says a send happened somewhere in that window. Keep
+    # the latest window per todo and type and date it at the window's end,
+    # so no notification is repeated early across the upgrade.
+    NotificationLedger = apps.get_model('core', 'NotificationLedger')
+    latest = (NotificationLedger.objects.order_by().values('todo_id', 'notification_type')
+              .annotate(latest=Max('id')).values_list('latest', flat=True))
+    NotificationLedger.objects.exclude(id__in=list(latest)).delete()
+    for notification_type, interval in REPEAT_INTERVALS.items():
+        (NotificationLedger.objects.filter(notification_type=notification_type)
+         .update(notified_at=F('notified_at') + interval))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_todo_user_due_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='notificationledger',
+            name='unique_notification_per_window',
+        ),
+        migrations.RenameField(
+            model_name='notificationledger',
+            old_name='window_start',
+            new_name='notified_at',
+        ),
+        migrations.RunPython(keep_latest_window, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notificationledger',
+            constraint=models.UniqueConstraint(fields=('todo', 'notification_type'), name='unique_notification_ledger_entry'),
+        ),
+    ]
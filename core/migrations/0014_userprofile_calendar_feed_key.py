@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+import core.models
+
+
+def give_each_profile_a_key(apps, schema_editor):
+    # AddField fills existing rows with a single default value; each profile
+    # needs a key of its own
+    UserProfile = apps.get_model('core', 'UserProfile')
+    profiles = list(UserProfile.objects.only('id'))
+    for profile in profiles:
+        profile.calendar_feed_key = core.models.new_calendar_feed_key()
+    UserProfile.objects.bulk_update(profiles, ['calendar_feed_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_notificationledger_notified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='calendar_feed_key',
+            field=models.CharField(default=core.models.new_calendar_feed_key, max_length=32),
+        ),
+        migrations.RunPython(give_each_profile_a_key, migrations.RunPython.noop),
+    ]
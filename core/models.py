@@ -1,8 +1,85 @@
-from django.db import models
+import secrets
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-class Todo(models.Model):
+
+class TrackedFieldsMixin:
+    """Remember the stored values of ``TRACKED_FIELDS`` as loaded from the
+    database, and wrap writes in a transaction, so signal handlers can keep
+    derived tables in step with the row by applying deltas."""
+
+    TRACKED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_loaded_values()
+
+    def _remember_loaded_values(self):
+        self._loaded_values = {
+            field: getattr(self, field)
+            for field in self.TRACKED_FIELDS
+            if field in self.__dict__
+        }
+
+    def tracked_values(self):
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+    def stored_values(self):
+        """Return the tracked values as last read from or written to the
+        database, fetching them if the instance has no full snapshot."""
+        loaded = getattr(self, '_loaded_values', {})
+        if len(loaded) != len(self.TRACKED_FIELDS):
+            loaded = type(self)._base_manager.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+            self._loaded_values = loaded
+        return loaded
+
+    def save(self, *args, **kwargs):
+        # Derived-table updates run in post_save and must commit with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def save_changes(self, **values):
+        """Set ``values`` and save only the fields whose value changes.
+
+        Form strings are converted with the field's ``to_python`` before
+        comparing, and ``auto_now`` fields are saved along with any change.
+        Nothing is written when no value differs. Returns the names of the
+        changed fields.
+        """
+        changed = []
+        for name, value in values.items():
+            field = self._meta.get_field(name)
+            value = field.to_python(value)
+            if isinstance(value, datetime) and settings.USE_TZ and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            if getattr(self, field.attname) != value:
+                setattr(self, field.attname, value)
+                changed.append(field.name)
+        if changed:
+            auto_now = [field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)]
+            self.save(update_fields=[*changed, *auto_now])
+        return changed
+
+    async def asave_changes(self, **values):
+        return await sync_to_async(self.save_changes)(**values)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class Todo(TrackedFieldsMixin, models.Model):
     PRIORITY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -27,6 +104,10 @@ class Todo(models.Model):
     reminder_date = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    # Fields whose previous values are remembered so counter tables can be
+    # adjusted by delta and the scheduler told about date changes.
+    TRACKED_FIELDS = ('user_id', 'status', 'priority', 'completed', 'due_date', 'reminder_date')
+
     def __str__(self):
         return self.title
 
@@ -42,6 +123,43 @@ class Todo(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Task list, dashboard and stats; filtered by status or open due dates
+            models.Index(fields=['user', '-created_at', '-id'], name='todo_user_created_idx'),
+            models.Index(fields=['user', 'status', '-created_at', '-id'], name='todo_user_status_idx'),
+            models.Index(
+                fields=['user', 'due_date'],
+                name='todo_user_open_due_idx',
+                condition=models.Q(completed=False, due_date__isnull=False),
+            ),
+            # Calendar ranges, which include completed tasks
+            models.Index(
+                fields=['user', 'due_date'],
+                name='todo_user_due_idx',
+                condition=models.Q(due_date__isnull=False),
+            ),
+            models.Index(
+                fields=['user', 'reminder_date'],
+                name='todo_user_open_reminder_idx',
+                condition=models.Q(completed=False, reminder_date__isnull=False),
+            ),
+            # Cross-user scans by send_notifications and the scheduler
+            models.Index(
+                fields=['due_date'],
+                name='todo_open_due_idx',
+                condition=models.Q(completed=False, due_date__isnull=False),
+            ),
+            models.Index(
+                fields=['reminder_date'],
+                name='todo_open_reminder_idx',
+                condition=models.Q(completed=False, reminder_date__isnull=False),
+            ),
+            models.Index(
+                fields=['updated_at'],
+                name='todo_completed_updated_idx',
+                condition=models.Q(completed=True),
+            ),
+        ]
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
@@ -66,8 +184,72 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Unread feed in the page chrome, and since_id polling
+            models.Index(
+                fields=['user', '-created_at'],
+                name='notification_user_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
+            models.Index(
+                fields=['user', 'id'],
+                name='notification_unread_id_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
+
+class TodoChange(models.Model):
+    """Outbox of Todo changes that affect notification timing.
+
+    Written alongside the Todo row when ``NOTIFICATION_OUTBOX_ENABLED`` is set
+    and consumed (then pruned) by the run_notification_scheduler command.
+    """
+
+    EVENT_CHOICES = [
+        ('saved', 'Saved'),
+        ('completed', 'Completed'),
+        ('deleted', 'Deleted'),
+    ]
+
+    # Plain ids rather than foreign keys: the row must outlive a deleted todo
+    todo_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES, default='saved')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Todo {self.todo_id} {self.event}"
+
+    class Meta:
+        ordering = ['id']
+
+class NotificationLedger(models.Model):
+    """When each todo was last notified about, per type.
+
+    One row per todo and type. A sender claims a notification by replacing
+    an expired row; the unique constraint lets only one of two racing
+    senders insert, so a cron run and the scheduler daemon never both send.
+    The "already notified?" check stays a single index probe however large
+    the Notification table grows. Rows older than the longest repeat
+    interval are useless and are expired by the notification commands.
+    """
 
-class TimeEntry(models.Model):
+    todo = models.ForeignKey(Todo, on_delete=models.CASCADE)
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    notified_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.todo_id} - {self.notification_type} - {self.notified_at}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['todo', 'notification_type'],
+                name='unique_notification_ledger_entry',
+            ),
+        ]
+
+class TimeEntry(TrackedFieldsMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     todo = models.ForeignKey(Todo, on_delete=models.CASCADE, null=True, blank=True)
     start_time = models.DateTimeField()
@@ -77,16 +259,37 @@ class TimeEntry(models.Model):
     is_active = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    TRACKED_FIELDS = ('user_id', 'start_time', 'duration')
+
     def __str__(self):
         return f"{self.user.username} - {self.todo.title if self.todo else 'General'} - {self.start_time}"
 
     def save(self, *args, **kwargs):
         if self.end_time and self.start_time:
             self.duration = self.end_time - self.start_time
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'start_time', 'end_time'} & set(update_fields):
+            # The duration is derived from the times and must be saved with them
+            kwargs['update_fields'] = {*update_fields, 'duration'}
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['user', '-start_time'], name='timeentry_user_start_idx'),
+        ]
+        constraints = [
+            # At most one running timer per user; also serves the active-entry lookup
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_active=True),
+                name='unique_active_time_entry',
+            ),
+        ]
+
+def new_calendar_feed_key():
+    return secrets.token_urlsafe(24)
+
 
 class UserProfile(models.Model):
     THEME_CHOICES = [
@@ -112,8 +315,74 @@ class UserProfile(models.Model):
     items_per_page = models.IntegerField(default=10)
     default_priority = models.CharField(max_length=10, default='medium')
 
+    # Signed into the calendar feed URL; replacing it revokes the old URL
+    calendar_feed_key = models.CharField(max_length=32, default=new_calendar_feed_key)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.username}'s profile"
+
+class UserTaskStats(models.Model):
+    """Denormalized per-user task counters, maintained by core.signals."""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='task_stats')
+    total = models.PositiveIntegerField(default=0)
+
+    # By status
+    pending = models.PositiveIntegerField(default=0)
+    in_progress = models.PositiveIntegerField(default=0)
+    status_completed = models.PositiveIntegerField(default=0)
+
+    # By completion flag
+    completed = models.PositiveIntegerField(default=0)
+    incomplete = models.PositiveIntegerField(default=0)
+
+    # By priority, open tasks only
+    high_priority = models.PositiveIntegerField(default=0)
+    medium_priority = models.PositiveIntegerField(default=0)
+    low_priority = models.PositiveIntegerField(default=0)
+
+    # By priority, all tasks
+    high_priority_total = models.PositiveIntegerField(default=0)
+    medium_priority_total = models.PositiveIntegerField(default=0)
+    low_priority_total = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = (
+        'total', 'pending', 'in_progress', 'status_completed', 'completed', 'incomplete',
+        'high_priority', 'medium_priority', 'low_priority',
+        'high_priority_total', 'medium_priority_total', 'low_priority_total',
+    )
+
+    def __str__(self):
+        return f"{self.user.username}'s task stats"
+
+
+class DailyActivity(models.Model):
+    """Per-user, per-day activity rollup read by reports instead of raw rows.
+
+    Task counters record events and are only ever incremented: a task
+    completed, reopened and completed again counts twice, and deleting a
+    task does not rewrite the days it was created or completed on. Tracked
+    seconds follow the closed time entries themselves.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    day = models.DateField()
+    tasks_created = models.PositiveIntegerField(default=0)
+    tasks_completed = models.PositiveIntegerField(default=0)
+    tracked_seconds = models.BigIntegerField(default=0)
+
+    COUNTER_FIELDS = ('tasks_created', 'tasks_completed', 'tracked_seconds')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.day}"
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_daily_activity_per_user'),
+        ]
@@ -0,0 +1,127 @@
+"""Notification wording, timing and dedup rules shared by the notification commands."""
+import datetime
+
+from django.db.models import Exists, OuterRef
+
+from .models import NotificationLedger
+
+
+# How long after sending a notification of each type the same todo is left
+# alone before it may be notified again.
+REPEAT_INTERVALS = {
+    'reminder': datetime.timedelta(hours=1),
+    'due_soon': datetime.timedelta(hours=2),
+    'overdue': datetime.timedelta(days=1),
+    'completed': datetime.timedelta(hours=1),
+}
+
+# How far ahead of the due date a due soon notification is sent.
+DUE_SOON_LEAD = datetime.timedelta(hours=1)
+
+# Which UserProfile preference switches each notification type on.
+PREFERENCES = {
+    'reminder': 'reminder_notifications',
+    'due_soon': 'due_date_notifications',
+    'overdue': 'due_date_notifications',
+    'completed': 'completed_task_notifications',
+}
+
+
+def _plural(count, unit):
+    return f"{count} {unit}{'s' if count != 1 else ''}"
+
+
+def build_message(notification_type, title, due_date, now):
+    """Return ``(title, message)`` for a notification about a todo."""
+    if notification_type == 'reminder':
+        return f"Reminder: {title}", f"Don't forget to work on: {title}"
+
+    if notification_type == 'due_soon':
+        hours_until_due = int((due_date - now).total_seconds() / 3600)
+        return f"Due Soon: {title}", f"Task due in {_plural(hours_until_due, 'hour')}"
+
+    if notification_type == 'overdue':
+        overdue_time = now - due_date
+        days_overdue = overdue_time.days
+        hours_overdue = int(overdue_time.total_seconds() / 3600) % 24
+        if days_overdue > 0:
+            message = f"Task is {_plural(days_overdue, 'day')} overdue"
+        else:
+            message = f"Task is {_plural(hours_overdue, 'hour')} overdue"
+        return f"Overdue: {title}", message
+
+    if notification_type == 'completed':
+        return f"Task Completed: {title}", f"Great job! You completed: {title}"
+
+    raise ValueError(f'Unknown notification type: {notification_type}')
+
+
+def not_notified(notification_type, now):
+    """Filter for todos not notified about within the type's repeat interval."""
+    return ~Exists(NotificationLedger.objects.filter(
+        todo_id=OuterRef('pk'),
+        notification_type=notification_type,
+        notified_at__gt=now - REPEAT_INTERVALS[notification_type],
+    ))
+
+
+def _by_type(pairs):
+    by_type = {}
+    for todo_id, notification_type in pairs:
+        by_type.setdefault(notification_type, set()).add(todo_id)
+    return by_type
+
+
+def already_notified(pairs, now):
+    """Return which (todo_id, notification_type) pairs were notified within
+    their repeat interval."""
+    notified = set()
+    for notification_type, todo_ids in _by_type(pairs).items():
+        notified.update(
+            NotificationLedger.objects.filter(
+                todo_id__in=todo_ids,
+                notification_type=notification_type,
+                notified_at__gt=now - REPEAT_INTERVALS[notification_type],
+            ).values_list('todo_id', 'notification_type')
+        )
+    return notified
+
+
+def claim_notified(pairs, now, batch_size=None):
+    """Record (todo_id, notification_type) pairs as notified at ``now``.
+
+    Returns the pairs this call recorded. A pair notified within its repeat
+    interval, including by a concurrent sender, is not claimed again, so
+    only the claimed pairs should be sent. Run inside a transaction together
+    with the Notification insert.
+    """
+    by_type = _by_type(pairs)
+    for notification_type, todo_ids in by_type.items():
+        NotificationLedger.objects.filter(
+            todo_id__in=todo_ids,
+            notification_type=notification_type,
+            notified_at__lte=now - REPEAT_INTERVALS[notification_type],
+        ).delete()
+    NotificationLedger.objects.bulk_create(
+        [
+            NotificationLedger(todo_id=todo_id, notification_type=notification_type, notified_at=now)
+            for notification_type, todo_ids in by_type.items()
+            for todo_id in todo_ids
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    # The unique constraint kept every row another sender already holds
+    return set(
+        NotificationLedger.objects.filter(
+            todo_id__in={todo_id for todo_id, _ in pairs},
+            notification_type__in=by_type,
+            notified_at=now,
+        ).values_list('todo_id', 'notification_type')
+    ) & set(pairs)
+
+
+def expire_ledger(now):
+    """Delete ledger rows that can no longer suppress a notification."""
+    oldest = now - max(REPEAT_INTERVALS.values())
+    return NotificationLedger.objects.filter(notified_at__lt=oldest).delete()[0]
@@ -0,0 +1,120 @@
+import base64
+import datetime
+import json
+from dataclasses import dataclass, field
+
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+
+from .models import Todo
+from .search import get_search_backend
+
+# Undated tasks sort after every dated one
+NO_DUE_DATE = datetime.datetime(9999, 12, 31, tzinfo=datetime.timezone.utc)
+
+# sort name -> (ordering key, descending)
+TASK_SORTS = {
+    'created_at': ('created_at', True),
+    'due_date': ('due_sort', False),
+    'priority': ('priority_rank', True),
+    'title': ('title', False),
+}
+DATETIME_KEYS = {'created_at', 'due_sort', 'start_time'}
+
+
+@dataclass(frozen=True)
+class TaskFilters:
+    q: str = ''
+    status: str = ''
+    priority: str = ''
+    sort: str = 'created_at'
+
+    @classmethod
+    def from_query(cls, params):
+        status = params.get('status', '')
+        priority = params.get('priority', '')
+        sort = params.get('sort', '')
+        return cls(
+            q=params.get('q', '').strip(),
+            status=status if status in dict(Todo.STATUS_CHOICES) else '',
+            priority=priority if priority in dict(Todo.PRIORITY_CHOICES) else '',
+            sort=sort if sort in TASK_SORTS else 'created_at',
+        )
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    items: list = field(default_factory=list)
+    next_cursor: str = ''
+
+
+def filter_tasks(user, filters):
+    todos = Todo.objects.filter(user=user)
+    if filters.status:
+        todos = todos.filter(status=filters.status)
+    if filters.priority:
+        todos = todos.filter(priority=filters.priority)
+    if filters.q:
+        todos = get_search_backend().filter(todos, filters.q, user_id=user.pk)
+
+    key, _ = TASK_SORTS[filters.sort]
+    if key == 'due_sort':
+        todos = todos.annotate(due_sort=Coalesce('due_date', Value(NO_DUE_DATE)))
+    elif key == 'priority_rank':
+        todos = todos.annotate(priority_rank=Case(
+            When(priority='high', then=Value(3)),
+            When(priority='medium', then=Value(2)),
+            When(priority='low', then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    return todos
+
+
+def encode_cursor(key, todo):
+    value = getattr(todo, key)
+    if key in DATETIME_KEYS:
+        value = value.isoformat()
+    raw = json.dumps([value, todo.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(key, cursor):
+    """Return ``(value, pk)`` from a cursor, or ``None`` if it is unusable."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        if key in DATETIME_KEYS:
+            value = parse_datetime(value)
+        if value is None or not isinstance(pk, int):
+            return None
+        return value, pk
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, key, descending, cursor='', page_size=10):
+    """Return the page of ``queryset`` ordered by ``key`` that follows ``cursor``.
+
+    The sort key plus the primary key identify the last row of a page, so
+    fetching a later page costs the same as the first one.
+    """
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{key}', f'{prefix}pk')
+
+    position = decode_cursor(key, cursor) if cursor else None
+    if position is not None:
+        value, pk = position
+        after = 'lt' if descending else 'gt'
+        queryset = queryset.filter(Q(**{f'{key}__{after}': value}) | Q(**{key: value, f'pk__{after}': pk}))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(key, items[page_size - 1]) if len(items) > page_size else ''
+    return KeysetPage(items=items[:page_size], next_cursor=next_cursor)
+
+
+def paginate_tasks(todos, filters, cursor='', page_size=10):
+    """Return one page of ``todos`` in ``filters.sort`` order."""
+    key, descending = TASK_SORTS[filters.sort]
+    return keyset_page(todos, key, descending, cursor, page_size)
@@ -0,0 +1,134 @@
+"""Synthetic data for the performance commands.
+
+Rows are written with ``bulk_create``, which bypasses the signal handlers,
+so callers that need the counter and rollup tables rebuild them afterwards
+(seed_perf_data does). Distributions are skewed the way real usage is: a
+few heavy users own most of the tasks, most time entries are short, and
+most notifications have been read.
+"""
+import random
+from dataclasses import dataclass
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import Notification, TimeEntry, Todo, UserProfile
+
+TITLE_VERBS = ['Write', 'Review', 'Fix', 'Plan', 'Call', 'Email', 'Prepare', 'Update', 'Book', 'Test']
+TITLE_NOUNS = [
+    'report', 'invoice', 'slides', 'release notes', 'budget', 'dentist', 'client', 'roadmap',
+    'newsletter', 'backup', 'contract', 'onboarding doc', 'flight', 'sprint board', 'groceries',
+]
+CATEGORIES = ['work', 'personal', 'home', 'health', 'finance', 'learning', 'errands', '']
+DESCRIPTION_WORDS = (
+    'follow up with the team about the draft and check numbers before the meeting '
+    'remember to attach the latest version and ask for feedback by friday'
+).split()
+
+
+@dataclass(frozen=True)
+class PerfDataset:
+    user_ids: list
+    todos: int = 0
+    time_entries: int = 0
+    notifications: int = 0
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def generate(users=100, todos_per_user=200, time_entries_per_user=100, notifications_per_user=50,
+             seed=0, prefix='perf_', now=None, batch_size=1000):
+    """Bulk-insert users with profiles, todos, time entries and notifications.
+
+    The per-user counts are means; each user gets a Pareto-distributed share.
+    """
+    rng = random.Random(seed)
+    now = now or timezone.now()
+
+    User.objects.bulk_create(
+        [User(username=f'{prefix}user_{i}', password='!') for i in range(users)], batch_size=batch_size
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith=f'{prefix}user_').order_by('pk').values_list('pk', flat=True)
+    )
+    UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in user_ids], batch_size=batch_size)
+
+    # Pareto weights normalised to a mean of 1: a long tail of heavy users
+    shares = [rng.paretovariate(1.5) for _ in user_ids]
+    scale = len(shares) / sum(shares)
+    shares = [share * scale for share in shares]
+
+    todos = []
+    for user_id, share in zip(user_ids, shares):
+        for _ in range(max(1, round(todos_per_user * share))):
+            status = _weighted(rng, {'pending': 45, 'in_progress': 15, 'completed': 40})
+            created_at = now - timezone.timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+            due_date = None
+            reminder_date = None
+            if rng.random() < 0.7:
+                due_date = created_at + timezone.timedelta(hours=rng.randint(1, 45 * 24))
+                if rng.random() < 0.3:
+                    reminder_date = due_date - timezone.timedelta(hours=rng.choice([1, 2, 24]))
+            todo = Todo(
+                user_id=user_id,
+                title=f'{rng.choice(TITLE_VERBS)} {rng.choice(TITLE_NOUNS)}',
+                description=' '.join(rng.sample(DESCRIPTION_WORDS, rng.randint(0, 12))),
+                priority=_weighted(rng, {'low': 30, 'medium': 50, 'high': 20}),
+                category=rng.choice(CATEGORIES),
+                status=status,
+                completed=status == 'completed',
+                due_date=due_date,
+                reminder_date=reminder_date,
+            )
+            # Applied after the insert: bulk_create fills auto_now(_add) fields
+            todo.seed_created_at = created_at
+            todo.seed_updated_at = min(created_at + timezone.timedelta(hours=rng.randint(0, 14 * 24)), now)
+            todos.append(todo)
+
+    Todo.objects.bulk_create(todos, batch_size=batch_size)
+    for todo in todos:
+        todo.created_at = todo.seed_created_at
+        todo.updated_at = todo.seed_updated_at
+    Todo.objects.bulk_update(todos, ['created_at', 'updated_at'], batch_size=batch_size)
+
+    todo_ids = {}
+    for todo in todos:
+        todo_ids.setdefault(todo.user_id, []).append(todo.pk)
+
+    entries = []
+    for user_id, share in zip(user_ids, shares):
+        for _ in range(round(time_entries_per_user * share)):
+            start_time = now - timezone.timedelta(days=rng.randint(0, 89), hours=rng.randint(0, 10))
+            minutes = min(rng.lognormvariate(3.2, 0.8), 8 * 60)
+            end_time = start_time + timezone.timedelta(minutes=minutes)
+            entries.append(TimeEntry(
+                user_id=user_id,
+                todo_id=rng.choice(todo_ids[user_id]) if rng.random() < 0.7 else None,
+                start_time=start_time,
+                end_time=end_time,
+                duration=end_time - start_time,
+            ))
+    TimeEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+    notifications = []
+    for user_id, share in zip(user_ids, shares):
+        for _ in range(round(notifications_per_user * share)):
+            notification_type = _weighted(rng, {'reminder': 30, 'due_soon': 30, 'overdue': 30, 'completed': 10})
+            notifications.append(Notification(
+                user_id=user_id,
+                todo_id=rng.choice(todo_ids[user_id]),
+                notification_type=notification_type,
+                title=notification_type.replace('_', ' ').title(),
+                message='Synthetic notification',
+                is_read=rng.random() < 0.85,
+            ))
+    Notification.objects.bulk_create(notifications, batch_size=batch_size)
+
+    return PerfDataset(
+        user_ids=user_ids,
+        todos=len(todos),
+        time_entries=len(entries),
+        notifications=len(notifications),
+    )
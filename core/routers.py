@@ -0,0 +1,134 @@
+"""Read replica routing for reporting traffic, with read-your-writes pinning.
+
+Writes always go to ``default``. Reads go to the ``READ_REPLICA_ALIAS``
+database only where code opts in: views decorated with ``use_replica``,
+blocks run under ``replica_reads()`` and querysets bound explicitly with
+``.using(replica_alias())``. Everything else reads the primary. With no
+replica configured every read goes to ``default``.
+
+A replica lags the primary. ``ReplicaPinningMiddleware`` notes in the
+session when a request wrote, and for ``REPLICA_PIN_SECONDS`` afterwards
+that session's replica reads go to the primary, so a user who has just
+changed a task sees the change in their reports.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_SESSION_KEY = '_replica_pinned_until'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pinned = ContextVar('replica_pinned', default=False)
+# The current request's list of written models, while the middleware runs
+_request_writes = ContextVar('replica_request_writes', default=None)
+
+
+def replica_alias():
+    """The alias replica-eligible reads should use right now."""
+    alias = settings.READ_REPLICA_ALIAS
+    if alias and not _pinned.get():
+        return alias
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads():
+    """Route the reads made inside this block to the replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def use_replica(view):
+    """Run a read-only view's queries against the replica.
+
+    Querysets the view hands back unevaluated, such as a streamed response's
+    rows, are read after the view returns and must be bound with
+    ``.using(replica_alias())`` instead.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replica_alias() if _replica_reads.get() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes.append(model._meta.label)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows
+        aliases = {DEFAULT_DB_ALIAS, settings.READ_REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary
+        if settings.READ_REPLICA_ALIAS and db == settings.READ_REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Keep a session's reads on the primary for a while after it writes.
+
+    Must run after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        writes = []
+        pinned_token = _pinned.set(request.session.get(PIN_SESSION_KEY, 0) > time.time())
+        writes_token = _request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_writes.reset(writes_token)
+            _pinned.reset(pinned_token)
+
+        # Logging out writes too, but leaves nothing to read back
+        if writes and request.user.is_authenticated:
+            request.session[PIN_SESSION_KEY] = time.time() + self.pin_seconds
+        return response
+
+    async def __acall__(self, request):
+        # Async views query through sync_to_async, which copies this context
+        # into its thread, so the router sees the same pin and write list
+        writes = []
+        pinned_token = _pinned.set(await request.session.aget(PIN_SESSION_KEY, 0) > time.time())
+        writes_token = _request_writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_writes.reset(writes_token)
+            _pinned.reset(pinned_token)
+
+        if writes and (await request.auser()).is_authenticated:
+            await request.session.aset(PIN_SESSION_KEY, time.time() + self.pin_seconds)
+        return response
@@ -0,0 +1,219 @@
+"""In-process notification scheduler used by run_notification_scheduler.
+
+Upcoming reminder, due soon and overdue events are kept in a min-heap keyed
+by the time they fire. Todo changes arrive through the TodoChange outbox, so
+after the initial load the database is only asked for the todos that
+changed and, once per horizon, for todos whose dates enter the window.
+"""
+import heapq
+import itertools
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .context_processors import invalidate_notifications
+from .models import Notification, Todo, TodoChange
+from .notifications import (
+    DUE_SOON_LEAD, PREFERENCES, REPEAT_INTERVALS, already_notified, build_message, claim_notified,
+)
+
+
+class NotificationScheduler:
+    TODO_FIELDS = (
+        'id',
+        'title',
+        'user_id',
+        'completed',
+        'due_date',
+        'reminder_date',
+        'user__userprofile__sound_notifications',
+    ) + tuple(f'user__userprofile__{preference}' for preference in set(PREFERENCES.values()))
+
+    def __init__(self, horizon=timezone.timedelta(hours=6), batch_size=500, dry_run=False):
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.heap = []
+        # Heap entries carry the generation of their todo when pushed; a
+        # change gives the todo a new one, which invalidates the older
+        # entries. Only todos with entries left in the heap are tracked, so
+        # both maps stay as small as the heap in a daemon that never restarts.
+        self.generations = {}
+        self.pending = {}
+        self.sequence = itertools.count()
+        self.loaded_until = None
+
+    def start(self, now, skip_pending=True):
+        """Load the schedule from scratch; also used to recover after a database error.
+
+        On a first start, pending outbox rows are dropped because the initial
+        load covers them. A recovering daemon keeps them, so completions
+        recorded while it was failing are still announced.
+        """
+        self.heap = []
+        self.generations = {}
+        self.pending = {}
+        if skip_pending:
+            TodoChange.objects.all().delete()
+        self.load_window(None, now + self.horizon, now)
+
+    @property
+    def refresh_at(self):
+        return self.loaded_until - self.horizon / 2
+
+    def load_window(self, start, end, now):
+        """Schedule open todos whose reminder or due soon time falls in (start, end]."""
+        reminder = Q(reminder_date__lte=end)
+        due = Q(due_date__lte=end + DUE_SOON_LEAD)
+        if start is not None:
+            reminder &= Q(reminder_date__gt=start)
+            due &= Q(due_date__gt=start + DUE_SOON_LEAD)
+
+        todos = Todo.objects.filter(reminder | due, completed=False).order_by().values(*self.TODO_FIELDS)
+        loaded = 0
+        for todo in todos.iterator(chunk_size=self.batch_size):
+            self.schedule(todo, now)
+            loaded += 1
+        self.loaded_until = end
+        return loaded
+
+    def push(self, fire_at, todo_id, notification_type):
+        generation = self.generations.setdefault(todo_id, next(self.sequence))
+        heapq.heappush(self.heap, (fire_at, next(self.sequence), todo_id, notification_type, generation))
+        self.pending[todo_id] = self.pending.get(todo_id, 0) + 1
+
+    def pop(self):
+        entry = heapq.heappop(self.heap)
+        todo_id = entry[2]
+        self.pending[todo_id] -= 1
+        if not self.pending[todo_id]:
+            del self.pending[todo_id]
+            self.generations.pop(todo_id, None)
+        return entry
+
+    def forget(self, todo_id):
+        # Generations come from the shared sequence, so the next push never
+        # reuses a value that entries still in the heap carry
+        self.generations.pop(todo_id, None)
+
+    def schedule(self, todo, now):
+        """(Re)schedule every upcoming event for a todo row."""
+        self.forget(todo['id'])
+        if todo['completed']:
+            return
+        if todo['reminder_date'] is not None:
+            self.push(max(todo['reminder_date'], now), todo['id'], 'reminder')
+        if todo['due_date'] is not None:
+            if todo['due_date'] > now:
+                self.push(max(todo['due_date'] - DUE_SOON_LEAD, now), todo['id'], 'due_soon')
+            self.push(max(todo['due_date'], now), todo['id'], 'overdue')
+
+    def poll_changes(self, now):
+        """Apply the oldest outbox rows. Returns the row count.
+
+        There is no high-water mark: ids can commit out of order (a sequence
+        hands out an id before its transaction commits), so a row that shows
+        up late below one already seen is still picked up by the next poll.
+        Only the rows read here are deleted.
+        """
+        changes = list(TodoChange.objects.order_by('id')[:self.batch_size])
+        if not changes:
+            return 0
+
+        changed_ids = set()
+        completed_ids = set()
+        for change in changes:
+            if change.event == 'deleted':
+                self.forget(change.todo_id)
+                changed_ids.discard(change.todo_id)
+                completed_ids.discard(change.todo_id)
+            else:
+                changed_ids.add(change.todo_id)
+                if change.event == 'completed':
+                    completed_ids.add(change.todo_id)
+
+        for todo in Todo.objects.filter(id__in=changed_ids).order_by().values(*self.TODO_FIELDS):
+            self.schedule(todo, now)
+            if todo['id'] in completed_ids and todo['completed']:
+                self.push(now, todo['id'], 'completed')
+
+        TodoChange.objects.filter(id__in=[change.id for change in changes]).delete()
+        return len(changes)
+
+    def next_fire_time(self):
+        while self.heap:
+            fire_at, _, todo_id, _, generation = self.heap[0]
+            if self.generations.get(todo_id) == generation:
+                return fire_at
+            self.pop()
+        return None
+
+    def fire_due(self, now):
+        """Send every event due at ``now``. Returns the number of notifications."""
+        due = []
+        while self.next_fire_time() is not None and self.heap[0][0] <= now:
+            _, _, todo_id, notification_type, _ = self.pop()
+            due.append((todo_id, notification_type))
+        if not due:
+            return 0
+
+        todos = {
+            todo['id']: todo
+            for todo in Todo.objects.filter(id__in={todo_id for todo_id, _ in due})
+            .order_by().values(*self.TODO_FIELDS)
+        }
+        recent = already_notified(due, now)
+
+        notifications = []
+        for todo_id, notification_type in due:
+            todo = todos.get(todo_id)
+            if todo is None:
+                continue
+            if notification_type != 'completed':
+                if todo['completed']:
+                    continue
+                # Keep repeating while the todo stays open, as cron runs did
+                if notification_type != 'due_soon':
+                    self.push(now + REPEAT_INTERVALS[notification_type], todo_id, notification_type)
+            if (todo_id, notification_type) in recent:
+                continue
+            if not todo[f'user__userprofile__{PREFERENCES[notification_type]}']:
+                continue
+            recent.add((todo_id, notification_type))
+
+            title, message = build_message(notification_type, todo['title'], todo['due_date'], now)
+            notifications.append(Notification(
+                user_id=todo['user_id'],
+                todo_id=todo_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                sound_enabled=todo['user__userprofile__sound_notifications'],
+            ))
+
+        if notifications and not self.dry_run:
+            with transaction.atomic():
+                # A send_notifications run may have claimed some since the check above
+                claimed = claim_notified(
+                    [(notification.todo_id, notification.notification_type) for notification in notifications],
+                    now,
+                    batch_size=self.batch_size,
+                )
+                notifications = [
+                    notification for notification in notifications
+                    if (notification.todo_id, notification.notification_type) in claimed
+                ]
+                Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+            # bulk_create sends no post_save, so drop cached page chrome here
+            invalidate_notifications(*{notification.user_id for notification in notifications})
+        return len(notifications)
+
+    def seconds_until_next(self, now, poll_interval):
+        """How long the daemon may sleep before it has work to do."""
+        wake_at = now + timezone.timedelta(seconds=poll_interval)
+        next_fire = self.next_fire_time()
+        if next_fire is not None:
+            wake_at = min(wake_at, next_fire)
+        wake_at = min(wake_at, self.refresh_at)
+        return max((wake_at - now).total_seconds(), 0)
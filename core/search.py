@@ -0,0 +1,220 @@
+"""Full-text search over todo titles, descriptions and categories.
+
+On SQLite the ``core_todo_fts`` FTS5 table mirrors ``core_todo`` through
+triggers; on PostgreSQL a generated ``search_vector`` column with a GIN
+index does the same. Both live in the database (see ``install_index``), so
+rows written through ``bulk_create`` or ``QuerySet.update`` stay searchable
+too. Other backends, and SQLite builds without FTS5, fall back to
+``icontains`` scans.
+
+Every word of a query must match, as a word prefix, in any of the three
+fields. Titles rank above categories, which rank above descriptions.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Todo
+
+# Snippet highlight markers, turned into <mark> tags after HTML escaping
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+
+def query_terms(query):
+    return re.findall(r'\w+', query)
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and mark up the matched terms."""
+    return escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    todo: Todo
+    rank: float
+    snippet: str
+
+
+class BaseSearchBackend:
+    def filter(self, queryset, query, user_id=None):
+        """Restrict a Todo queryset to rows matching ``query``; ``user_id``
+        lets the index narrow to one user's rows first."""
+        raise NotImplementedError
+
+    def search(self, user, query, limit=20):
+        """Return up to ``limit`` of a user's todos matching ``query``, best first."""
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    # bm25() weights for the title, description, category and user_id columns
+    WEIGHTS = '10.0, 1.0, 5.0, 0.0'
+
+    def match_expression(self, terms, user_id=None):
+        terms = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        expression = f'{{title description category}} : ({terms})'
+        if user_id is not None:
+            # Intersect with the user's rows inside the index
+            expression = f'user_id : "{int(user_id)}" AND {expression}'
+        return expression
+
+    def filter(self, queryset, query, user_id=None):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            'SELECT rowid FROM core_todo_fts WHERE core_todo_fts MATCH %s',
+            [self.match_expression(terms, user_id)],
+        ))
+
+    def search(self, user, query, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        todos = Todo.objects.raw(
+            'SELECT core_todo.*, '
+            f'-bm25(core_todo_fts, {self.WEIGHTS}) AS search_rank, '
+            "snippet(core_todo_fts, -1, %s, %s, '…', 12) AS search_snippet "
+            'FROM core_todo_fts JOIN core_todo ON core_todo.id = core_todo_fts.rowid '
+            'WHERE core_todo_fts MATCH %s AND core_todo.user_id = %s '
+            f'ORDER BY bm25(core_todo_fts, {self.WEIGHTS}) LIMIT %s',
+            [MATCH_START, MATCH_END, self.match_expression(terms, user.pk), user.pk, limit],
+        )
+        return [SearchResult(todo, todo.search_rank, highlight(todo.search_snippet)) for todo in todos]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    HEADLINE_OPTIONS = f'StartSel={MATCH_START}, StopSel={MATCH_END}, MaxWords=20, MinWords=5'
+
+    def tsquery(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def filter(self, queryset, query, user_id=None):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            "SELECT id FROM core_todo WHERE search_vector @@ to_tsquery('english', %s)",
+            [self.tsquery(terms)],
+        ))
+
+    def search(self, user, query, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        todos = Todo.objects.raw(
+            'SELECT core_todo.*, ts_rank(search_vector, query) AS search_rank, '
+            "ts_headline('english', concat_ws(' ', title, category, description), query, %s) AS search_snippet "
+            "FROM core_todo, to_tsquery('english', %s) query "
+            'WHERE core_todo.user_id = %s AND search_vector @@ query '
+            'ORDER BY search_rank DESC, core_todo.id DESC LIMIT %s',
+            [self.HEADLINE_OPTIONS, self.tsquery(terms), user.pk, limit],
+        )
+        return [SearchResult(todo, todo.search_rank, highlight(todo.search_snippet)) for todo in todos]
+
+
+class ScanSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for databases without a full-text index."""
+
+    def filter(self, queryset, query, user_id=None):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) | Q(category__icontains=term)
+            )
+        return queryset
+
+    def search(self, user, query, limit=20):
+        todos = self.filter(Todo.objects.filter(user=user), query)[:limit]
+        return [SearchResult(todo, 0.0, escape(todo.title)) for todo in todos]
+
+
+SQLITE_INDEX_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_todo_fts USING fts5("
+    "title, description, category, user_id, content='core_todo', content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS core_todo_fts_insert AFTER INSERT ON core_todo BEGIN '
+    'INSERT INTO core_todo_fts(rowid, title, description, category, user_id) '
+    'VALUES (new.id, new.title, new.description, new.category, new.user_id); END',
+    'CREATE TRIGGER IF NOT EXISTS core_todo_fts_delete AFTER DELETE ON core_todo BEGIN '
+    "INSERT INTO core_todo_fts(core_todo_fts, rowid, title, description, category, user_id) "
+    "VALUES ('delete', old.id, old.title, old.description, old.category, old.user_id); END",
+    'CREATE TRIGGER IF NOT EXISTS core_todo_fts_update '
+    'AFTER UPDATE OF title, description, category, user_id ON core_todo BEGIN '
+    "INSERT INTO core_todo_fts(core_todo_fts, rowid, title, description, category, user_id) "
+    "VALUES ('delete', old.id, old.title, old.description, old.category, old.user_id); "
+    'INSERT INTO core_todo_fts(rowid, title, description, category, user_id) '
+    'VALUES (new.id, new.title, new.description, new.category, new.user_id); END',
+    "INSERT INTO core_todo_fts(core_todo_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    'DROP TRIGGER IF EXISTS core_todo_fts_insert',
+    'DROP TRIGGER IF EXISTS core_todo_fts_delete',
+    'DROP TRIGGER IF EXISTS core_todo_fts_update',
+    'DROP TABLE IF EXISTS core_todo_fts',
+]
+
+POSTGRES_INDEX_SQL = [
+    'ALTER TABLE core_todo ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ('
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')) STORED",
+    'CREATE INDEX IF NOT EXISTS core_todo_search_idx ON core_todo USING GIN (search_vector)',
+]
+
+POSTGRES_DROP_SQL = [
+    'DROP INDEX IF EXISTS core_todo_search_idx',
+    'ALTER TABLE core_todo DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def install_index(connection):
+    """Create (or re-create) the index and the triggers or column feeding it.
+
+    Idempotent: Django remakes SQLite tables for some schema changes, which
+    drops their triggers, so run the rebuild_search_index command after a
+    migration that alters core_todo on SQLite.
+    """
+    if connection.vendor == 'sqlite':
+        statements = SQLITE_INDEX_SQL if sqlite_has_fts5(connection) else []
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRES_INDEX_SQL
+    else:
+        statements = []
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    get_search_backend.cache_clear()
+
+
+def drop_index(connection):
+    statements = {'sqlite': SQLITE_DROP_SQL, 'postgresql': POSTGRES_DROP_SQL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    get_search_backend.cache_clear()
+
+
+@lru_cache
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        if 'core_todo_fts' in connection.introspection.table_names():
+            return SQLiteSearchBackend()
+    elif connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return ScanSearchBackend()
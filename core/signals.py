@@ -0,0 +1,133 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import bump_generation_on_commit
+from .context_processors import invalidate_notifications, invalidate_reminders
+from .events import get_broker
+from .models import Notification, TimeEntry, Todo, TodoChange, UserProfile
+from .stats import apply_counter_delta, record_activity, todo_counter_delta
+
+
+# Todo fields that decide when notifications for it are due
+SCHEDULE_FIELDS = ('user_id', 'completed', 'due_date', 'reminder_date')
+
+
+def _saved_values(instance, old, update_fields):
+    new = instance.tracked_values()
+    if old is not None and update_fields is not None:
+        # Only the saved columns changed in the database
+        new = {
+            field: new[field] if field.removesuffix('_id') in update_fields else old[field]
+            for field in instance.TRACKED_FIELDS
+        }
+    return new
+
+
+@receiver(pre_save, sender=Todo)
+@receiver(pre_save, sender=TimeEntry)
+def remember_stored_values(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance.stored_values()
+
+
+@receiver(post_save, sender=Todo)
+def update_todo_aggregates_on_save(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    old = None if created else instance._loaded_values
+    new = _saved_values(instance, old, update_fields)
+
+    for user_id, delta in todo_counter_delta(old, new).items():
+        apply_counter_delta(user_id, delta)
+
+    if created:
+        record_activity(new['user_id'], timezone.localdate(instance.created_at), tasks_created=1)
+    just_completed = new['completed'] and not (old and old['completed'])
+    if just_completed:
+        record_activity(new['user_id'], timezone.localdate(), tasks_completed=1)
+
+    if settings.NOTIFICATION_OUTBOX_ENABLED and (
+        old is None or any(old[field] != new[field] for field in SCHEDULE_FIELDS)
+    ):
+        TodoChange.objects.create(
+            todo_id=instance.pk,
+            user_id=new['user_id'],
+            event='completed' if just_completed else 'saved',
+        )
+
+    if new['reminder_date'] is not None or (old and old['reminder_date'] is not None):
+        invalidate_reminders(*{values['user_id'] for values in (old, new) if values})
+
+    instance._loaded_values = new
+
+
+@receiver(post_delete, sender=Todo)
+def update_todo_counters_on_delete(sender, instance, **kwargs):
+    old = instance.stored_values() or instance.tracked_values()
+    for user_id, delta in todo_counter_delta(old, None).items():
+        apply_counter_delta(user_id, delta, create_missing=False)
+
+    if settings.NOTIFICATION_OUTBOX_ENABLED:
+        TodoChange.objects.create(todo_id=instance.pk, user_id=old['user_id'], event='deleted')
+
+    if old['reminder_date'] is not None:
+        invalidate_reminders(old['user_id'])
+    # Notifications about the todo go with it
+    invalidate_notifications(old['user_id'])
+
+
+def _tracked_seconds(values):
+    if values is None or values['duration'] is None:
+        return 0
+    return int(values['duration'].total_seconds())
+
+
+@receiver(post_save, sender=TimeEntry)
+def update_activity_on_time_entry_save(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    old = None if created else instance._loaded_values
+    new = _saved_values(instance, old, update_fields)
+
+    # Time is booked against the day the entry started; moving or resizing a
+    # closed entry moves its seconds with it.
+    deltas = Counter()
+    if old is not None:
+        deltas[old['user_id'], timezone.localdate(old['start_time'])] -= _tracked_seconds(old)
+    deltas[new['user_id'], timezone.localdate(new['start_time'])] += _tracked_seconds(new)
+    for (user_id, day), seconds in deltas.items():
+        if seconds:
+            record_activity(user_id, day, tracked_seconds=seconds)
+
+    instance._loaded_values = new
+
+
+@receiver(post_delete, sender=TimeEntry)
+def update_activity_on_time_entry_delete(sender, instance, **kwargs):
+    old = instance.stored_values() or instance.tracked_values()
+    if _tracked_seconds(old):
+        record_activity(old['user_id'], timezone.localdate(old['start_time']),
+                        tracked_seconds=-_tracked_seconds(old), create_missing=False)
+
+
+@receiver(post_save, sender=Notification)
+def publish_new_notification(sender, instance, created, raw, **kwargs):
+    invalidate_notifications(instance.user_id)
+    if created and not raw:
+        transaction.on_commit(lambda: get_broker().publish(instance.user_id, instance.pk))
+
+
+@receiver(post_save, sender=Todo)
+@receiver(post_delete, sender=Todo)
+@receiver(post_save, sender=TimeEntry)
+@receiver(post_delete, sender=TimeEntry)
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=UserProfile)
+def expire_cached_views(sender, instance, **kwargs):
+    bump_generation_on_commit(instance.user_id)
@@ -108,8 +108,14 @@ function initializeNotifications() {
         });
     });
 
-    // Auto-refresh notifications every 30 seconds
-    setInterval(fetchNotifications, 30000);
+    // Receive new notifications as they are created, polling only when the
+    // server cannot push (no EventSource support or a WSGI deployment).
+    // Both start after the newest notification the page was rendered with.
+    const notificationButton = document.getElementById('notificationDropdown');
+    if (notificationButton && notificationButton.dataset.notificationCursor) {
+        notificationCursor = parseInt(notificationButton.dataset.notificationCursor, 10);
+    }
+    connectNotificationStream();
 
     // Check for due tasks every minute
     setInterval(checkDueTasks, 60000);
@@ -118,12 +124,67 @@ function initializeNotifications() {
     setInterval(checkReminders, 60000);
 }
 
+// Highest notification id the page has seen; both channels resume from it
+let notificationCursor = null;
+let notificationPollTimer = null;
+
+function connectNotificationStream() {
+    if (!window.EventSource) {
+        startNotificationPolling();
+        return;
+    }
+
+    const url = notificationCursor === null
+        ? '/api/notifications/stream/'
+        : `/api/notifications/stream/?since=${notificationCursor}`;
+    const source = new EventSource(url);
+    let opened = false;
+
+    source.addEventListener('open', function() {
+        opened = true;
+    });
+
+    source.addEventListener('notification', function(event) {
+        const notification = JSON.parse(event.data);
+        notificationCursor = Math.max(notificationCursor || 0, notification.id);
+        updateNotificationUI([notification]);
+    });
+
+    source.addEventListener('error', function() {
+        // A stream that never opened is not served here; fall back to polling.
+        // Otherwise EventSource reconnects on its own with Last-Event-ID.
+        if (!opened) {
+            source.close();
+            startNotificationPolling();
+        }
+    });
+}
+
+function startNotificationPolling() {
+    if (notificationPollTimer === null) {
+        notificationPollTimer = setInterval(fetchNotifications, 30000);
+    }
+}
+
 async function fetchNotifications() {
     try {
-        const response = await fetch('/api/notifications/');
+        const url = notificationCursor === null
+            ? '/api/notifications/'
+            : `/api/notifications/?since_id=${notificationCursor}`;
+        const response = await fetch(url);
         if (response.ok) {
             const data = await response.json();
-            updateNotificationUI(data.notifications);
+            // The first poll only establishes the cursor; the page already
+            // rendered the unread notifications it returns.
+            const isFirstPoll = notificationCursor === null;
+            notificationCursor = data.cursor;
+            if (!isFirstPoll) {
+                updateNotificationUI(data.notifications);
+                // More arrived than one response holds; fetch the rest now
+                if (data.has_more) {
+                    fetchNotifications();
+                }
+            }
         }
     } catch (error) {
         console.log('Failed to fetch notifications:', error);
@@ -131,37 +192,33 @@ async function fetchNotifications() {
 }
 
 function updateNotificationUI(notifications) {
-    const notificationMenu = document.querySelector('.notification-menu .dropdown-menu');
-    const badge = document.querySelector('.notification-btn .badge');
-
-    if (notifications && notifications.length > 0) {
-        // Update badge count
-        if (badge) {
-            badge.textContent = notifications.length;
-        } else {
-            // Create badge if it doesn't exist
-            const notificationBtn = document.querySelector('.notification-btn');
-            const newBadge = document.createElement('span');
-            newBadge.className = 'position-absolute top-0 start-100 translate-middle badge rounded-pill bg-danger';
-            newBadge.textContent = notifications.length;
-            notificationBtn.appendChild(newBadge);
-        }
+    if (!notifications || notifications.length === 0) {
+        return;
+    }
 
-        // Play sound notification if enabled
-        playNotificationSound();
+    // Add the new notifications to the unread badge count
+    const badge = document.querySelector('.notification-btn .badge');
+    if (badge) {
+        badge.textContent = (parseInt(badge.textContent) || 0) + notifications.length;
+    } else {
+        // Create badge if it doesn't exist
+        const notificationBtn = document.querySelector('.notification-btn');
+        const newBadge = document.createElement('span');
+        newBadge.className = 'position-absolute top-0 start-100 translate-middle badge rounded-pill bg-danger';
+        newBadge.textContent = notifications.length;
+        notificationBtn.appendChild(newBadge);
+    }
 
-        // Show browser notification if permitted
-        if (Notification.permission === 'granted') {
-            const notification = notifications[0]; // Show first notification
-            showBrowserNotification(notification.title, notification.message, notification.notification_type);
-        }
+    // Play sound notification if enabled
+    playNotificationSound();
 
-        console.log('New notifications:', notifications);
-    } else {
-        if (badge) {
-            badge.remove();
-        }
+    // Show browser notification if permitted
+    if (Notification.permission === 'granted') {
+        const notification = notifications[0]; // Show first notification
+        showBrowserNotification(notification.title, notification.message, notification.type);
     }
+
+    console.log('New notifications:', notifications);
 }
 
 function playNotificationSound() {
@@ -344,12 +401,13 @@ function initializeTaskActions() {
 
 async function completeTask(taskId) {
     try {
-        const response = await fetch(`/api/tasks/${taskId}/complete/`, {
+        const response = await fetch(`/api/tasks/${taskId}/status/`, {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json',
+                'Content-Type': 'application/x-www-form-urlencoded',
                 'X-CSRFToken': getCSRFToken()
-            }
+            },
+            body: new URLSearchParams({status: 'completed'})
         });
 
         if (response.ok) {
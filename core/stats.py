@@ -0,0 +1,340 @@
+from collections import Counter
+from dataclasses import dataclass
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DateTimeField, DurationField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import DailyActivity, TimeEntry, Todo, UserTaskStats
+
+
+STATUS_COUNTERS = {
+    'pending': 'pending',
+    'in_progress': 'in_progress',
+    'completed': 'status_completed',
+}
+
+
+@dataclass(frozen=True)
+class TaskStats:
+    """Per-user task counters used by the dashboard, task list and reports."""
+
+    total: int = 0
+    pending: int = 0
+    in_progress: int = 0
+    completed: int = 0
+
+    # Open (not completed) tasks by priority
+    high_priority: int = 0
+    medium_priority: int = 0
+    low_priority: int = 0
+
+    # All tasks by priority
+    high_priority_total: int = 0
+    medium_priority_total: int = 0
+    low_priority_total: int = 0
+
+    # Due date counters (open tasks only)
+    overdue: int = 0
+    due_today: int = 0
+    due_this_week: int = 0
+
+    # Productivity counters
+    completed_this_week: int = 0
+
+    @property
+    def completion_rate(self):
+        if not self.total:
+            return 0
+        return round(self.completed / self.total * 100, 1)
+
+
+def _aggregate(queryset, aggregates):
+    # Aggregate aliases may not shadow Todo fields such as ``completed``.
+    counts = queryset.aggregate(
+        **{f'n_{name}': expression for name, expression in aggregates.items()}
+    )
+    return {name: counts[f'n_{name}'] for name in aggregates}
+
+
+def counter_aggregates():
+    """Count expressions producing every UserTaskStats counter from Todo rows."""
+    is_open = Q(completed=False)
+    aggregates = {
+        'total': Count('id'),
+        'completed': Count('id', filter=Q(completed=True)),
+        'incomplete': Count('id', filter=is_open),
+    }
+    for status, field in STATUS_COUNTERS.items():
+        aggregates[field] = Count('id', filter=Q(status=status))
+    for priority, _ in Todo.PRIORITY_CHOICES:
+        aggregates[f'{priority}_priority'] = Count('id', filter=is_open & Q(priority=priority))
+        aggregates[f'{priority}_priority_total'] = Count('id', filter=Q(priority=priority))
+    return aggregates
+
+
+def counters_for(values):
+    """Return the UserTaskStats counters a todo with ``values`` contributes to."""
+    fields = ['total', 'completed' if values['completed'] else 'incomplete']
+    if values['status'] in STATUS_COUNTERS:
+        fields.append(STATUS_COUNTERS[values['status']])
+    if values['priority'] in dict(Todo.PRIORITY_CHOICES):
+        fields.append(f"{values['priority']}_priority_total")
+        if not values['completed']:
+            fields.append(f"{values['priority']}_priority")
+    return fields
+
+
+def todo_counter_delta(old, new):
+    """Return {user_id: Counter} moving a todo from ``old`` to ``new`` values.
+
+    Either side may be ``None`` for creations and deletions.
+    """
+    deltas = {}
+    if old is not None:
+        deltas.setdefault(old['user_id'], Counter()).subtract(counters_for(old))
+    if new is not None:
+        deltas.setdefault(new['user_id'], Counter()).update(counters_for(new))
+    return deltas
+
+
+def compute_counters(user_ids=None):
+    """Recompute counters from Todo rows, keyed by user id."""
+    todos = Todo.objects.all()
+    if user_ids is not None:
+        todos = todos.filter(user_id__in=user_ids)
+    rows = todos.order_by().values('user_id').annotate(
+        **{f'n_{name}': expression for name, expression in counter_aggregates().items()}
+    )
+    return {
+        row['user_id']: {field: row[f'n_{field}'] for field in UserTaskStats.COUNTER_FIELDS}
+        for row in rows
+    }
+
+
+def rebuild_user_counters(user_id):
+    counts = compute_counters([user_id]).get(user_id, {})
+    counts = {field: counts.get(field, 0) for field in UserTaskStats.COUNTER_FIELDS}
+    stats, _ = UserTaskStats.objects.update_or_create(user_id=user_id, defaults=counts)
+    return stats
+
+
+def apply_counter_delta(user_id, delta, create_missing=True):
+    """Adjust a user's counters in place by ``delta`` (field -> increment).
+
+    A missing counter row is rebuilt from scratch unless ``create_missing``
+    is false, as on deletes where the user itself may be going away.
+    """
+    delta = {field: change for field, change in delta.items() if change}
+    if not delta:
+        return
+    updated = UserTaskStats.objects.filter(user_id=user_id).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + change for field, change in delta.items()}
+    )
+    if not updated and create_missing:
+        # No counter row yet: build it from the rows already written in
+        # this transaction, which include the change being applied.
+        rebuild_user_counters(user_id)
+
+
+def get_user_counters(user):
+    stats = UserTaskStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = rebuild_user_counters(user.pk)
+    return stats
+
+
+def get_task_stats(user, now=None):
+    """Return a TaskStats for ``user``.
+
+    Status and priority totals come from the UserTaskStats counter row; only
+    the time-window counters are aggregated, over open tasks with a due date
+    and tasks created this week.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    week_start = now - timezone.timedelta(days=now.weekday())
+    is_open = Q(completed=False)
+
+    counters = get_user_counters(user)
+
+    window = Todo.objects.filter(user=user).filter(
+        Q(completed=False, due_date__isnull=False)
+        | Q(created_at__gte=week_start)
+    )
+    counts = _aggregate(window, dict(
+        overdue=Count('id', filter=is_open & Q(due_date__lt=now)),
+        due_today=Count('id', filter=is_open & Q(due_date__date=today)),
+        due_this_week=Count(
+            'id',
+            filter=is_open
+            & Q(due_date__date__range=[today, today + timezone.timedelta(days=7)])
+            & ~Q(due_date__date=today),
+        ),
+        completed_this_week=Count('id', filter=Q(completed=True, created_at__gte=week_start)),
+    ))
+
+    return TaskStats(
+        total=counters.total,
+        pending=counters.pending,
+        in_progress=counters.in_progress,
+        completed=counters.completed,
+        high_priority=counters.high_priority,
+        medium_priority=counters.medium_priority,
+        low_priority=counters.low_priority,
+        high_priority_total=counters.high_priority_total,
+        medium_priority_total=counters.medium_priority_total,
+        low_priority_total=counters.low_priority_total,
+        **counts
+    )
+
+
+def record_activity(user_id, day, create_missing=True, **increments):
+    """Add ``increments`` to the user's DailyActivity row for ``day``."""
+    increments = {field: change for field, change in increments.items() if change}
+    if not increments:
+        return
+    rows = DailyActivity.objects.filter(user_id=user_id, day=day)
+    if rows.update(**{field: F(field) + change for field, change in increments.items()}):
+        return
+    if not create_missing:
+        return
+    try:
+        with transaction.atomic():
+            DailyActivity.objects.create(user_id=user_id, day=day, **increments)
+    except IntegrityError:
+        # Another writer created the row first
+        rows.update(**{field: F(field) + change for field, change in increments.items()})
+
+
+def get_activity_totals(user, since=None):
+    """Sum a user's DailyActivity counters, from ``since`` (a date) onwards
+    when given."""
+    rows = DailyActivity.objects.filter(user=user)
+    if since is not None:
+        rows = rows.filter(day__gte=since)
+    totals = rows.aggregate(
+        **{f'n_{field}': Sum(field) for field in DailyActivity.COUNTER_FIELDS}
+    )
+    return {field: totals[f'n_{field}'] or 0 for field in DailyActivity.COUNTER_FIELDS}
+
+
+def get_monthly_activity(user, months=6, now=None):
+    """Return the last ``months`` calendar months of activity, oldest first."""
+    today = timezone.localdate(now or timezone.now())
+    month_starts = [today.replace(day=1)]
+    for _ in range(months - 1):
+        month_starts.insert(0, (month_starts[0] - timezone.timedelta(days=1)).replace(day=1))
+
+    rows = DailyActivity.objects.filter(user=user, day__range=(month_starts[0], today)).values_list(
+        'day', *DailyActivity.COUNTER_FIELDS
+    )
+    monthly = {start: dict.fromkeys(DailyActivity.COUNTER_FIELDS, 0) for start in month_starts}
+    for day, *counts in rows:
+        bucket = monthly[day.replace(day=1)]
+        for field, count in zip(DailyActivity.COUNTER_FIELDS, counts):
+            bucket[field] += count
+    return [{'month_start': start, **counts} for start, counts in monthly.items()]
+
+
+@dataclass(frozen=True)
+class TimeTotals:
+    """Tracked time for the time tracking page, in seconds."""
+
+    today: float = 0
+    this_week: float = 0
+    this_month: float = 0
+    entries_today: int = 0
+
+    # This month's busiest todos: dicts of todo_id, title, seconds and hours
+    by_todo: tuple = ()
+
+    @property
+    def today_hours(self):
+        return self.today / 3600
+
+    @property
+    def this_week_hours(self):
+        return self.this_week / 3600
+
+    @property
+    def this_month_hours(self):
+        return self.this_month / 3600
+
+
+def tracked_duration(now):
+    """Duration of a time entry, counting a running one up to ``now``."""
+    return Case(
+        When(
+            is_active=True,
+            duration__isnull=True,
+            then=ExpressionWrapper(Value(now, output_field=DateTimeField()) - F('start_time'),
+                                   output_field=DurationField()),
+        ),
+        default=F('duration'),
+        output_field=DurationField(),
+    )
+
+
+def time_windows(now):
+    """Start of the local day, week and month containing ``now``."""
+    today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'today': today_start,
+        'week': today_start - timezone.timedelta(days=today_start.weekday()),
+        'month': today_start.replace(day=1),
+    }
+
+
+def get_time_totals(user, now=None, top_todos=5):
+    """Return a TimeTotals for ``user``.
+
+    Entries count towards the day, week and month they started in. Only
+    this month's (and, early in a month, this week's) entries are read, so
+    the cost does not grow with the length of a user's history.
+    """
+    entries, aggregates, by_todo = _time_totals_queries(user, now or timezone.now(), top_todos)
+    return _time_totals(entries.aggregate(**aggregates), by_todo)
+
+
+async def aget_time_totals(user, now=None, top_todos=5):
+    entries, aggregates, by_todo = _time_totals_queries(user, now or timezone.now(), top_todos)
+    return _time_totals(await entries.aaggregate(**aggregates), [row async for row in by_todo])
+
+
+def _time_totals_queries(user, now, top_todos):
+    windows = time_windows(now)
+    today_start, week_start, month_start = windows['today'], windows['week'], windows['month']
+
+    entries = TimeEntry.objects.filter(user=user, start_time__gte=min(week_start, month_start))
+    duration = tracked_duration(now)
+    aggregates = {
+        'today': Sum(duration, filter=Q(start_time__gte=today_start)),
+        'this_week': Sum(duration, filter=Q(start_time__gte=week_start)),
+        'this_month': Sum(duration, filter=Q(start_time__gte=month_start)),
+        'entries_today': Count('id', filter=Q(start_time__gte=today_start)),
+    }
+
+    by_todo = entries.filter(start_time__gte=month_start, todo__isnull=False).values(
+        'todo_id', title=F('todo__title')
+    ).annotate(total=Sum(duration)).order_by('-total')[:top_todos]
+    return entries, aggregates, by_todo
+
+
+def _time_totals(totals, by_todo):
+    return TimeTotals(
+        today=totals['today'].total_seconds() if totals['today'] else 0,
+        this_week=totals['this_week'].total_seconds() if totals['this_week'] else 0,
+        this_month=totals['this_month'].total_seconds() if totals['this_month'] else 0,
+        entries_today=totals['entries_today'],
+        by_todo=tuple(
+            {
+                'todo_id': row['todo_id'],
+                'title': row['title'],
+                'seconds': row['total'].total_seconds(),
+                'hours': row['total'].total_seconds() / 3600,
+            }
+            for row in by_todo if row['total']
+        ),
+    )
@@ -1,3 +1,1467 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from importlib import import_module
+from io import StringIO
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, router, transaction
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .bulk import bulk_update_todos
+from .calendars import CalendarRange, feed_token, get_calendar_days
+from .context_processors import _cache_timeout, next_reminder_date
+from .events import LocalBroker
+from .instrumentation import RequestMetricsMiddleware, render_prometheus, reset_metrics
+from .management.commands.benchmark_pollers import run_pollers
+from .management.commands.send_notifications import Command as SendNotificationsCommand
+from .middleware import StaticFilesMiddleware
+from .models import DailyActivity, Notification, NotificationLedger, TimeEntry, Todo, TodoChange, UserProfile, UserTaskStats
+from .notifications import claim_notified
+from .pagination import TaskFilters, filter_tasks, paginate_tasks
+from .routers import PIN_SESSION_KEY, ReplicaPinningMiddleware, replica_reads
+from .scheduler import NotificationScheduler
+from .search import get_search_backend
+from .stats import compute_counters, get_activity_totals, get_monthly_activity, get_task_stats, get_time_totals
+from .timers import TimerService
+from .urls import api_view
+from . import views
+
+
+class TaskStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.other = User.objects.create_user(username='bob', password='secret123')
+        now = timezone.now()
+
+        Todo.objects.create(user=self.user, title='Overdue', priority='high',
+                            due_date=now - timezone.timedelta(days=2))
+        Todo.objects.create(user=self.user, title='Next week', priority='low',
+                            due_date=now + timezone.timedelta(days=3), status='in_progress')
+        Todo.objects.create(user=self.user, title='Done', priority='high',
+                            status='completed', completed=True)
+        Todo.objects.create(user=self.other, title='Not mine', priority='high')
+
+    def test_counts_are_scoped_to_user(self):
+        stats = get_task_stats(self.user)
+
+        self.assertEqual(stats.total, 3)
+        self.assertEqual(stats.pending, 1)
+        self.assertEqual(stats.in_progress, 1)
+        self.assertEqual(stats.completed, 1)
+        self.assertEqual(stats.high_priority, 1)
+        self.assertEqual(stats.high_priority_total, 2)
+        self.assertEqual(stats.low_priority, 1)
+        self.assertEqual(stats.overdue, 1)
+        self.assertEqual(stats.due_this_week, 1)
+        self.assertEqual(stats.completed_this_week, 1)
+        self.assertEqual(stats.completion_rate, 33.3)
+
+    def test_stats_use_counter_row_and_one_aggregate(self):
+        get_task_stats(self.user)
+        with self.assertNumQueries(2):
+            get_task_stats(self.user)
+
+
+class DashboardQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        for i in range(20):
+            Todo.objects.create(user=self.user, title=f'Task {i}')
+        self.client.force_login(self.user)
+
+    def test_dashboard_query_count_is_constant(self):
+        # session, user, counter row, time-window aggregate, recent tasks
+        # and the notifications context processor
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_tasks'], 20)
+
+
+class UserTaskStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.client.force_login(self.user)
+
+    def assertCountersMatch(self):
+        stats = UserTaskStats.objects.get(user=self.user)
+        expected = compute_counters([self.user.pk]).get(self.user.pk)
+        for field in UserTaskStats.COUNTER_FIELDS:
+            self.assertEqual(getattr(stats, field), expected[field], field)
+
+    def test_counters_follow_create_update_and_delete(self):
+        todo = Todo.objects.create(user=self.user, title='One', priority='high')
+        Todo.objects.create(user=self.user, title='Two', priority='low')
+        self.assertCountersMatch()
+
+        response = self.client.post(
+            reverse('todo_update', args=[todo.pk]),
+            {'status': 'completed'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 200)
+        stats = UserTaskStats.objects.get(user=self.user)
+        self.assertEqual(stats.completed, 1)
+        self.assertEqual(stats.high_priority, 0)
+        self.assertEqual(stats.high_priority_total, 1)
+        self.assertCountersMatch()
+
+        todo.refresh_from_db()
+        todo.delete()
+        self.assertEqual(UserTaskStats.objects.get(user=self.user).total, 1)
+        self.assertCountersMatch()
+
+    def test_rebuild_command_repairs_drift(self):
+        Todo.objects.create(user=self.user, title='One')
+        UserTaskStats.objects.filter(user=self.user).update(total=42)
+
+        out = StringIO()
+        call_command('rebuild_task_stats', '--check', stdout=out)
+        self.assertIn('Drift for user', out.getvalue())
+        self.assertEqual(UserTaskStats.objects.get(user=self.user).total, 42)
+
+        call_command('rebuild_task_stats', stdout=StringIO())
+        self.assertCountersMatch()
+
+
+class DailyActivityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.today = timezone.localdate()
+
+    def test_task_events_are_rolled_up_by_day(self):
+        todo = Todo.objects.create(user=self.user, title='One')
+        Todo.objects.create(user=self.user, title='Two')
+        todo.status = 'completed'
+        todo.completed = True
+        todo.save()
+        todo.save()
+
+        activity = DailyActivity.objects.get(user=self.user, day=self.today)
+        self.assertEqual(activity.tasks_created, 2)
+        self.assertEqual(activity.tasks_completed, 1)
+
+    def test_closed_time_entries_add_tracked_seconds(self):
+        start = timezone.now() - timezone.timedelta(minutes=30)
+        entry = TimeEntry.objects.create(user=self.user, start_time=start, is_active=True)
+        self.assertFalse(DailyActivity.objects.filter(user=self.user).exists())
+
+        entry.end_time = start + timezone.timedelta(minutes=20)
+        entry.is_active = False
+        entry.save()
+        day = timezone.localdate(start)
+        self.assertEqual(DailyActivity.objects.get(user=self.user, day=day).tracked_seconds, 1200)
+
+        entry.delete()
+        self.assertEqual(DailyActivity.objects.get(user=self.user, day=day).tracked_seconds, 0)
+
+    def test_monthly_activity_reads_rollup_rows(self):
+        DailyActivity.objects.create(user=self.user, day=self.today, tasks_completed=3)
+        months = get_monthly_activity(self.user, months=6)
+
+        self.assertEqual(len(months), 6)
+        self.assertEqual(months[-1]['month_start'], self.today.replace(day=1))
+        self.assertEqual(months[-1]['tasks_completed'], 3)
+
+    def test_rebuild_command_backfills_rollup(self):
+        Todo.objects.create(user=self.user, title='One', status='completed', completed=True)
+        DailyActivity.objects.all().delete()
+
+        call_command('rebuild_daily_activity', stdout=StringIO())
+        activity = DailyActivity.objects.get(user=self.user, day=self.today)
+        self.assertEqual(activity.tasks_created, 1)
+        self.assertEqual(activity.tasks_completed, 1)
+
+    def test_migration_backfills_existing_rows(self):
+        Todo.objects.create(user=self.user, title='One', status='completed', completed=True)
+        start = timezone.now() - timezone.timedelta(hours=1)
+        TimeEntry.objects.create(user=self.user, start_time=start, end_time=start + timezone.timedelta(minutes=10))
+        DailyActivity.objects.all().delete()
+
+        migration = import_module('core.migrations.0006_dailyactivity')
+        migration.backfill_daily_activity(django_apps, None)
+        self.assertEqual(
+            get_activity_totals(self.user),
+            {'tasks_created': 1, 'tasks_completed': 1, 'tracked_seconds': 600},
+        )
+
+
+class SendNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        UserProfile.objects.create(user=self.user, sound_notifications=False)
+        self.no_profile = User.objects.create_user(username='bob', password='secret123')
+        now = timezone.now()
+        for i in range(5):
+            Todo.objects.create(user=self.user, title=f'Late {i}', due_date=now - timezone.timedelta(days=2))
+            Todo.objects.create(user=self.no_profile, title=f'Late {i}', due_date=now - timezone.timedelta(days=2))
+        Todo.objects.create(user=self.user, title='Remind me', reminder_date=now - timezone.timedelta(minutes=5))
+
+    def test_notifications_are_created_in_batches(self):
+        out = StringIO()
+        # four candidate scans, one ledger expiry and three batches (one
+        # reminder, two overdue as a batch size of 3 splits five rows), each
+        # a savepoint pair around the ledger claim (expired row delete,
+        # insert and read back) and the notification insert
+        with self.assertNumQueries(23):
+            call_command('send_notifications', '--batch-size', '3', stdout=out)
+
+        self.assertEqual(Notification.objects.filter(notification_type='overdue').count(), 5)
+        self.assertEqual(Notification.objects.filter(notification_type='reminder').count(), 1)
+        self.assertFalse(Notification.objects.filter(user=self.no_profile).exists())
+        self.assertFalse(Notification.objects.filter(sound_enabled=True).exists())
+        self.assertIn('overdue: 5 notifications', out.getvalue())
+
+    def test_recent_notifications_are_not_repeated(self):
+        call_command('send_notifications', stdout=StringIO())
+        call_command('send_notifications', stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(notification_type='overdue').count(), 5)
+
+    def test_ledger_records_sends_and_expires_old_entries(self):
+        stale = Todo.objects.filter(user=self.user).first()
+        NotificationLedger.objects.create(
+            todo=stale, notification_type='overdue',
+            notified_at=timezone.now() - timezone.timedelta(days=3),
+        )
+        call_command('send_notifications', stdout=StringIO())
+
+        self.assertEqual(NotificationLedger.objects.filter(notification_type='overdue').count(), 5)
+        self.assertFalse(NotificationLedger.objects.filter(
+            notified_at__lt=timezone.now() - timezone.timedelta(days=1)
+        ).exists())
+
+    def test_repeat_interval_slides_from_the_last_send(self):
+        todo = Todo.objects.create(user=self.user, title='Done', status='completed', completed=True)
+        UserProfile.objects.filter(user=self.user).update(completed_task_notifications=True)
+        sent_at = timezone.now().replace(minute=55)
+        Todo.objects.filter(pk=todo.pk).update(updated_at=sent_at - timezone.timedelta(minutes=5))
+
+        # Two runs either side of the hour, as cron would make them
+        command = SendNotificationsCommand(stdout=StringIO())
+        command.dry_run, command.batch_size, command.verbosity = False, 500, 1
+        for minutes in (0, 10):
+            command.check_completed_tasks(sent_at + timezone.timedelta(minutes=minutes))
+        self.assertEqual(Notification.objects.filter(notification_type='completed').count(), 1)
+
+    def test_racing_senders_notify_once(self):
+        now = timezone.now()
+        todo = Todo.objects.filter(user=self.user).first()
+        with transaction.atomic():
+            self.assertEqual(claim_notified([(todo.pk, 'overdue')], now), {(todo.pk, 'overdue')})
+        # A second sender that checked the ledger before the first one claimed
+        with transaction.atomic():
+            self.assertEqual(claim_notified([(todo.pk, 'overdue')], now + timezone.timedelta(seconds=1)), set())
+        later = now + timezone.timedelta(days=1, seconds=1)
+        with transaction.atomic():
+            self.assertEqual(claim_notified([(todo.pk, 'overdue')], later), {(todo.pk, 'overdue')})
+
+    def test_dry_run_writes_nothing(self):
+        call_command('send_notifications', '--dry-run', stdout=StringIO())
+        self.assertFalse(Notification.objects.exists())
+
+
+@override_settings(NOTIFICATION_OUTBOX_ENABLED=True)
+class NotificationSchedulerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        UserProfile.objects.create(user=self.user, completed_task_notifications=True)
+        self.now = timezone.now()
+
+    def test_events_fire_from_the_heap_and_repeat(self):
+        Todo.objects.create(user=self.user, title='Remind me', reminder_date=self.now + timezone.timedelta(minutes=10))
+        scheduler = NotificationScheduler()
+        scheduler.start(self.now)
+
+        self.assertEqual(scheduler.fire_due(self.now), 0)
+        fire_at = scheduler.next_fire_time()
+        self.assertEqual(fire_at, self.now + timezone.timedelta(minutes=10))
+        self.assertEqual(scheduler.fire_due(fire_at), 1)
+        self.assertEqual(scheduler.next_fire_time(), fire_at + timezone.timedelta(hours=1))
+
+    def test_restarting_rebuilds_the_heap(self):
+        Todo.objects.create(user=self.user, title='Remind me', reminder_date=self.now + timezone.timedelta(minutes=10))
+        scheduler = NotificationScheduler()
+        scheduler.start(self.now)
+        scheduler.start(self.now)
+
+        self.assertEqual(len(scheduler.heap), 1)
+        self.assertEqual(scheduler.fire_due(self.now + timezone.timedelta(minutes=10)), 1)
+
+    def test_changes_arrive_through_the_outbox(self):
+        scheduler = NotificationScheduler()
+        scheduler.start(self.now)
+        self.assertIsNone(scheduler.next_fire_time())
+
+        todo = Todo.objects.create(user=self.user, title='Ship it', due_date=self.now + timezone.timedelta(hours=3))
+        self.assertEqual(scheduler.poll_changes(self.now), 1)
+        self.assertEqual(scheduler.next_fire_time(), todo.due_date - timezone.timedelta(hours=1))
+        self.assertFalse(TodoChange.objects.exists())
+
+        todo.status = 'completed'
+        todo.completed = True
+        todo.save()
+        scheduler.poll_changes(self.now)
+        self.assertEqual(scheduler.fire_due(self.now), 1)
+        self.assertEqual(Notification.objects.get().notification_type, 'completed')
+        self.assertIsNone(scheduler.next_fire_time())
+
+    def test_changes_committed_out_of_id_order_are_applied(self):
+        scheduler = NotificationScheduler()
+        scheduler.start(self.now)
+        todo = Todo.objects.create(user=self.user, title='Late', due_date=self.now + timezone.timedelta(hours=3))
+        # Hold back its outbox row as if its transaction had not committed yet
+        late_id = TodoChange.objects.get().id
+        TodoChange.objects.all().delete()
+        other = Todo.objects.create(user=self.user, title='Early', due_date=self.now + timezone.timedelta(hours=4))
+        self.assertEqual(scheduler.poll_changes(self.now), 1)
+
+        TodoChange.objects.create(id=late_id, todo_id=todo.pk, user_id=self.user.pk)
+        self.assertEqual(scheduler.poll_changes(self.now), 1)
+        self.assertEqual({entry[2] for entry in scheduler.heap}, {todo.pk, other.pk})
+        self.assertFalse(TodoChange.objects.exists())
+
+    def test_deleted_todos_are_dropped(self):
+        todo = Todo.objects.create(user=self.user, title='Gone', reminder_date=self.now)
+        scheduler = NotificationScheduler()
+        scheduler.start(self.now)
+        todo.delete()
+        scheduler.poll_changes(self.now)
+
+        self.assertIsNone(scheduler.next_fire_time())
+        self.assertEqual(scheduler.fire_due(self.now), 0)
+        self.assertEqual((scheduler.generations, scheduler.pending), ({}, {}))
+
+    def test_finished_todos_leave_no_bookkeeping(self):
+        todo = Todo.objects.create(user=self.user, title='Soon', due_date=self.now + timezone.timedelta(hours=3))
+        scheduler = NotificationScheduler()
+        scheduler.start(self.now)
+        for _ in range(3):
+            todo.title += '!'
+            todo.save()
+            scheduler.poll_changes(self.now)
+        todo.status = 'completed'
+        todo.completed = True
+        todo.save()
+        scheduler.poll_changes(self.now)
+
+        self.assertEqual(scheduler.fire_due(self.now), 1)
+        self.assertIsNone(scheduler.next_fire_time())
+        self.assertEqual((scheduler.heap, scheduler.generations, scheduler.pending), ([], {}, {}))
+
+
+class NotificationPushTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.first = Notification.objects.create(user=self.user, title='First', message='One')
+        self.second = Notification.objects.create(user=self.user, title='Second', message='Two')
+
+    def test_polling_accepts_since_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('api_notifications'), {'since_id': self.first.pk})
+        data = response.json()
+
+        self.assertEqual([item['id'] for item in data['notifications']], [self.second.pk])
+        self.assertEqual(data['cursor'], self.second.pk)
+
+        response = self.client.get(reverse('api_notifications'), {'since_id': self.second.pk})
+        self.assertEqual(response.json(), {'notifications': [], 'cursor': self.second.pk, 'has_more': False})
+
+    def test_cursor_polls_page_through_a_burst(self):
+        self.client.force_login(self.user)
+        burst = [
+            Notification.objects.create(user=self.user, title=f'Burst {i}', message='New')
+            for i in range(15)
+        ]
+
+        received = []
+        cursor, has_more = self.second.pk, True
+        while has_more:
+            data = self.client.get(reverse('api_notifications'), {'since_id': cursor}).json()
+            received += [item['id'] for item in data['notifications']]
+            cursor, has_more = data['cursor'], data['has_more']
+
+        self.assertEqual(received, [notification.pk for notification in burst])
+        self.assertEqual(cursor, burst[-1].pk)
+
+    def test_unchanged_poll_returns_not_modified(self):
+        self.client.force_login(self.user)
+        url = reverse('api_notifications')
+        etag = self.client.get(url)['ETag']
+
+        # session, user and the unread-state aggregate only
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Notification.objects.create(user=self.user, title='Third', message='Three')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_mark_read_in_one_update(self):
+        self.client.force_login(self.user)
+        url = reverse('api_notifications')
+
+        response = self.client.post(url, {'notification_ids': f'{self.first.pk},{self.second.pk}'})
+        self.assertEqual(response.json(), {'success': True, 'marked': 2})
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+        third = Notification.objects.create(user=self.user, title='Third', message='Three')
+        response = self.client.post(url, {'up_to_id': third.pk})
+        self.assertEqual(response.json(), {'success': True, 'marked': 1})
+
+        response = self.client.post(url, {'notification_id': 999999})
+        self.assertFalse(response.json()['success'])
+
+    def test_local_broker_wakes_subscribers(self):
+        async def scenario():
+            broker = LocalBroker()
+            queue = broker.subscribe(self.user.pk)
+            broker.publish(self.user.pk, 7)
+            broker.publish(self.user.pk, 8)
+            woken = await asyncio.wait_for(queue.get(), timeout=1)
+            broker.unsubscribe(self.user.pk, queue)
+            return woken, queue.empty()
+
+        self.assertEqual(asyncio.run(scenario()), (7, True))
+
+    async def test_stream_sends_notifications_after_cursor(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('api_notifications_stream'), {'since': self.first.pk})
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)  # retry hint
+        event = (await anext(chunks)).decode()
+        await chunks.aclose()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn(f'id: {self.second.pk}\n', event)
+        payload = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(payload['title'], 'Second')
+
+    def test_page_renders_the_cursor_the_stream_starts_from(self):
+        # The menu links each notification to its todo
+        Notification.objects.update(todo=Todo.objects.create(user=self.user, title='Task'))
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('dashboard')),
+                            f'data-notification-cursor="{self.second.pk}"')
+
+        Notification.objects.filter(user=self.user).update(is_read=True)
+        # Nothing unread was rendered, so every later unread one is new to the page
+        self.assertContains(self.client.get(reverse('dashboard')), 'data-notification-cursor="0"')
+
+    def test_stream_is_not_served_under_wsgi(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('api_notifications_stream')).status_code, 204)
+
+
+@override_settings(CONTEXT_CACHE_TIMEOUT=60)
+class ContextProcessorCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.todo = Todo.objects.create(user=self.user, title='Task')
+        Notification.objects.create(user=self.user, todo=self.todo, title='First', message='One')
+        self.client.force_login(self.user)
+
+    def unread_in_page(self):
+        return len(self.client.get(reverse('dashboard')).context['notifications'])
+
+    def test_cached_notifications_skip_the_query(self):
+        self.assertEqual(self.unread_in_page(), 1)
+        with self.assertNumQueries(5):
+            self.assertEqual(self.unread_in_page(), 1)
+
+    def test_cache_is_invalidated_by_writes(self):
+        self.assertEqual(self.unread_in_page(), 1)
+        Notification.objects.create(user=self.user, todo=self.todo, title='Second', message='Two')
+        self.assertEqual(self.unread_in_page(), 2)
+
+        self.client.post(reverse('api_notifications'), {'all': 'true'})
+        self.assertEqual(self.unread_in_page(), 0)
+
+    def test_cached_reminders_expire_when_the_next_one_is_due(self):
+        now = timezone.now()
+        Todo.objects.filter(pk=self.todo.pk).update(reminder_date=now - timezone.timedelta(minutes=5))
+        Todo.objects.create(user=self.user, title='Done', completed=True, reminder_date=now + timezone.timedelta(seconds=5))
+        upcoming = Todo.objects.create(user=self.user, title='Soon', reminder_date=now + timezone.timedelta(seconds=30))
+
+        self.assertEqual(next_reminder_date(self.user.pk, now), upcoming.reminder_date)
+        self.assertEqual(_cache_timeout(upcoming.reminder_date, now), 30)
+        self.assertIsNone(next_reminder_date(self.user.pk, now + timezone.timedelta(seconds=30)))
+        self.assertEqual(_cache_timeout(None, now), 60)
+        # Never 0, which some backends read as "do not cache"
+        self.assertEqual(_cache_timeout(now - timezone.timedelta(seconds=5), now), 1)
+
+
+class TaskPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        UserProfile.objects.create(user=self.user, items_per_page=5)
+        now = timezone.now()
+        for i in range(12):
+            Todo.objects.create(
+                user=self.user,
+                title=f'Task {i:02d}',
+                priority=('low', 'medium', 'high')[i % 3],
+                category='work' if i % 2 else 'home',
+                due_date=now + timezone.timedelta(days=i) if i % 4 else None,
+            )
+        Todo.objects.create(user=User.objects.create_user(username='bob'), title='Task 99')
+        self.client.force_login(self.user)
+
+    def walk(self, **params):
+        filters = TaskFilters.from_query(params)
+        todos, cursor = [], ''
+        while True:
+            page = paginate_tasks(filter_tasks(self.user, filters), filters, cursor, page_size=5)
+            todos.extend(page.items)
+            if not page.next_cursor:
+                return todos
+            cursor = page.next_cursor
+
+    def test_keyset_pages_cover_every_task_once(self):
+        for sort in ('created_at', 'due_date', 'priority', 'title'):
+            with self.subTest(sort=sort):
+                self.assertEqual(sorted(todo.title for todo in self.walk(sort=sort)),
+                                 [f'Task {i:02d}' for i in range(12)])
+
+    def test_sort_orders(self):
+        self.assertEqual([todo.title for todo in self.walk(sort='title')][:2], ['Task 00', 'Task 01'])
+        self.assertEqual(
+            [todo.priority for todo in self.walk(sort='priority')],
+            ['high'] * 4 + ['medium'] * 4 + ['low'] * 4,
+        )
+        due = [todo.due_date for todo in self.walk(sort='due_date')]
+        self.assertEqual(due[-3:], [None] * 3)
+        self.assertEqual(due[:-3], sorted(due[:-3]))
+
+    def test_filters(self):
+        self.assertEqual(len(self.walk(q='WORK')), 6)
+        self.assertEqual(len(self.walk(priority='high', q='task 0')), 3)
+        self.assertEqual(len(self.walk(status='completed')), 0)
+        self.assertEqual(len(self.walk(status='bogus')), 12)
+
+    def test_todo_list_renders_first_page(self):
+        response = self.client.get(reverse('todo_list'), {'sort': 'title'})
+
+        self.assertEqual([todo.title for todo in response.context['todos']],
+                         [f'Task {i:02d}' for i in range(5)])
+        self.assertTrue(response.context['next_cursor'])
+        self.assertEqual(response.context['stats'].total, 12)
+
+    def test_api_returns_fragments_and_cursor(self):
+        first = self.client.get(reverse('api_tasks'), {'sort': 'title'}).json()
+        self.assertEqual(first['count'], 5)
+        self.assertTrue(first['has_more'])
+        self.assertIn('Task 04', first['cards'])
+        self.assertIn('Task 04', first['rows'])
+
+        second = self.client.get(reverse('api_tasks'), {'sort': 'title', 'after': first['next_cursor']}).json()
+        self.assertIn('Task 05', second['cards'])
+        self.assertNotIn('Task 04', second['cards'])
+
+    def test_unusable_cursor_starts_over(self):
+        data = self.client.get(reverse('api_tasks'), {'sort': 'title', 'after': 'not-a-cursor'}).json()
+        self.assertIn('Task 00', data['cards'])
+
+
+class IndexBenchmarkTests(TestCase):
+    def test_benchmark_reports_plans_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_indexes', '--users', '2', '--todos-per-user', '20', '--repeat', '1', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('todo_open_due_idx', output.split('Without indexes')[0])
+        self.assertNotIn('todo_open_due_idx', output.split('Without indexes')[1])
+        self.assertFalse(User.objects.filter(username__startswith='bench_index_').exists())
+        self.assertFalse(Todo.objects.exists())
+
+
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.report = Todo.objects.create(user=self.user, title='Write <b>report</b>', category='work',
+                                          description='Quarterly numbers for the board')
+        self.meeting = Todo.objects.create(user=self.user, title='Board meeting', category='work',
+                                           description='Prepare report slides')
+        Todo.objects.create(user=User.objects.create_user(username='bob'), title='Report for bob')
+        self.client.force_login(self.user)
+
+    def search(self, query):
+        return self.client.get(reverse('api_task_search'), {'q': query}).json()['results']
+
+    def test_results_are_ranked_scoped_and_highlighted(self):
+        results = self.search('repo')
+
+        self.assertEqual([result['id'] for result in results], [self.report.pk, self.meeting.pk])
+        self.assertEqual(results[0]['snippet'], 'Write &lt;b&gt;<mark>report</mark>&lt;/b&gt;')
+        self.assertEqual(self.search('board repo')[0]['id'], self.meeting.pk)
+        self.assertEqual(self.search('!!'), [])
+
+    def test_index_follows_writes(self):
+        self.meeting.title = 'Standup'
+        self.meeting.description = ''
+        self.meeting.save()
+        Todo.objects.filter(pk=self.report.pk).update(title='Invoice')
+
+        self.assertEqual(self.search('report'), [])
+        self.assertEqual([result['id'] for result in self.search('invoice')], [self.report.pk])
+
+        self.report.delete()
+        self.assertEqual(self.search('invoice'), [])
+
+    def test_task_list_filter_uses_index(self):
+        todos = get_search_backend().filter(Todo.objects.all(), 'quarterly', user_id=self.user.pk)
+        self.assertEqual(list(todos), [self.report])
+
+        data = self.client.get(reverse('api_tasks'), {'q': 'slides'}).json()
+        self.assertEqual(data['count'], 1)
+        self.assertIn('Board meeting', data['cards'])
+
+
+class PerfToolingTests(TestCase):
+    def test_seed_perf_data_fills_derived_tables(self):
+        call_command('seed_perf_data', '--users', '3', '--todos-per-user', '10', '--time-entries-per-user', '5',
+                     '--notifications-per-user', '4', stdout=StringIO())
+
+        users = User.objects.filter(username__startswith='perf_user_')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 3)
+        self.assertEqual(compute_counters(), {
+            stats.user_id: {field: getattr(stats, field) for field in UserTaskStats.COUNTER_FIELDS}
+            for stats in UserTaskStats.objects.all()
+        })
+        self.assertTrue(DailyActivity.objects.exists())
+
+        err = StringIO()
+        call_command('seed_perf_data', '--users', '1', stdout=StringIO(), stderr=err)
+        self.assertIn('already exist', err.getvalue())
+
+    def test_seed_perf_data_leaves_other_users_rows_alone(self):
+        user = User.objects.create_user(username='alice', password='secret123')
+        Todo.objects.create(user=user, title='Real task')
+        # History recorded by events, which a rebuild from Todo rows would lose
+        DailyActivity.objects.filter(user=user).update(tasks_completed=4)
+        UserTaskStats.objects.filter(user=user).update(total=7)
+
+        call_command('seed_perf_data', '--users', '2', '--todos-per-user', '5', stdout=StringIO())
+
+        self.assertEqual(DailyActivity.objects.get(user=user).tasks_completed, 4)
+        self.assertEqual(UserTaskStats.objects.get(user=user).total, 7)
+
+    def test_run_benchmarks_writes_report(self):
+        call_command('seed_perf_data', '--users', '2', '--todos-per-user', '10', stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            out = StringIO()
+            call_command('run_benchmarks', '--iterations', '2', '--warmup', '0', '--output', path, stdout=out)
+            call_command('run_benchmarks', '--iterations', '2', '--warmup', '0', '--scenario', 'dashboard',
+                         '--output', path, '--compare', path, stdout=out)
+
+            with open(path) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual(list(report['scenarios']), ['dashboard'])
+        self.assertEqual(set(report['scenarios']['dashboard']), {
+            'p50_ms', 'p95_ms', 'mean_ms', 'min_ms', 'max_ms', 'queries', 'peak_memory_kb',
+        })
+        self.assertIn('Compared with', out.getvalue())
+
+
+@override_settings(
+    MIDDLEWARE=['core.instrumentation.RequestMetricsMiddleware', *settings.MIDDLEWARE],
+    REQUEST_METRICS_SAMPLE_RATE=1.0,
+    REQUEST_METRICS_DUPLICATE_THRESHOLD=5,
+)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        reset_metrics()
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.client.force_login(self.user)
+
+    def test_sampled_request_gets_server_timing_and_log_line(self):
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('dashboard'))
+
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'dashboard')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['repeated_queries'], [])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_request_is_only_timed(self):
+        with self.assertNoLogs('core.metrics'):
+            response = self.client.get(reverse('dashboard'))
+        self.assertNotIn('Server-Timing', response)
+
+        self.user.is_staff = True
+        self.user.save()
+        metrics = self.client.get(reverse('admin_metrics')).content.decode()
+        self.assertIn('trackpro_request_duration_seconds_count{view="dashboard",method="GET"} 1', metrics)
+        self.assertNotIn('trackpro_request_queries_count{view="dashboard"}', metrics)
+
+    def test_repeated_statements_are_reported(self):
+        def n_plus_one(request):
+            for pk in range(6):
+                Todo.objects.filter(pk=pk).first()
+            return HttpResponse()
+
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            RequestMetricsMiddleware(n_plus_one)(RequestFactory().get('/'))
+
+        repeated = json.loads(logs.records[0].getMessage())['repeated_queries']
+        self.assertEqual(repeated[0]['count'], 6)
+        self.assertIn('core_todo', repeated[0]['sql'])
+
+    def test_streamed_body_queries_are_recorded_when_the_stream_closes(self):
+        def stream(request):
+            def rows():
+                for pk in range(3):
+                    yield str(Todo.objects.filter(pk=pk).count())
+            return StreamingHttpResponse(rows())
+
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = RequestMetricsMiddleware(stream)(RequestFactory().get('/'))
+            self.assertNotIn('Server-Timing', response)
+            self.assertEqual(b''.join(response.streaming_content), b'000')
+            self.assertEqual(logs.records, [])
+            response.close()
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['queries'], record['streamed']), (3, True))
+
+    def test_metrics_endpoint_is_staff_only(self):
+        with self.assertLogs('core.metrics', 'INFO'):
+            self.client.get(reverse('dashboard'))
+            self.assertEqual(self.client.get(reverse('admin_metrics')).status_code, 302)
+
+            self.user.is_staff = True
+            self.user.save()
+            response = self.client.get(reverse('admin_metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('# TYPE trackpro_request_queries histogram', response.content.decode())
+        self.assertIn('trackpro_request_queries_bucket{view="dashboard",le="+Inf"} 1', response.content.decode())
+
+
+class TimeTrackingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.todo = Todo.objects.create(user=self.user, title='Write report')
+        self.client.force_login(self.user)
+
+    def entry(self, start, minutes=None, todo=None):
+        end = start + timezone.timedelta(minutes=minutes) if minutes is not None else None
+        return TimeEntry.objects.create(user=self.user, todo=todo, start_time=start, end_time=end,
+                                        is_active=minutes is None)
+
+    def test_totals_include_the_running_entry(self):
+        now = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.entry(now - timezone.timedelta(hours=2), 60, self.todo)
+        self.entry(now - timezone.timedelta(minutes=30), todo=self.todo)
+        self.entry(now - timezone.timedelta(days=400), 180)
+
+        totals = get_time_totals(self.user, now=now)
+
+        self.assertEqual(totals.today, 90 * 60)
+        self.assertEqual(totals.entries_today, 2)
+        self.assertEqual(totals.this_month, 90 * 60)
+        self.assertEqual(totals.by_todo, ({
+            'todo_id': self.todo.pk, 'title': 'Write report', 'seconds': 5400.0, 'hours': 1.5,
+        },))
+
+    def test_history_is_paged_by_start_time(self):
+        now = timezone.now()
+        entries = [self.entry(now - timezone.timedelta(hours=i), 10, self.todo) for i in range(30)]
+
+        # Constant however long the history: no per-entry todo lookups
+        with self.assertNumQueries(9):
+            first = self.client.get(reverse('time_tracking'))
+        self.assertEqual(first.context['time_entries'], entries[:25])
+
+        second = self.client.get(reverse('time_tracking'), {'after': first.context['next_cursor']})
+        self.assertEqual(second.context['time_entries'], entries[25:])
+        self.assertEqual(second.context['next_cursor'], '')
+
+        today = self.client.get(reverse('time_tracking'), {'period': 'today'})
+        self.assertTrue(all(entry.start_time >= timezone.localtime().replace(hour=0, minute=0, second=0,
+                                                                             microsecond=0)
+                            for entry in today.context['time_entries']))
+
+
+class TimerServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.todo = Todo.objects.create(user=self.user, title='Write report')
+        self.client.force_login(self.user)
+
+    def test_start_stops_the_running_entry(self):
+        start = timezone.now() - timezone.timedelta(minutes=30)
+        first = TimerService(self.user).start(now=start).started
+
+        change = TimerService(self.user).start(self.todo, now=start + timezone.timedelta(minutes=20))
+
+        self.assertEqual(change.stopped, first)
+        self.assertEqual(change.stopped.duration, timezone.timedelta(minutes=20))
+        self.assertEqual(TimeEntry.objects.get(is_active=True), change.started)
+        self.assertEqual(DailyActivity.objects.get(user=self.user).tracked_seconds, 20 * 60)
+
+        self.assertEqual(TimerService(self.user).stop().stopped, change.started)
+        self.assertIsNone(TimerService(self.user).stop().stopped)
+        self.assertFalse(TimeEntry.objects.filter(is_active=True).exists())
+
+    def test_one_active_entry_per_user(self):
+        TimeEntry.objects.create(user=self.user, start_time=timezone.now(), is_active=True)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TimeEntry.objects.create(user=self.user, start_time=timezone.now(), is_active=True)
+
+    def test_start_retries_after_losing_a_race(self):
+        user = self.user
+
+        class RacingService(TimerService):
+            raced = False
+
+            def _stop(self, now):
+                stopped = super()._stop(now)
+                if not self.raced:
+                    # Another tab starts a timer between our stop and our insert
+                    self.raced = True
+                    TimeEntry.objects.create(user=user, start_time=now, is_active=True)
+                return stopped
+
+        service = RacingService(user)
+        now = timezone.now() - timezone.timedelta(minutes=5)
+        change = service.start(self.todo, now=now)
+
+        self.assertTrue(service.raced)
+        self.assertEqual(TimeEntry.objects.get(is_active=True), change.started)
+        # The retry keeps the time the caller asked for
+        self.assertEqual(change.started.start_time, now)
+
+    def test_api_returns_the_new_state(self):
+        started = self.client.post(reverse('api_timer_start'), {'todo_id': self.todo.pk}).json()
+        self.assertEqual(started['active']['todo_title'], 'Write report')
+        self.assertIsNone(started['stopped'])
+
+        state = self.client.get(reverse('api_timer')).json()
+        self.assertEqual(state['active']['id'], started['active']['id'])
+
+        stopped = self.client.post(reverse('api_timer_stop')).json()
+        self.assertIsNone(stopped['active'])
+        self.assertEqual(stopped['stopped']['id'], started['active']['id'])
+
+        other = Todo.objects.create(user=User.objects.create_user(username='bob'), title='Not mine')
+        self.assertEqual(self.client.post(reverse('api_timer_start'), {'todo_id': other.pk}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_timer_start')).status_code, 405)
+
+    def test_redirect_views_use_the_service(self):
+        self.client.get(reverse('start_time_tracking_todo', args=[self.todo.pk]))
+        self.client.get(reverse('start_time_tracking'))
+        self.assertEqual(TimeEntry.objects.filter(is_active=True).count(), 1)
+        self.assertEqual(TimeEntry.objects.count(), 2)
+
+        self.client.get(reverse('stop_time_tracking'))
+        self.assertFalse(TimeEntry.objects.filter(is_active=True).exists())
+
+
+class BulkTaskTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.other = User.objects.create_user(username='bob', password='secret123')
+        now = timezone.now()
+        self.todos = [
+            Todo.objects.create(user=self.user, title=f'Task {i}', priority='low',
+                                reminder_date=now + timezone.timedelta(days=1) if i == 0 else None)
+            for i in range(5)
+        ]
+        self.foreign = Todo.objects.create(user=self.other, title='Not mine')
+        self.client.force_login(self.user)
+
+    def assertCountersMatchRows(self):
+        for user in (self.user, self.other):
+            stored = UserTaskStats.objects.get(user=user)
+            for field, value in compute_counters([user.pk]).get(user.pk, {}).items():
+                self.assertEqual(getattr(stored, field), value, field)
+
+    def test_status_change_is_one_update(self):
+        ids = [todo.pk for todo in self.todos] + [self.foreign.pk]
+        # Savepoint, locking read, UPDATE, counter and activity UPDATEs, release
+        with self.assertNumQueries(6):
+            result = bulk_update_todos(self.user, ids, 'status', 'completed')
+
+        self.assertEqual(sorted(result.ids), sorted(todo.pk for todo in self.todos))
+        self.assertEqual(Todo.objects.filter(user=self.user, completed=True).count(), 5)
+        self.assertFalse(Todo.objects.get(pk=self.foreign.pk).completed)
+        self.assertEqual(DailyActivity.objects.get(user=self.user, day=timezone.localdate()).tasks_completed, 5)
+        self.assertCountersMatchRows()
+
+    def test_priority_category_and_reschedule(self):
+        ids = [todo.pk for todo in self.todos[:2]]
+        bulk_update_todos(self.user, ids, 'priority', 'high')
+        bulk_update_todos(self.user, ids, 'category', ' work ')
+        bulk_update_todos(self.user, ids, 'reschedule', '2030-01-15')
+
+        for todo in Todo.objects.filter(pk__in=ids):
+            self.assertEqual((todo.priority, todo.category), ('high', 'work'))
+            self.assertEqual(timezone.localtime(todo.due_date).date().isoformat(), '2030-01-15')
+        self.assertCountersMatchRows()
+
+        with self.assertRaises(ValueError):
+            bulk_update_todos(self.user, ids, 'priority', 'urgent')
+
+    def test_rows_already_holding_the_value_are_left_alone(self):
+        bulk_update_todos(self.user, [self.todos[0].pk], 'priority', 'high')
+        before = dict(Todo.objects.filter(user=self.user).values_list('id', 'updated_at'))
+
+        result = bulk_update_todos(self.user, [todo.pk for todo in self.todos], 'priority', 'high')
+        self.assertEqual((len(result.ids), result.changed), (5, 4))
+        after = dict(Todo.objects.filter(user=self.user).values_list('id', 'updated_at'))
+        self.assertEqual(after[self.todos[0].pk], before[self.todos[0].pk])
+        self.assertNotEqual(after[self.todos[1].pk], before[self.todos[1].pk])
+
+        # Savepoint, locking read, UPDATE matching nothing, release
+        with self.assertNumQueries(4):
+            result = bulk_update_todos(self.user, [todo.pk for todo in self.todos], 'priority', 'high')
+        self.assertEqual(result.changed, 0)
+        self.assertCountersMatchRows()
+
+    @override_settings(NOTIFICATION_OUTBOX_ENABLED=True)
+    def test_outbox_records_schedule_changes(self):
+        TodoChange.objects.all().delete()
+        bulk_update_todos(self.user, [self.todos[0].pk, self.todos[1].pk], 'status', 'completed')
+        bulk_update_todos(self.user, [self.todos[2].pk], 'category', 'home')
+
+        self.assertEqual(list(TodoChange.objects.values_list('todo_id', 'event')),
+                         [(self.todos[0].pk, 'completed'), (self.todos[1].pk, 'completed')])
+
+    def test_delete_removes_children_and_adjusts_rollups(self):
+        start = timezone.now() - timezone.timedelta(hours=2)
+        TimeEntry.objects.create(user=self.user, todo=self.todos[0], start_time=start,
+                                 end_time=start + timezone.timedelta(minutes=30))
+        TimeEntry.objects.create(user=self.user, start_time=start, end_time=start + timezone.timedelta(minutes=10))
+        Notification.objects.create(user=self.user, todo=self.todos[0], notification_type='reminder',
+                                    title='Reminder', message='Soon')
+
+        result = bulk_update_todos(self.user, [self.todos[0].pk, self.todos[1].pk, self.foreign.pk], 'delete')
+
+        self.assertEqual(result.changed, 2)
+        self.assertEqual(Todo.objects.filter(user=self.user).count(), 3)
+        self.assertTrue(Todo.objects.filter(pk=self.foreign.pk).exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(TimeEntry.objects.count(), 1)
+        self.assertEqual(DailyActivity.objects.get(user=self.user, day=timezone.localdate(start)).tracked_seconds,
+                         10 * 60)
+        self.assertCountersMatchRows()
+
+    def test_api(self):
+        ids = ','.join(str(todo.pk) for todo in self.todos[:3])
+        response = self.client.post(reverse('api_tasks_bulk'), {'ids': ids, 'operation': 'status',
+                                                                'value': 'in_progress'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], 3)
+        self.assertEqual(response.json()['stats']['in_progress'], 3)
+
+        invalid = self.client.post(reverse('api_tasks_bulk'), {'ids': ids, 'operation': 'status', 'value': 'x'})
+        self.assertEqual(invalid.status_code, 400)
+        unknown = self.client.post(reverse('api_tasks_bulk'), {'ids': ids, 'operation': 'archive'})
+        self.assertEqual(unknown.status_code, 400)
+        empty = self.client.post(reverse('api_tasks_bulk'), {'operation': 'delete'})
+        self.assertEqual(empty.status_code, 400)
+
+
+class PartialSaveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.todo = Todo.objects.create(user=self.user, title='Write report', description='Long text ' * 100,
+                                        due_date=timezone.now().replace(second=0, microsecond=0))
+        self.client.force_login(self.user)
+
+    def form_data(self, todo, **changes):
+        data = {
+            'title': todo.title,
+            'description': todo.description,
+            'due_date': timezone.localtime(todo.due_date).strftime('%Y-%m-%dT%H:%M'),
+            'priority': todo.priority,
+            'category': todo.category,
+            'reminder_date': '',
+            'status': todo.status,
+        }
+        return {**data, **changes}
+
+    def todo_updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "core_todo"')]
+
+    def test_status_change_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('todo_update', args=[self.todo.pk]), {'status': 'completed'},
+                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        [update] = self.todo_updates(queries)
+        self.assertIn('"status"', update)
+        self.assertIn('"completed"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"description"', update)
+        self.assertTrue(Todo.objects.get(pk=self.todo.pk).completed)
+
+    def test_unchanged_form_writes_nothing(self):
+        updated_at = self.todo.updated_at
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('todo_update', args=[self.todo.pk]), self.form_data(self.todo))
+
+        self.assertEqual(self.todo_updates(queries), [])
+        self.assertEqual(Todo.objects.get(pk=self.todo.pk).updated_at, updated_at)
+
+    def test_form_edit_writes_only_edited_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('todo_update', args=[self.todo.pk]),
+                             self.form_data(self.todo, title='Write the report', priority='high'))
+
+        [update] = self.todo_updates(queries)
+        self.assertNotIn('"description"', update)
+        self.assertNotIn('"due_date"', update)
+        todo = Todo.objects.get(pk=self.todo.pk)
+        self.assertEqual((todo.title, todo.priority), ('Write the report', 'high'))
+        self.assertEqual(UserTaskStats.objects.get(user=self.user).high_priority, 1)
+
+    def test_time_entry_duration_follows_partial_saves(self):
+        start = timezone.now() - timezone.timedelta(hours=1)
+        entry = TimeEntry.objects.create(user=self.user, start_time=start, is_active=True)
+        entry.save_changes(end_time=start + timezone.timedelta(minutes=45), is_active=False)
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.duration, timezone.timedelta(minutes=45))
+        self.assertEqual(DailyActivity.objects.get(user=self.user, day=timezone.localdate(start)).tracked_seconds,
+                         45 * 60)
+
+
+class CalendarTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.client.force_login(self.user)
+        self.busy_day = timezone.make_aware(timezone.datetime(2030, 1, 15, 9, 0))
+        for i in range(5):
+            Todo.objects.create(user=self.user, title=f'Busy {i}', due_date=self.busy_day + timezone.timedelta(hours=i))
+        Todo.objects.create(user=self.user, title='Done, still shown', completed=True, status='completed',
+                            due_date=timezone.make_aware(timezone.datetime(2030, 1, 20, 12, 0)))
+        Todo.objects.create(user=self.user, title='Next month', due_date=timezone.make_aware(timezone.datetime(2030, 2, 10)))
+        Todo.objects.create(user=User.objects.create_user(username='bob'), title='Not mine', due_date=self.busy_day)
+
+    def test_ranges_cover_whole_weeks(self):
+        month = CalendarRange.from_query({'date': '2030-01-15'})
+        self.assertEqual((month.start.isoformat(), month.end.isoformat()), ('2029-12-31', '2030-02-04'))
+        self.assertEqual((month.previous.isoformat(), month.next.isoformat()), ('2029-12-01', '2030-02-01'))
+
+        week = CalendarRange.from_query({'view': 'week', 'date': '2030-01-15'})
+        self.assertEqual((week.start.isoformat(), week.end.isoformat()), ('2030-01-14', '2030-01-21'))
+        self.assertEqual(CalendarRange.from_query({'date': '2030-02-31'}).anchor, timezone.localdate().replace(day=1))
+
+    def test_days_carry_counts_and_first_items_in_one_query(self):
+        with self.assertNumQueries(1):
+            days = get_calendar_days(self.user, CalendarRange.from_query({'date': '2030-01-01'}))
+
+        by_date = {day['date']: day for day in days}
+        self.assertEqual(len(days), 35)
+        busy = by_date['2030-01-15']
+        self.assertEqual((busy['count'], busy['more']), (5, 2))
+        self.assertEqual([item['title'] for item in busy['items']], ['Busy 0', 'Busy 1', 'Busy 2'])
+        self.assertTrue(by_date['2030-01-20']['items'][0]['completed'])
+        self.assertEqual(sum(day['count'] for day in days), 6)
+
+    def test_api_and_day_expansion(self):
+        data = self.client.get(reverse('api_calendar'), {'view': 'week', 'date': '2030-01-15'}).json()
+        self.assertEqual(data['view'], 'week')
+        self.assertEqual(len(data['days']), 7)
+
+        rest = self.client.get(reverse('api_calendar_day'), {'date': '2030-01-15', 'offset': 3}).json()
+        self.assertEqual([item['title'] for item in rest['items']], ['Busy 3', 'Busy 4'])
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(self.client.get(reverse('api_calendar_day'), {'date': 'soon'}).status_code, 400)
+
+        page = self.client.get(reverse('calendar'), {'date': '2030-01-15'})
+        self.assertContains(page, 'id="calendarData"')
+
+    def test_ics_feed_is_streamed_with_a_signed_token(self):
+        self.client.logout()
+        response = self.client.get(reverse('calendar_feed', args=[feed_token(self.user)]))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 7)
+        self.assertIn('SUMMARY:✓ Done\\, still shown', body)
+        self.assertNotIn('Not mine', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+        forged = feed_token(self.user).rsplit(':', 1)[0] + ':forged'
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=[forged])).status_code, 404)
+
+    def test_resetting_the_feed_revokes_the_old_address(self):
+        old = reverse('calendar_feed', args=[feed_token(self.user)])
+        self.assertEqual(self.client.get(reverse('calendar_feed_reset')).status_code, 405)
+        self.assertRedirects(self.client.post(reverse('calendar_feed_reset')), reverse('calendar'))
+
+        new = reverse('calendar_feed', args=[feed_token(self.user)])
+        self.assertNotEqual(new, old)
+        self.assertEqual(self.client.get(old).status_code, 404)
+        self.assertEqual(self.client.get(new).status_code, 200)
+        self.assertContains(self.client.get(reverse('calendar')), new)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(new).status_code, 404)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.other = User.objects.create_user(username='bob', password='secret123')
+        self.todo = Todo.objects.create(user=self.user, title='Write, "quoted" report', description='Line one\nline two')
+        Todo.objects.create(user=self.other, title='Not mine')
+        start = timezone.make_aware(timezone.datetime(2030, 1, 15, 9, 0))
+        for day in range(3):
+            TimeEntry.objects.create(user=self.user, todo=self.todo, start_time=start + timezone.timedelta(days=day),
+                                     end_time=start + timezone.timedelta(days=day, minutes=30))
+        self.client.force_login(self.user)
+
+    def export(self, kind, **params):
+        response = self.client.get(reverse('export', args=[kind]), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_is_scoped_to_the_user(self):
+        response, body = self.export('tasks')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Write, "quoted" report')
+        self.assertEqual(rows[0]['description'], 'Line one\nline two')
+
+    def test_csv_neutralizes_formulas(self):
+        Todo.objects.filter(pk=self.todo.pk).update(
+            title='=HYPERLINK("http://example.com")', description='-2+3', category='@SUM(A1)',
+        )
+        _, body = self.export('tasks')
+        row = next(csv.DictReader(io.StringIO(body.decode())))
+
+        self.assertEqual(row['title'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row['description'], "'-2+3")
+        self.assertEqual(row['category'], "'@SUM(A1)")
+        self.assertEqual(row['id'], str(self.todo.pk))
+
+        # NDJSON is data, not a spreadsheet, and is left as entered
+        _, body = self.export('tasks', format='ndjson')
+        self.assertEqual(json.loads(body.decode().splitlines()[0])['description'], '-2+3')
+
+    def test_ndjson_with_date_range(self):
+        _, body = self.export('time-entries', format='ndjson', **{'from': '2030-01-16', 'to': '2030-01-17'})
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+
+        self.assertEqual([row['start_time'][:10] for row in rows], ['2030-01-16', '2030-01-17'])
+        self.assertEqual(rows[0]['duration_seconds'], 30 * 60)
+        self.assertEqual(rows[0]['todo_title'], self.todo.title)
+
+    def test_gzip_and_staff_scope(self):
+        response, body = self.export('tasks', gzip='1', all='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        # all=1 is ignored for non-staff users
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(gzip.decompress(body).decode())))), 1)
+
+        self.user.is_staff = True
+        self.user.save()
+        _, body = self.export('tasks', format='ndjson', gzip='1', all='1')
+        self.assertEqual(len(gzip.decompress(body).decode().splitlines()), 2)
+
+    def test_rows_are_read_in_chunks(self):
+        # One SELECT whatever the row count, read through a server-side iterator
+        with CaptureQueriesContext(connection) as queries:
+            self.export('time-entries')
+        self.assertEqual(sum('FROM "core_timeentry"' in query['sql'] for query in queries), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse('export', args=['users'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export', args=['tasks']), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export', args=['tasks']), {'from': 'yesterday'}).status_code, 400)
+
+
+class SQLiteTuningTests(TestCase):
+    def test_connections_get_the_configured_pragmas(self):
+        if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING:
+            self.skipTest('SQLite tuning is off')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_concurrency_benchmark_reports_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'concurrency.json')
+            call_command('benchmark_concurrency', workers=1, requests=4, output=path, stdout=StringIO())
+            with open(path) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual((report['requests'], report['errors']), (4, 0))
+        self.assertFalse(User.objects.filter(username__startswith='bench_concurrency_').exists())
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='replica', password='pw')
+        self.factory = RequestFactory()
+
+    def test_reads_stay_on_default_without_a_replica(self):
+        with replica_reads():
+            self.assertEqual(Todo.objects.all().db, 'default')
+
+    @override_settings(READ_REPLICA_ALIAS='replica')
+    def test_only_opted_in_reads_use_the_replica(self):
+        self.assertEqual(Todo.objects.all().db, 'default')
+        with replica_reads():
+            self.assertEqual(Todo.objects.all().db, 'replica')
+            self.assertEqual(router.db_for_write(Todo), 'default')
+            self.assertEqual(Todo.objects.select_for_update().db, 'default')
+
+    @override_settings(READ_REPLICA_ALIAS='replica', REPLICA_PIN_SECONDS=30)
+    def test_a_write_pins_the_session_to_default(self):
+        session = self.client.session
+        aliases = []
+
+        def write(request):
+            Todo.objects.create(user=request.user, title='Written')
+            return HttpResponse()
+
+        def report(request):
+            with replica_reads():
+                aliases.append(Todo.objects.all().db)
+            return HttpResponse()
+
+        def run(view):
+            request = self.factory.get('/')
+            request.user, request.session = self.user, session
+            return ReplicaPinningMiddleware(view)(request)
+
+        run(report)
+        run(write)
+        run(report)
+        session[PIN_SESSION_KEY] = 0
+        run(report)
+
+        self.assertEqual(aliases, ['replica', 'default', 'replica'])
+
+
+@override_settings(VIEW_CACHE_TIMEOUT=60)
+class ViewCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        for i in range(3):
+            Todo.objects.create(user=self.user, title=f'Task {i}')
+        self.client.force_login(self.user)
+
+    def test_cached_dashboard_skips_the_stats_queries(self):
+        self.client.get(reverse('dashboard'))
+        # session, user and the notifications context processor
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_tasks'], 3)
+
+        metrics = render_prometheus()
+        self.assertIn('trackpro_view_cache_requests_total{view="dashboard",result="miss"} 1', metrics)
+        self.assertIn('trackpro_view_cache_requests_total{view="dashboard",result="hit"} 1', metrics)
+
+    def test_writes_expire_the_users_pages(self):
+        for name in ('dashboard', 'reports', 'calendar'):
+            self.client.get(reverse(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.create(user=self.user, title='New', due_date=timezone.now())
+
+        self.assertEqual(self.client.get(reverse('dashboard')).context['total_tasks'], 4)
+        self.assertEqual(self.client.get(reverse('reports')).context['total_tasks'], 4)
+        calendar = self.client.get(reverse('calendar')).context['calendar']
+        self.assertEqual(sum(day['count'] for day in calendar['days']), 1)
+
+    def test_bulk_updates_expire_the_users_pages(self):
+        self.client.get(reverse('dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update_todos(self.user, list(Todo.objects.values_list('id', flat=True)), 'status', 'completed')
+        self.assertEqual(self.client.get(reverse('dashboard')).context['completed_tasks'], 3)
+
+    def test_other_users_writes_keep_the_cache(self):
+        other = User.objects.create_user(username='bob', password='secret123')
+        self.client.get(reverse('dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.create(user=other, title='Elsewhere')
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard'))
+
+
+class TemplateFragmentCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.todo = Todo.objects.create(user=self.user, title='Original title')
+        self.client.force_login(self.user)
+
+    def test_task_fragments_are_cached_per_version(self):
+        self.client.get(reverse('todo_list'))
+        for name in ('task_card', 'task_row'):
+            key = make_template_fragment_key(name, [self.todo.pk, self.todo.updated_at.timestamp(), False])
+            self.assertIn('Original title', caches['template_fragments'].get(key))
+
+    def test_edited_task_is_rendered_again(self):
+        self.assertContains(self.client.get(reverse('todo_list')), 'Original title')
+        self.todo.title = 'Edited title'
+        self.todo.save()
+
+        response = self.client.get(reverse('todo_list'))
+        self.assertContains(response, 'Edited title')
+        self.assertNotContains(response, 'Original title')
+
+    def test_render_benchmark_reports_each_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'templates.json')
+            call_command('benchmark_templates', tasks=[20], repeat=1, output=path, stdout=StringIO())
+            with open(path) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual(report['results'][0]['tasks'], 20)
+        self.assertLessEqual({'uncached_ms', 'cold_ms', 'warm_ms'}, set(report['results'][0]))
+
+
+class AsyncEndpointTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret123')
+        self.todo = Todo.objects.create(user=self.user, title='Write report')
+
+    def test_status_update(self):
+        self.client.force_login(self.user)
+        url = reverse('api_task_status', args=[self.todo.pk])
+
+        response = self.client.post(url, {'status': 'completed'})
+        self.assertEqual(response.json(), {'success': True, 'id': self.todo.pk, 'status': 'completed', 'completed': True})
+        self.assertTrue(Todo.objects.get(pk=self.todo.pk).completed)
+
+        self.assertEqual(self.client.post(url, {'status': 'done'}).status_code, 400)
+        other = Todo.objects.create(user=User.objects.create_user(username='bob'), title='Not yours')
+        response = self.client.post(reverse('api_task_status', args=[other.pk]), {'status': 'completed'})
+        self.assertEqual(response.status_code, 404)
+
+    async def call(self, view, method='get', data=None, **kwargs):
+        request = getattr(AsyncRequestFactory(), method)('/', data or {})
+
+        async def auser():
+            return self.user
+
+        request.user, request.auser = self.user, auser
+        response = await view(request, **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    async def test_async_views_match_the_sync_ones(self):
+        status, data = await self.call(views.atask_status_api, 'post', {'status': 'in_progress'}, pk=self.todo.pk)
+        self.assertEqual((status, data['status']), (200, 'in_progress'))
+        self.assertEqual((await self.call(views.atask_status_api, 'post', {'status': 'done'}, pk=self.todo.pk))[0], 400)
+        self.assertEqual((await self.call(views.atask_status_api, 'post', {'status': 'pending'}, pk=0))[0], 404)
+
+        status, data = await self.call(views.atimer_start_api, 'post', {'todo_id': self.todo.pk})
+        self.assertEqual(data['active']['todo_id'], self.todo.pk)
+        status, data = await self.call(views.atimer_api)
+        self.assertEqual(data['active']['todo_id'], self.todo.pk)
+        status, data = await self.call(views.atimer_stop_api, 'post')
+        self.assertIsNone(data['active'])
+        self.assertEqual(data['stopped']['todo_id'], self.todo.pk)
+
+        notification = await Notification.objects.acreate(user=self.user, title='New', message='One')
+        poll = views.AsyncNotificationsAPIView.as_view()
+        status, data = await self.call(poll, data={'since_id': 0})
+        self.assertEqual((data['notifications'][0]['id'], data['cursor'], data['has_more']),
+                         (notification.pk, notification.pk, False))
+        status, data = await self.call(poll, 'post', {'all': 'true'})
+        self.assertEqual(data, {'success': True, 'marked': 1})
+
+    def test_api_requires_login(self):
+        self.assertEqual(self.client.get(reverse('api_notifications')).status_code, 302)
+        self.assertEqual(self.client.post(reverse('api_timer_start')).status_code, 302)
+
+    def test_async_views_follow_the_setting(self):
+        with override_settings(ASYNC_VIEWS=False):
+            self.assertIs(api_view(views.timer_api, views.atimer_api), views.timer_api)
+        with override_settings(ASYNC_VIEWS=True):
+            self.assertIs(api_view(views.timer_api, views.atimer_api), views.atimer_api)
+
+    def test_static_files_middleware_stays_async(self):
+        async def view(request):
+            return HttpResponse('view')
+
+        middleware = StaticFilesMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().get('/not-static/')))
+        self.assertEqual(response.content, b'view')
+
+    @override_settings(READ_REPLICA_ALIAS='replica', REPLICA_PIN_SECONDS=30)
+    async def test_an_async_write_pins_the_session(self):
+        session = await self.async_client.asession()
+
+        async def write(request):
+            await Todo.objects.acreate(user=request.user, title='Written')
+            return HttpResponse()
+
+        async def auser():
+            return self.user
+
+        request = RequestFactory().post('/')
+        request.user, request.auser, request.session = self.user, auser, session
+        await ReplicaPinningMiddleware(write)(request)
+        self.assertGreater(await session.aget(PIN_SESSION_KEY, 0), 0)
+
+    def test_poller_reads_keep_alive_chunked_and_closing_responses(self):
+        responses = [
+            b'HTTP/1.1 200 OK\r\nETag: "1"\r\nContent-Length: 2\r\n\r\n{}',
+            b'HTTP/1.1 304 Not Modified\r\nETag: "1"\r\n\r\n',
+            b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n2\r\n{}\r\n0\r\n\r\n',
+            b'HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: 2\r\n\r\n{}',
+        ]
+        seen = []
+
+        async def handle(reader, writer):
+            try:
+                while True:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                    seen.append(b'If-None-Match: "1"' in head)
+                    response = responses[(len(seen) - 1) % len(responses)]
+                    writer.write(response)
+                    await writer.drain()
+                    if b'Connection: close' in response:
+                        break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # The poller hung up at the end of its run
+                pass
+            finally:
+                writer.close()
+
+        async def scenario():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await run_pollers(f'http://127.0.0.1:{port}/api/notifications/', {}, 2, 0.2, timeout=5)
+
+        report = asyncio.run(scenario())
+        self.assertEqual(report['errors'], 0)
+        self.assertGreaterEqual(report['requests'], 8)
+        self.assertFalse(seen[0])
+        self.assertTrue(any(seen))
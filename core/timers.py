@@ -0,0 +1,95 @@
+"""Start and stop time tracking with at most one running entry per user.
+
+The ``unique_active_time_entry`` constraint makes a second running entry
+impossible at the database level. ``TimerService`` stops the running entry
+and starts the next one in a single transaction, locking the running row
+where the database supports it. A start that loses a race with another tab
+hits the constraint, rolls back and tries again against the winner's entry.
+
+The ``a``-prefixed methods are for async views. Transactions only work in
+sync code, so ``astart`` and ``astop`` run their sync counterparts in a
+thread.
+"""
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import TimeEntry
+
+
+@dataclass(frozen=True)
+class TimerChange:
+    started: TimeEntry = None
+    stopped: TimeEntry = None
+
+
+class TimerService:
+    ATTEMPTS = 3
+
+    def __init__(self, user):
+        self.user = user
+
+    def _active(self):
+        return TimeEntry.objects.filter(user=self.user, is_active=True).select_related('todo')
+
+    def active_entry(self):
+        return self._active().first()
+
+    async def aactive_entry(self):
+        return await self._active().afirst()
+
+    def start(self, todo=None, now=None):
+        """Stop the running entry, if any, and start one on ``todo``."""
+        started_at = now
+        for attempt in range(self.ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    now = started_at or timezone.now()
+                    stopped = self._stop(now)
+                    started = TimeEntry.objects.create(user=self.user, todo=todo, start_time=now, is_active=True)
+                return TimerChange(started=started, stopped=stopped)
+            except IntegrityError:
+                # Another request started a timer after our stop; stop that one instead
+                if attempt == self.ATTEMPTS - 1:
+                    raise
+
+    def stop(self, now=None):
+        """Stop the running entry; ``stopped`` is None if there was none."""
+        with transaction.atomic():
+            return TimerChange(stopped=self._stop(now or timezone.now()))
+
+    async def astart(self, todo=None, now=None):
+        return await sync_to_async(self.start)(todo, now)
+
+    async def astop(self, now=None):
+        return await sync_to_async(self.stop)(now)
+
+    def _stop(self, now):
+        entry = (
+            TimeEntry.objects.select_for_update(of=('self',))
+            .filter(user=self.user, is_active=True)
+            .select_related('todo')
+            .first()
+        )
+        if entry is None:
+            return None
+        entry.end_time = max(now, entry.start_time)
+        entry.is_active = False
+        # save() rather than update() so the DailyActivity rollup follows
+        entry.save(update_fields=['end_time', 'duration', 'is_active'])
+        return entry
+
+
+def serialize_entry(entry):
+    if entry is None:
+        return None
+    return {
+        'id': entry.pk,
+        'todo_id': entry.todo_id,
+        'todo_title': entry.todo.title if entry.todo else None,
+        'start_time': entry.start_time.isoformat(),
+        'end_time': entry.end_time.isoformat() if entry.end_time else None,
+        'duration_seconds': int(entry.duration.total_seconds()) if entry.duration else None,
+    }
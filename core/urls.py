@@ -1,6 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+
+def api_view(sync_view, async_view):
+    # Async views save a thread per request under ASGI but cost an event
+    # loop per request under WSGI, so each deployment gets its own kind
+    return async_view if settings.ASYNC_VIEWS else sync_view
+
+
 urlpatterns = [
     # Authentication
     path('register/', views.register, name='register'),
@@ -21,6 +29,8 @@ urlpatterns = [
 
     # Features
     path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/feed/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('calendar/feed/reset/', views.calendar_feed_reset, name='calendar_feed_reset'),
     path('reports/', views.reports_view, name='reports'),
     path('settings/', views.settings_view, name='settings'),
     path('time-tracking/', views.time_tracking_view, name='time_tracking'),
@@ -30,6 +40,21 @@ urlpatterns = [
     path('time/start/<int:todo_id>/', views.start_time_tracking, name='start_time_tracking_todo'),
     path('time/stop/', views.stop_time_tracking, name='stop_time_tracking'),
 
+    # Exports
+    path('export/<str:kind>/', views.export_view, name='export'),
+
     # API Endpoints
-    path('api/notifications/', views.NotificationsAPIView.as_view(), name='api_notifications'),
+    path('api/tasks/', views.tasks_api, name='api_tasks'),
+    path('api/tasks/<int:pk>/status/', api_view(views.task_status_api, views.atask_status_api), name='api_task_status'),
+    path('api/tasks/bulk/', views.tasks_bulk_api, name='api_tasks_bulk'),
+    path('api/tasks/search/', views.task_search_api, name='api_task_search'),
+    path('api/calendar/', views.calendar_api, name='api_calendar'),
+    path('api/calendar/day/', views.calendar_day_api, name='api_calendar_day'),
+    path('api/timer/', api_view(views.timer_api, views.atimer_api), name='api_timer'),
+    path('api/timer/start/', api_view(views.timer_start_api, views.atimer_start_api), name='api_timer_start'),
+    path('api/timer/stop/', api_view(views.timer_stop_api, views.atimer_stop_api), name='api_timer_stop'),
+    path('api/notifications/', api_view(
+        views.NotificationsAPIView.as_view(), views.AsyncNotificationsAPIView.as_view(),
+    ), name='api_notifications'),
+    path('api/notifications/stream/', views.notifications_stream, name='api_notifications_stream'),
 ]
\ No newline at end of file
@@ -1,17 +1,45 @@
+import asyncio
+import json
+from dataclasses import asdict
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import get_template
 from django.contrib.auth import login, authenticate, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
 from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django.utils import timezone
-from django.http import JsonResponse
+from django.utils.dateparse import parse_date
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Max, Q
+from .bulk import BULK_MAX_IDS, BULK_OPERATIONS, bulk_update_todos
+from .caching import cached_for_user
+from .calendars import (
+    CalendarRange, feed_token, feed_user_id, get_calendar_days, get_day_items, ical_feed, reset_feed_token,
+)
+from .context_processors import invalidate_notifications
+from .events import get_broker
+from .exports import EXPORT_FORMATS, EXPORTS, export_queryset, export_stream, parse_day
+from .instrumentation import render_prometheus
 from .forms import UserRegistrationForm, UserProfileForm, TimeEntryForm
 from .models import Todo, Notification, TimeEntry, UserProfile
+from .pagination import TaskFilters, filter_tasks, keyset_page, paginate_tasks
+from .routers import replica_alias, use_replica
+from .search import get_search_backend
+from .timers import TimerService, serialize_entry
+from .stats import (
+    aget_time_totals, get_activity_totals, get_monthly_activity, get_task_stats, get_time_totals, time_windows,
+)
 def landing(request):
     return render(request, 'core/landing.html')
 
@@ -53,25 +81,134 @@ def user_logout(request):
 
 @login_required
 def todo_list(request):
-    todos = Todo.objects.filter(user=request.user).order_by('-created_at')
-
-    # Calculate stats
-    completed_count = todos.filter(completed=True).count()
-    pending_count = todos.filter(status='pending').count()
-    overdue_count = todos.filter(
-        due_date__lt=timezone.now(),
-        completed=False
-    ).count()
+    filters = TaskFilters.from_query(request.GET)
+    page = paginate_tasks(
+        filter_tasks(request.user, filters), filters, page_size=_tasks_page_size(request.user)
+    )
+    stats = get_task_stats(request.user)
 
     context = {
-        'todos': todos,
-        'completed_count': completed_count,
-        'pending_count': pending_count,
-        'overdue_count': overdue_count,
+        'todos': page.items,
+        'next_cursor': page.next_cursor,
+        'filters': filters,
+        'stats': stats,
+        'completed_count': stats.completed,
+        'pending_count': stats.pending,
+        'overdue_count': stats.overdue,
     }
 
     return render(request, 'core/todo_list.html', context)
 
+def _tasks_page_size(user):
+    page_size = UserProfile.objects.filter(user=user).values_list('items_per_page', flat=True).first()
+    return min(max(page_size or 10, 5), 50)
+
+@login_required
+def task_search_api(request):
+    """Ranked full-text matches with highlighted snippets"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+
+    results = get_search_backend().search(request.user, query, limit=limit) if query else []
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': result.todo.pk,
+                'title': result.todo.title,
+                'category': result.todo.category,
+                'status': result.todo.status,
+                'priority': result.todo.priority,
+                'due_date': result.todo.due_date.isoformat() if result.todo.due_date else None,
+                'url': reverse('todo_update', args=[result.todo.pk]),
+                'rank': result.rank,
+                'snippet': result.snippet,
+            }
+            for result in results
+        ],
+    })
+
+@login_required
+def tasks_api(request):
+    """Filtered, sorted task pages as rendered grid and list fragments"""
+    filters = TaskFilters.from_query(request.GET)
+    page = paginate_tasks(
+        filter_tasks(request.user, filters),
+        filters,
+        cursor=request.GET.get('after', ''),
+        page_size=_tasks_page_size(request.user),
+    )
+    card = get_template('core/partials/task_card.html')
+    row = get_template('core/partials/task_row.html')
+    return JsonResponse({
+        'cards': ''.join(card.render({'todo': todo}, request) for todo in page.items),
+        'rows': ''.join(row.render({'todo': todo}, request) for todo in page.items),
+        'count': len(page.items),
+        'next_cursor': page.next_cursor,
+        'has_more': bool(page.next_cursor),
+    })
+
+def _parse_status(request):
+    status = request.POST.get('status', '')
+    return status if status in dict(Todo.STATUS_CHOICES) else None
+
+def _task_status_response(todo):
+    return JsonResponse({'success': True, 'id': todo.pk, 'status': todo.status, 'completed': todo.completed})
+
+@login_required
+@require_POST
+def task_status_api(request, pk):
+    """Set one task's ``status``; the dashboard's quick complete action"""
+    status = _parse_status(request)
+    if status is None:
+        return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
+    todo = Todo.objects.filter(pk=pk, user=request.user).first()
+    if todo is None:
+        return JsonResponse({'success': False, 'error': 'Task not found'}, status=404)
+    todo.save_changes(status=status, completed=status == 'completed')
+    return _task_status_response(todo)
+
+@login_required
+@require_POST
+async def atask_status_api(request, pk):
+    """``task_status_api`` for ASGI deployments"""
+    status = _parse_status(request)
+    if status is None:
+        return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
+    todo = await Todo.objects.filter(pk=pk, user=await request.auser()).afirst()
+    if todo is None:
+        return JsonResponse({'success': False, 'error': 'Task not found'}, status=404)
+    await todo.asave_changes(status=status, completed=status == 'completed')
+    return _task_status_response(todo)
+
+@login_required
+@require_POST
+def tasks_bulk_api(request):
+    """Apply one operation to many tasks: ``ids``, ``operation`` and ``value``"""
+    ids = {_parse_cursor(value) for raw in request.POST.getlist('ids') for value in raw.split(',')} - {None}
+    operation = request.POST.get('operation', '')
+    if not ids:
+        return JsonResponse({'success': False, 'error': 'No tasks selected'}, status=400)
+    if len(ids) > BULK_MAX_IDS:
+        return JsonResponse({'success': False, 'error': f'At most {BULK_MAX_IDS} tasks at a time'}, status=400)
+    if operation not in BULK_OPERATIONS:
+        return JsonResponse({'success': False, 'error': 'Invalid operation'}, status=400)
+
+    try:
+        result = bulk_update_todos(request.user, ids, operation, request.POST.get('value', ''))
+    except ValueError as error:
+        return JsonResponse({'success': False, 'error': str(error)}, status=400)
+    return JsonResponse({
+        'success': True,
+        'operation': result.operation,
+        'ids': result.ids,
+        'changed': result.changed,
+        'stats': asdict(get_task_stats(request.user)),
+    })
+
 @login_required
 def todo_create(request):
     if request.method == 'POST':
@@ -100,10 +237,8 @@ def todo_update(request, pk):
     if request.method == 'POST':
         # Handle AJAX status update
         if request.POST.get('status') and not request.POST.get('title'):
-            todo.status = request.POST.get('status')
-            todo.completed = request.POST.get('status') == 'completed'
-            todo.updated_at = timezone.now()
-            todo.save()
+            status = request.POST.get('status')
+            todo.save_changes(status=status, completed=status == 'completed')
 
             # Return JSON response for AJAX
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -116,18 +251,17 @@ def todo_update(request, pk):
             messages.success(request, f'Task status updated to {todo.get_status_display()}!')
             return redirect('todo_list')
 
-        # Handle full form update
-        todo.title = request.POST.get('title')
-        todo.description = request.POST.get('description')
-        due_date = request.POST.get('due_date')
-        todo.due_date = due_date if due_date else None
-        todo.priority = request.POST.get('priority')
-        todo.category = request.POST.get('category')
-        reminder_date = request.POST.get('reminder_date')
-        todo.reminder_date = reminder_date if reminder_date else None
-        todo.status = request.POST.get('status')
-        todo.completed = 'completed' in request.POST.get('status', '')
-        todo.save()
+        # Handle full form update; only the edited columns are written
+        todo.save_changes(
+            title=request.POST.get('title'),
+            description=request.POST.get('description'),
+            due_date=request.POST.get('due_date') or None,
+            priority=request.POST.get('priority'),
+            category=request.POST.get('category'),
+            reminder_date=request.POST.get('reminder_date') or None,
+            status=request.POST.get('status'),
+            completed='completed' in request.POST.get('status', ''),
+        )
         messages.success(request, 'Todo updated successfully!')
         return redirect('todo_list')
     return render(request, 'core/todo_form.html', {'todo': todo})
@@ -143,153 +277,150 @@ def todo_delete(request, pk):
 
 @login_required
 def calendar_view(request):
-    todos = Todo.objects.filter(user=request.user, due_date__isnull=False)
-    return render(request, 'core/calendar.html', {'todos': todos})
+    calendar_range = CalendarRange.from_query(request.GET)
+    return render(request, 'core/calendar.html', {
+        'calendar': _cached_calendar_payload(request.user, calendar_range),
+        'feed_url': request.build_absolute_uri(reverse('calendar_feed', args=[feed_token(request.user)])),
+    })
+
+def _calendar_payload(user, calendar_range):
+    return {
+        'view': calendar_range.view,
+        'anchor': calendar_range.anchor.isoformat(),
+        'start': calendar_range.start.isoformat(),
+        'end': calendar_range.end.isoformat(),
+        'previous': calendar_range.previous.isoformat(),
+        'next': calendar_range.next.isoformat(),
+        'days': get_calendar_days(user, calendar_range),
+    }
+
+def _cached_calendar_payload(user, calendar_range):
+    return cached_for_user(
+        user.pk, 'calendar', lambda: _calendar_payload(user, calendar_range),
+        calendar_range.view, calendar_range.anchor,
+    )
 
 @login_required
-def dashboard(request):
-    # Get statistics
-    user = request.user
-    now = timezone.now()
+def calendar_api(request):
+    """Per-day task counts and first tasks for a month (default) or week"""
+    return JsonResponse(_cached_calendar_payload(request.user, CalendarRange.from_query(request.GET)))
 
-    # Basic statistics
-    total_tasks = Todo.objects.filter(user=user).count()
-    pending_tasks = Todo.objects.filter(user=user, status='pending').count()
-    in_progress_tasks = Todo.objects.filter(user=user, status='in_progress').count()
-    completed_tasks = Todo.objects.filter(user=user, status='completed').count()
-
-    # Priority statistics
-    high_priority = Todo.objects.filter(user=user, priority='high', completed=False).count()
-    medium_priority = Todo.objects.filter(user=user, priority='medium', completed=False).count()
-    low_priority = Todo.objects.filter(user=user, priority='low', completed=False).count()
-
-    # Due date statistics
-    overdue_tasks = Todo.objects.filter(
-        user=user,
-        due_date__lt=now,
-        completed=False
-    ).count()
-
-    due_today = Todo.objects.filter(
-        user=user,
-        due_date__date=now.date(),
-        completed=False
-    ).count()
-
-    due_this_week = Todo.objects.filter(
-        user=user,
-        due_date__date__range=[now.date(), now.date() + timezone.timedelta(days=7)],
-        completed=False
-    ).exclude(due_date__date=now.date()).count()
+@login_required
+def calendar_day_api(request):
+    """The rest of a busy day: ``date``, then ``offset`` and ``limit`` (at most 100)"""
+    try:
+        day = parse_date(request.GET.get('date', ''))
+    except ValueError:
+        day = None
+    if day is None:
+        return JsonResponse({'error': 'Invalid date'}, status=400)
+    offset = _parse_cursor(request.GET.get('offset')) or 0
+    limit = min(_parse_cursor(request.GET.get('limit')) or 50, 100)
+    items = get_day_items(request.user, day, offset=offset, limit=limit + 1)
+    return JsonResponse({
+        'date': day.isoformat(),
+        'items': items[:limit],
+        'has_more': len(items) > limit,
+    })
+
+def calendar_feed(request, token):
+    """iCalendar subscription feed; the signed token stands in for a login"""
+    user_id = feed_user_id(token)
+    if user_id is None:
+        raise Http404
+    response = StreamingHttpResponse(ical_feed(user_id, request.get_host()), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="tasks.ics"'
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
 
-    # Recent tasks
-    recent_tasks = Todo.objects.filter(user=user).order_by('-created_at')[:5]
+@login_required
+@require_POST
+def calendar_feed_reset(request):
+    """Replace the feed address; calendars subscribed to the old one stop updating"""
+    reset_feed_token(request.user)
+    messages.success(request, 'Your calendar feed address has been reset. Subscribe again with the new address.')
+    return redirect('calendar')
 
-    # Productivity stats (completed this week)
-    week_start = now - timezone.timedelta(days=now.weekday())
-    completed_this_week = Todo.objects.filter(
-        user=user,
-        completed=True,
-        created_at__gte=week_start
-    ).count()
+@login_required
+def dashboard(request):
+    user = request.user
+    # Keyed by day too: the due-today and overdue counts move with the date
+    stats, recent_tasks = cached_for_user(user.pk, 'dashboard', lambda: _dashboard_data(user), timezone.localdate())
 
     context = {
-        'total_tasks': total_tasks,
-        'pending_tasks': pending_tasks,
-        'in_progress_tasks': in_progress_tasks,
-        'completed_tasks': completed_tasks,
-        'high_priority': high_priority,
-        'medium_priority': medium_priority,
-        'low_priority': low_priority,
-        'overdue_tasks': overdue_tasks,
-        'due_today': due_today,
-        'due_this_week': due_this_week,
+        'stats': stats,
+        'total_tasks': stats.total,
+        'pending_tasks': stats.pending,
+        'in_progress_tasks': stats.in_progress,
+        'completed_tasks': stats.completed,
+        'high_priority': stats.high_priority,
+        'medium_priority': stats.medium_priority,
+        'low_priority': stats.low_priority,
+        'overdue_tasks': stats.overdue,
+        'due_today': stats.due_today,
+        'due_this_week': stats.due_this_week,
         'recent_tasks': recent_tasks,
-        'completed_this_week': completed_this_week,
+        'completed_this_week': stats.completed_this_week,
     }
 
     return render(request, 'core/dashboard.html', context)
 
+def _dashboard_data(user):
+    # Recent tasks
+    recent_tasks = list(Todo.objects.filter(user=user).order_by('-created_at')[:5])
+    return get_task_stats(user), recent_tasks
+
 @login_required
+@use_replica
 def reports_view(request):
     user = request.user
-    now = timezone.now()
-
-    # Task Analysis
-    total_tasks = Todo.objects.filter(user=user).count()
-    completed_tasks = Todo.objects.filter(user=user, completed=True).count()
-    pending_tasks = Todo.objects.filter(user=user, status='pending').count()
-    in_progress_tasks = Todo.objects.filter(user=user, status='in_progress').count()
-
-    # Priority Analysis
-    high_priority = Todo.objects.filter(user=user, priority='high').count()
-    medium_priority = Todo.objects.filter(user=user, priority='medium').count()
-    low_priority = Todo.objects.filter(user=user, priority='low').count()
+    context = cached_for_user(user.pk, 'reports', lambda: _reports_context(user), timezone.localdate())
+    return render(request, 'core/reports_simple.html', context)
 
-    # Completion Rate
-    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+def _reports_context(user):
+    now = timezone.now()
+    stats = get_task_stats(user, now=now)
 
     # Time Tracking Analysis
     total_time_entries = TimeEntry.objects.filter(user=user).count()
-    total_time_spent = TimeEntry.objects.filter(user=user).aggregate(
-        total=Sum('duration')
-    )['total'] or timezone.timedelta(0)
+    total_time_spent = timezone.timedelta(seconds=get_activity_totals(user)['tracked_seconds'])
 
     # Productivity Analysis (last 30 days)
-    thirty_days_ago = now - timezone.timedelta(days=30)
-    tasks_last_30_days = Todo.objects.filter(
-        user=user,
-        created_at__gte=thirty_days_ago
-    ).count()
-
-    completed_last_30_days = Todo.objects.filter(
-        user=user,
-        completed=True,
-        updated_at__gte=thirty_days_ago
-    ).count()
+    last_30_days = get_activity_totals(user, since=timezone.localdate(now) - timezone.timedelta(days=30))
 
     # Category Analysis
-    category_stats = Todo.objects.filter(user=user).values('category').annotate(
+    category_stats = list(Todo.objects.filter(user=user).values('category').annotate(
         total=Count('id'),
         completed=Count('id', filter=Q(completed=True))
-    ).order_by('-total')
+    ).order_by('-total'))
 
     # Monthly Progress (last 6 months)
-    monthly_data = []
-    for i in range(5, -1, -1):
-        month_start = (now - timezone.timedelta(days=30*i)).replace(day=1, hour=0, minute=0, second=0)
-        month_end = (month_start + timezone.timedelta(days=32)).replace(day=1) - timezone.timedelta(seconds=1)
-
-        month_completed = Todo.objects.filter(
-            user=user,
-            completed=True,
-            updated_at__range=(month_start, month_end)
-        ).count()
-
-        monthly_data.append({
-            'month': month_start.strftime('%B %Y'),
-            'completed': month_completed
-        })
-
-    context = {
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'pending_tasks': pending_tasks,
-        'in_progress_tasks': in_progress_tasks,
-        'high_priority': high_priority,
-        'medium_priority': medium_priority,
-        'low_priority': low_priority,
-        'completion_rate': round(completion_rate, 1),
+    monthly_data = [
+        {
+            'month': month['month_start'].strftime('%B %Y'),
+            'completed': month['tasks_completed'],
+        }
+        for month in get_monthly_activity(user, months=6, now=now)
+    ]
+
+    return {
+        'stats': stats,
+        'total_tasks': stats.total,
+        'completed_tasks': stats.completed,
+        'pending_tasks': stats.pending,
+        'in_progress_tasks': stats.in_progress,
+        'high_priority': stats.high_priority_total,
+        'medium_priority': stats.medium_priority_total,
+        'low_priority': stats.low_priority_total,
+        'completion_rate': stats.completion_rate,
         'total_time_entries': total_time_entries,
         'total_time_spent': total_time_spent,
-        'tasks_last_30_days': tasks_last_30_days,
-        'completed_last_30_days': completed_last_30_days,
+        'tasks_last_30_days': last_30_days['tasks_created'],
+        'completed_last_30_days': last_30_days['tasks_completed'],
         'category_stats': category_stats,
         'monthly_data': monthly_data,
     }
 
-    return render(request, 'core/reports_simple.html', context)
-
 @login_required
 def settings_view(request):
     user = request.user
@@ -328,29 +459,32 @@ def time_tracking_view(request):
     else:
         form = TimeEntryForm(user=user)
 
-    # Get time entries
-    time_entries = TimeEntry.objects.filter(user=user).order_by('-start_time')
+    # History, newest first, one keyset page at a time
+    entries = TimeEntry.objects.filter(user=user).select_related('todo')
+    period = request.GET.get('period', '')
+    windows = time_windows(timezone.now())
+    if period in windows:
+        entries = entries.filter(start_time__gte=windows[period])
+    else:
+        period = ''
+    page = keyset_page(entries, 'start_time', True, cursor=request.GET.get('after', ''), page_size=25)
 
     # Active time entry
-    active_entry = TimeEntry.objects.filter(user=user, is_active=True).first()
-
-    # Today's time summary
-    today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_entries = TimeEntry.objects.filter(
-        user=user,
-        start_time__gte=today_start
-    )
+    active_entry = TimeEntry.objects.filter(user=user, is_active=True).select_related('todo').first()
 
-    today_total = sum((entry.duration.total_seconds() for entry in today_entries if entry.duration), 0)
+    totals = get_time_totals(user)
 
     # Get incomplete todos for quick actions
     incomplete_todos = Todo.objects.filter(user=user, completed=False)[:5]
 
     context = {
         'form': form,
-        'time_entries': time_entries,
+        'time_entries': page.items,
+        'next_cursor': page.next_cursor,
+        'period': period,
         'active_entry': active_entry,
-        'today_total': today_total,
+        'totals': totals,
+        'today_total': totals.today_hours,
         'incomplete_todos': incomplete_todos,
     }
 
@@ -362,77 +496,286 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 
+def serialize_notification(notification):
+    return {
+        'id': notification.id,
+        'type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat(),
+        'sound_enabled': notification.sound_enabled,
+    }
+
+def _parse_cursor(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+def _unread_notifications(user, since):
+    notifications = Notification.objects.filter(user=user, is_read=False)
+    # Clients that already hold notifications up to ``since`` only get newer ones
+    if since is not None:
+        notifications = notifications.filter(id__gt=since)
+    return notifications
+
+def _notifications_page(notifications, since):
+    if since is None:
+        return notifications[:10]
+    # Oldest first, so a burst larger than one page is served over several
+    # polls instead of skipping past its older rows
+    return notifications.order_by('id')[:10]
+
+def _notifications_response(data, since, state, etag):
+    if since is None:
+        cursor = max([item['id'] for item in data], default=0)
+    else:
+        cursor = data[-1]['id'] if data else since
+    response = JsonResponse({'notifications': data, 'cursor': cursor, 'has_more': state['unread'] > len(data)})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _mark_read_target(data, unread):
+    """The unread notifications a mark-read POST names, and the ids it named.
+
+    Mark one notification, a list of them, or everything up to an id as
+    read, always with a single UPDATE. None for a request naming nothing.
+    """
+    if data.get('all') == 'true':
+        return unread, None
+    up_to_id = _parse_cursor(data.get('up_to_id'))
+    if up_to_id is not None:
+        return unread.filter(id__lte=up_to_id), None
+    ids = data.getlist('notification_ids') or data.getlist('notification_id')
+    ids = {_parse_cursor(value) for raw in ids for value in raw.split(',')} - {None}
+    if ids:
+        return unread.filter(id__in=ids), ids
+    return None, None
+
+# The newest id and the count identify the unread set, so an unchanged poll
+# is answered with 304 before any row is loaded or serialized
+UNREAD_STATE = {'latest': Max('id'), 'unread': Count('id')}
+
+def _unread_etag(since, state):
+    return f'"{since or 0}-{state["latest"] or 0}-{state["unread"]}"'
+
+@method_decorator(login_required, name='get')
+@method_decorator(login_required, name='post')
 class NotificationsAPIView(View):
-    def get(self, request):
-        user = request.user
-        notifications = Notification.objects.filter(user=user, is_read=False)[:10]
+    """Unread notifications for polling clients, and marking them read."""
 
-        data = []
-        for notification in notifications:
-            data.append({
-                'id': notification.id,
-                'type': notification.notification_type,
-                'title': notification.title,
-                'message': notification.message,
-                'created_at': notification.created_at.isoformat(),
-                'sound_enabled': notification.sound_enabled,
-            })
+    def get(self, request):
+        since = _parse_cursor(request.GET.get('since_id', request.GET.get('since')))
+        notifications = _unread_notifications(request.user, since)
+        state = notifications.aggregate(**UNREAD_STATE)
+        etag = _unread_etag(since, state)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
 
-        return JsonResponse({'notifications': data})
+        data = [serialize_notification(notification) for notification in _notifications_page(notifications, since)]
+        return _notifications_response(data, since, state, etag)
 
     @method_decorator(csrf_exempt)
     def post(self, request):
         user = request.user
-        notification_id = request.POST.get('notification_id')
+        target, ids = _mark_read_target(request.POST, Notification.objects.filter(user=user, is_read=False))
+        if target is None:
+            return JsonResponse({'success': False, 'error': 'Invalid request'})
+        marked = target.update(is_read=True)
+        invalidate_notifications(user.pk)
+        if ids and not marked and not Notification.objects.filter(user=user, id__in=ids).exists():
+            return JsonResponse({'success': False, 'error': 'Notification not found'})
+        return JsonResponse({'success': True, 'marked': marked})
+
+@method_decorator(login_required, name='get')
+@method_decorator(login_required, name='post')
+class AsyncNotificationsAPIView(View):
+    """``NotificationsAPIView`` for ASGI deployments, where a poll waiting on
+    the database holds no worker."""
+
+    async def get(self, request):
+        since = _parse_cursor(request.GET.get('since_id', request.GET.get('since')))
+        notifications = _unread_notifications(await request.auser(), since)
+        state = await notifications.aaggregate(**UNREAD_STATE)
+        etag = _unread_etag(since, state)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = [serialize_notification(notification) async for notification in _notifications_page(notifications, since)]
+        return _notifications_response(data, since, state, etag)
 
-        if notification_id:
-            try:
-                notification = Notification.objects.get(id=notification_id, user=user)
-                notification.is_read = True
-                notification.save()
-                return JsonResponse({'success': True})
-            except Notification.DoesNotExist:
-                return JsonResponse({'success': False, 'error': 'Notification not found'})
+    @method_decorator(csrf_exempt)
+    async def post(self, request):
+        user = await request.auser()
+        target, ids = _mark_read_target(request.POST, Notification.objects.filter(user=user, is_read=False))
+        if target is None:
+            return JsonResponse({'success': False, 'error': 'Invalid request'})
+        marked = await target.aupdate(is_read=True)
+        invalidate_notifications(user.pk)
+        if ids and not marked and not await Notification.objects.filter(user=user, id__in=ids).aexists():
+            return JsonResponse({'success': False, 'error': 'Notification not found'})
+        return JsonResponse({'success': True, 'marked': marked})
 
-        return JsonResponse({'success': False, 'error': 'Invalid request'})
+@login_required
+async def notifications_stream(request):
+    """Push new unread notifications to the browser as server-sent events.
+
+    Only served under ASGI; WSGI workers answer 204 so the client falls back
+    to polling NotificationsAPIView.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    cursor = _parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    if cursor is None:
+        latest = await Notification.objects.filter(user=user).order_by('-id').afirst()
+        cursor = latest.id if latest else 0
+
+    async def events(cursor):
+        broker = get_broker()
+        queue = broker.subscribe(user.pk)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                new = Notification.objects.filter(user=user, is_read=False, id__gt=cursor).order_by('id')
+                async for notification in new[:50]:
+                    cursor = notification.id
+                    payload = json.dumps(serialize_notification(notification))
+                    yield f'id: {cursor}\nevent: notification\ndata: {payload}\n\n'
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_STREAM_RECHECK_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+        finally:
+            broker.unsubscribe(user.pk, queue)
+
+    response = StreamingHttpResponse(events(cursor), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @login_required
 def start_time_tracking(request, todo_id=None):
-    user = request.user
-
-    # Stop any active time entry
-    active_entry = TimeEntry.objects.filter(user=user, is_active=True).first()
-    if active_entry:
-        active_entry.end_time = timezone.now()
-        active_entry.is_active = False
-        active_entry.save()
-
-    # Start new time entry
-    todo = None
-    if todo_id:
-        todo = get_object_or_404(Todo, id=todo_id, user=user)
-
-    time_entry = TimeEntry.objects.create(
-        user=user,
-        todo=todo,
-        start_time=timezone.now(),
-        is_active=True
-    )
+    todo = get_object_or_404(Todo, id=todo_id, user=request.user) if todo_id else None
+    TimerService(request.user).start(todo)
 
     messages.success(request, f'Time tracking started for {todo.title if todo else "general work"}')
     return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
 
 @login_required
 def stop_time_tracking(request):
-    user = request.user
-
-    active_entry = TimeEntry.objects.filter(user=user, is_active=True).first()
-    if active_entry:
-        active_entry.end_time = timezone.now()
-        active_entry.is_active = False
-        active_entry.save()
+    if TimerService(request.user).stop().stopped:
         messages.success(request, 'Time tracking stopped')
     else:
         messages.warning(request, 'No active time tracking to stop')
 
     return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
+
+def _timer_response(totals, active, stopped):
+    return JsonResponse({
+        'active': serialize_entry(active),
+        'stopped': serialize_entry(stopped),
+        'today_hours': round(totals.today_hours, 2),
+        'today_entries': totals.entries_today,
+        'week_hours': round(totals.this_week_hours, 2),
+        'month_hours': round(totals.this_month_hours, 2),
+    })
+
+def _timer_state(user, active, stopped=None):
+    return _timer_response(get_time_totals(user, top_todos=0), active, stopped)
+
+async def _atimer_state(user, active, stopped=None):
+    return _timer_response(await aget_time_totals(user, top_todos=0), active, stopped)
+
+@login_required
+@require_GET
+def timer_api(request):
+    """The running timer and today's, this week's and this month's totals"""
+    return _timer_state(request.user, TimerService(request.user).active_entry())
+
+@login_required
+@require_POST
+def timer_start_api(request):
+    """Stop the running timer, if any, and start one on ``todo_id`` (or general work)"""
+    todo_id = request.POST.get('todo_id', '')
+    todo = None
+    if todo_id:
+        todo = Todo.objects.filter(id=_parse_cursor(todo_id), user=request.user).first()
+        if todo is None:
+            return JsonResponse({'success': False, 'error': 'Task not found'}, status=404)
+    change = TimerService(request.user).start(todo)
+    return _timer_state(request.user, change.started, change.stopped)
+
+@login_required
+@require_POST
+def timer_stop_api(request):
+    return _timer_state(request.user, None, TimerService(request.user).stop().stopped)
+
+# The timer endpoints for ASGI deployments
+
+@login_required
+@require_GET
+async def atimer_api(request):
+    user = await request.auser()
+    return await _atimer_state(user, await TimerService(user).aactive_entry())
+
+@login_required
+@require_POST
+async def atimer_start_api(request):
+    user = await request.auser()
+    todo_id = request.POST.get('todo_id', '')
+    todo = None
+    if todo_id:
+        todo = await Todo.objects.filter(id=_parse_cursor(todo_id), user=user).afirst()
+        if todo is None:
+            return JsonResponse({'success': False, 'error': 'Task not found'}, status=404)
+    change = await TimerService(user).astart(todo)
+    return await _atimer_state(user, change.started, change.stopped)
+
+@login_required
+@require_POST
+async def atimer_stop_api(request):
+    user = await request.auser()
+    return await _atimer_state(user, None, (await TimerService(user).astop()).stopped)
+
+@login_required
+@require_GET
+def export_view(request, kind):
+    """Stream tasks, time entries or notifications as CSV or NDJSON.
+
+    ``from`` and ``to`` (YYYY-MM-DD, inclusive) bound the rows by creation
+    or start date, ``gzip=1`` compresses the download, and staff may add
+    ``all=1`` for every user's rows.
+    """
+    spec = EXPORTS.get(kind)
+    if spec is None:
+        raise Http404
+    output_format = request.GET.get('format', 'csv')
+    if output_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Invalid format'}, status=400)
+    date_from, date_to = parse_day(request.GET.get('from')), parse_day(request.GET.get('to'))
+    if (request.GET.get('from') and date_from is None) or (request.GET.get('to') and date_to is None):
+        return JsonResponse({'error': 'Invalid date'}, status=400)
+
+    everyone = request.user.is_staff and request.GET.get('all') == '1'
+    # Rows are read while the response streams, after the view has returned
+    queryset = export_queryset(spec, None if everyone else request.user, date_from, date_to).using(replica_alias())
+    compress = request.GET.get('gzip') == '1'
+
+    content_type, extension = EXPORT_FORMATS[output_format]
+    filename = f'{kind}.{extension}'
+    if compress:
+        content_type, filename = 'application/gzip', f'{filename}.gz'
+    response = StreamingHttpResponse(export_stream(spec, output_format, queryset, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+@staff_member_required
+def metrics_view(request):
+    """Request metrics of this worker process in the Prometheus text format"""
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,31 @@
+"""Gunicorn settings for both deployment profiles.
+
+    gunicorn                             # WSGI: myapp.wsgi with sync workers
+    SERVER_INTERFACE=asgi gunicorn       # ASGI: myapp.asgi with uvicorn workers
+
+Under ASGI the notification stream is served instead of answering 204, and
+the JSON API, timer and notification endpoints switch to their async views
+(``ASYNC_VIEWS`` follows ``SERVER_INTERFACE``). Django closes an async request's
+database connection when the request ends, so persistent connections only
+pay off under WSGI and ``CONN_MAX_AGE`` defaults to 0 for ASGI.
+"""
+import multiprocessing
+import os
+
+SERVER_INTERFACE = os.environ.get('SERVER_INTERFACE', 'wsgi').lower()
+if SERVER_INTERFACE not in ('wsgi', 'asgi'):
+    raise ValueError(f'SERVER_INTERFACE must be "wsgi" or "asgi", not {SERVER_INTERFACE!r}')
+
+bind = os.environ.get('GUNICORN_BIND', f'0.0.0.0:{os.environ.get("PORT", "8000")}')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * multiprocessing.cpu_count() + 1, 8)))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+if SERVER_INTERFACE == 'asgi':
+    wsgi_app = 'myapp.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    os.environ.setdefault('CONN_MAX_AGE', '0')
+else:
+    wsgi_app = 'myapp.wsgi:application'
+    worker_class = 'sync'
@@ -43,7 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,12 +54,21 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'myapp.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # In production compiled templates are kept in memory for the
+            # life of the process; with DEBUG on, edits show up at once
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -77,13 +86,61 @@ WSGI_APPLICATION = 'myapp.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuning, applied to every new connection through init_command.
+# WAL lets readers run alongside the single writer; busy_timeout makes a
+# writer wait for the lock instead of failing with "database is locked";
+# IMMEDIATE transactions take the write lock at BEGIN, so two transactions
+# that read and then write cannot deadlock on upgrading their locks.
+# Set SQLITE_TUNING=false to measure against SQLite's defaults.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True').lower() == 'true'
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+    # Negative values are KiB, so about 20 MB of page cache per connection
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', '-20000')),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reuse each worker's connection between requests, checking that it
+        # still works before a request uses it
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        } if SQLITE_TUNING else {},
     }
 }
 
+# Read replica (core.routers.ReplicaRouter)
+# Set DATABASE_REPLICA_NAME to a replica of the default database, kept in
+# sync outside Django. Reports, exports and the send_notifications candidate
+# scans then read from it; everything else, and every write, uses default.
+# For REPLICA_PIN_SECONDS after a session writes, its reads stay on default
+# so replication lag never hides a user's own changes.
+DATABASE_REPLICA_NAME = os.environ.get('DATABASE_REPLICA_NAME')
+READ_REPLICA_ALIAS = 'replica' if DATABASE_REPLICA_NAME else None
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+if READ_REPLICA_ALIAS:
+    DATABASES[READ_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': DATABASE_REPLICA_NAME,
+        # Tests read the test database through the replica alias
+        'TEST': {'MIRROR': 'default'},
+    }
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+        'core.routers.ReplicaPinningMiddleware',
+    )
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,6 +187,114 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 LOGIN_URL = '/login/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Notification scheduler
+# Record schedule-relevant Todo changes for the run_notification_scheduler
+# daemon. Leave off when notifications are sent by cron via send_notifications.
+NOTIFICATION_OUTBOX_ENABLED = os.environ.get('NOTIFICATION_OUTBOX_ENABLED', 'False').lower() == 'true'
+
+# Notification push (server-sent events, served under ASGI only)
+# The broker wakes streams in this process when a notification is saved.
+# Streams also recheck the database on this interval, which picks up
+# notifications bulk-created by other processes such as the scheduler.
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'core.events.LocalBroker')
+NOTIFICATION_STREAM_RECHECK_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_RECHECK_SECONDS', '15'))
+
+# Serve the JSON API (notifications, timer, task status) from async views.
+# Worth it under ASGI only; under WSGI every async view runs in an event loop
+# of its own. On by default when gunicorn.conf.py runs the ASGI profile.
+ASYNC_VIEWS = os.environ.get(
+    'ASYNC_VIEWS', str(os.environ.get('SERVER_INTERFACE', 'wsgi').lower() == 'asgi'),
+).lower() == 'true'
+
+# Cache
+# CACHE_BACKEND is 'locmem' (the default, one cache per process), 'file'
+# (shared by the processes of one host, kept under CACHE_LOCATION) or the
+# dotted path of any other Django cache backend.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', str(BASE_DIR / '.cache') if CACHE_BACKEND == 'file' else 'trackpro',
+        ),
+        'KEY_PREFIX': 'trackpro',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000')),
+        },
+    }
+}
+
+# Rendered task cards and rows are cached by todo id, updated_at and overdue
+# state, so a cached fragment is never stale. They get a cache of their own
+# so that they do not evict other entries. Set TEMPLATE_FRAGMENT_CACHE=false
+# to render them every time.
+TEMPLATE_FRAGMENT_CACHE = os.environ.get('TEMPLATE_FRAGMENT_CACHE', 'True').lower() == 'true'
+CACHES['template_fragments'] = {
+    **CACHES['default'],
+    'LOCATION': (
+        os.path.join(CACHES['default']['LOCATION'], 'fragments') if CACHE_BACKEND == 'file'
+        else f"{CACHES['default']['LOCATION']}-fragments"
+    ),
+    'OPTIONS': {
+        'MAX_ENTRIES': int(os.environ.get('TEMPLATE_FRAGMENT_CACHE_MAX_ENTRIES', '20000')),
+    },
+} if TEMPLATE_FRAGMENT_CACHE else {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Seconds the dashboard, reports and calendar context is cached per user
+# (0 disables). Entries are versioned by a per-user generation that writes
+# bump, so this only bounds staleness from the passing of time. With the
+# locmem backend and several worker processes, a write only reaches the
+# generation of the process that made it; use the file backend there.
+VIEW_CACHE_TIMEOUT = int(os.environ.get('VIEW_CACHE_TIMEOUT', '0'))
+
+# Seconds the notifications and reminders shown in the page chrome are cached
+# per user (0 disables). Entries are invalidated when they change, and the
+# reminders entry also expires when the user's next reminder falls due, so
+# this only bounds staleness from writes that bypass signals. With the locmem
+# backend every process has its own cache: invalidations made by the
+# scheduler or a cron run never reach the web workers, which keep serving
+# their entries until the timeout; use the file backend there.
+CONTEXT_CACHE_TIMEOUT = int(os.environ.get('CONTEXT_CACHE_TIMEOUT', '0'))
+
+# Request instrumentation (core.instrumentation.RequestMetricsMiddleware)
+# Off unless enabled. Every request's wall time is recorded; the sampled
+# fraction also gets DB timing, query counts, N+1 detection, a
+# Server-Timing header and a JSON log line. Metrics are served to staff
+# users at /admin/metrics/ in the Prometheus text format.
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', 'False').lower() == 'true'
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '0.1'))
+REQUEST_METRICS_DUPLICATE_THRESHOLD = int(os.environ.get('REQUEST_METRICS_DUPLICATE_THRESHOLD', '5'))
+
+if REQUEST_METRICS_ENABLED:
+    # Static files served by WhiteNoise are not worth measuring
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('core.middleware.StaticFilesMiddleware') + 1,
+        'core.instrumentation.RequestMetricsMiddleware',
+    )
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import metrics_view
 
 urlpatterns = [
+    path('admin/metrics/', metrics_view, name='admin_metrics'),
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
 ]